@@ -23,13 +23,37 @@ class Settings(BaseSettings):
     MAX_UPLOAD_SIZE: int = 10485760  # 10MB
     UPLOAD_FOLDER: str = "./uploads"
     
+    # Import
+    IMPORT_CHUNK_SIZE: int = 10000  # Rows read, validated and inserted at a time
+    
+    IMPORT_STALE_SECONDS: int = 600  # Processing imports without progress for longer can be resumed
+    DRY_RUN_TTL_SECONDS: int = 3600  # Validated dry runs can be committed for this long
+    
+    # Background jobs
+    BACKGROUND_WORKERS: int = 2  # Threads in the local worker pool
+    EXPORT_WORKERS: int = 1  # Threads for export jobs, apart from the pool above
+    VALIDATION_WORKERS: int = 0  # Processes for import validation (0 = one per CPU core)
+    PARALLEL_VALIDATION_MIN_ROWS: int = 50000  # Smaller imports are validated in-process
+    
     # Pagination
     DEFAULT_PAGE_SIZE: int = 50
     MAX_PAGE_SIZE: int = 1000
+    COUNT_CACHE_SIZE: int = 1024  # Cached listing totals (0 = no cache)
+    CATEGORY_STATS_MAX_AGE_SECONDS: int = 60  # Estimated totals use category stats up to this old
+    
+    # Product cache
+    PRODUCT_CACHE_SIZE: int = 10000  # Products kept for GET /products/{id} (0 = no cache)
+    PRODUCT_CACHE_TTL_SECONDS: int = 60  # Bounds staleness from writes made by other processes
+    LISTING_CACHE_SIZE: int = 512  # Product listing responses kept (0 = no cache)
+    LISTING_CACHE_TTL_SECONDS: int = 60  # Bounds staleness from writes made by other processes
+    LISTING_WAIT_SECONDS: float = 10  # Identical listings wait this long for the one running, then run their own
     
     # Export
     MAX_EXPORT_RECORDS: int = 500000
     EXPORT_BATCH_SIZE: int = 10000
+    EXPORT_CACHE_MAX_BYTES: int = 536870912  # Disk used by cached exports (0 = no cache)
+    EXPORT_JOB_TTL_SECONDS: int = 86400  # Finished export job files are deleted after this
+    EXPORT_JOB_PURGE_INTERVAL_SECONDS: int = 3600  # Expired export job files are looked for this often (0 = only on request)
     
     class Config:
         env_file = ".env"
@@ -3,8 +3,14 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 from pathlib import Path
+import logging
 from app.config import settings
-from app.routers import auth, products, import_export
+from app.database import SessionLocal, engine
+from app.routers import auth, products, import_export, metrics
+from app.services.export_job import ExportJobService
+from app.utils.background import run_periodically, shutdown_executor
+
+logger = logging.getLogger(__name__)
 
 # Create FastAPI application
 app = FastAPI(
@@ -49,6 +55,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+def start_export_maintenance():
+    """Fail the export jobs interrupted by a restart and purge expired export files periodically."""
+    db = SessionLocal()
+    try:
+        ExportJobService.recover_stale_jobs(db)
+    except Exception:
+        logger.exception("Could not recover interrupted export jobs")
+    finally:
+        db.close()
+    
+    run_periodically(ExportJobService.purge_expired_files, settings.EXPORT_JOB_PURGE_INTERVAL_SECONDS, engine)
+
+
+@app.on_event("shutdown")
+def stop_background_workers():
+    """Wait for queued background jobs before shutting down."""
+    shutdown_executor(wait=True)
+
+
 # Include routers with API versioning
 API_V1_PREFIX = "/api/v1"
 
@@ -56,6 +82,7 @@ app.include_router(auth.router, prefix=API_V1_PREFIX)
 app.include_router(products.router, prefix=API_V1_PREFIX)
 app.include_router(import_export.router, prefix=API_V1_PREFIX)
 app.include_router(import_export.logs_router, prefix=API_V1_PREFIX)  
+app.include_router(metrics.router, prefix=API_V1_PREFIX)
 
 # Serve frontend static files -
 frontend_path = Path(__file__).parent.parent / "frontend"
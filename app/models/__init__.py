@@ -1,5 +1,10 @@
 from app.models.user import User
 from app.models.product import Product
 from app.models.import_log import ImportLog
+from app.models.import_error import ImportRowError
+from app.models.export_job import ExportJob
+from app.models.product_tombstone import ProductTombstone
+from app.models.change_sequence import ChangeSequence
+from app.models import product_search  # noqa: F401 - registers the search index DDL
 
-__all__ = ["User", "Product", "ImportLog"]
+__all__ = ["User", "Product", "ImportLog", "ImportRowError", "ExportJob", "ProductTombstone", "ChangeSequence"]
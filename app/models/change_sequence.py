@@ -0,0 +1,57 @@
+from sqlalchemy import Column, Integer, event, text
+from app.database import Base
+
+
+class ChangeSequence(Base):
+    """
+    Single-row counter that orders product changes by commit.
+    
+    Every transaction that writes products takes the next value and stamps
+    it on the rows it changes (change_seq). Incrementing the row locks it
+    until the transaction ends (on SQLite the whole database is locked), so
+    values are handed out in commit order: once a value is visible, every
+    smaller one is committed too.
+    """
+    
+    __tablename__ = "change_sequence"
+    
+    id = Column(Integer, primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"<ChangeSequence(value={self.value})>"
+
+
+def next_change_sequence(db) -> int:
+    """
+    Take the change sequence value for the current transaction.
+    
+    Must be called inside the transaction that writes the products, as late
+    as possible: other product writes wait until it ends.
+    
+    Args:
+        db: Database session or connection
+    
+    Returns:
+        The new sequence value
+    """
+    db.execute(text("UPDATE change_sequence SET value = value + 1 WHERE id = 1"))
+    return db.execute(text("SELECT value FROM change_sequence WHERE id = 1")).scalar_one()
+
+
+def current_change_sequence(db) -> int:
+    """
+    Get the last committed change sequence value.
+    
+    Args:
+        db: Database session or connection
+    
+    Returns:
+        Sequence value; every change up to it is committed
+    """
+    return db.execute(text("SELECT value FROM change_sequence WHERE id = 1")).scalar_one()
+
+
+@event.listens_for(ChangeSequence.__table__, "after_create")
+def _seed_change_sequence(target, connection, **kw):
+    connection.execute(text("INSERT INTO change_sequence (id, value) VALUES (1, 0)"))
@@ -0,0 +1,46 @@
+from sqlalchemy import Column, Integer, BigInteger, Boolean, String, DateTime, Text
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class ExportJob(Base):
+    __tablename__ = "export_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    format = Column(String(20), nullable=False)  # csv, excel, parquet, arrow
+    compression = Column(String(10), nullable=True)  # gzip, zstd (CSV only)
+    filters = Column(Text, nullable=True)  # JSON string with the product filters
+    columns = Column(Text, nullable=True)  # Comma-separated exported columns
+    status = Column(String(20), nullable=False, default="queued")  # queued, processing, completed, failed, expired
+    expected_rows = Column(Integer, nullable=True)
+    rows_written = Column(Integer, default=0)
+    truncated = Column(Boolean, default=False)  # More rows matched than MAX_EXPORT_RECORDS
+    file_path = Column(String(500), nullable=True)
+    file_size = Column(BigInteger, nullable=True)
+    error = Column(Text, nullable=True)
+    worker_pid = Column(Integer, nullable=True)  # Process whose pool runs the job
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+    expires_at = Column(DateTime(timezone=True), nullable=True)  # The file is deleted after this
+    
+    def __repr__(self):
+        return f"<ExportJob(id={self.id}, format={self.format}, status={self.status})>"
+    
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "format": self.format,
+            "compression": self.compression,
+            "columns": self.columns,
+            "status": self.status,
+            "expected_rows": self.expected_rows,
+            "rows_written": self.rows_written,
+            "truncated": self.truncated,
+            "file_size": self.file_size,
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "completed_at": self.completed_at.isoformat() if self.completed_at else None,
+            "expires_at": self.expires_at.isoformat() if self.expires_at else None
+        }
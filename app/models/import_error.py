@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Index
+from app.database import Base
+
+
+class ImportRowError(Base):
+    __tablename__ = "import_errors"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    log_id = Column(Integer, ForeignKey("import_logs.id", ondelete="CASCADE"), nullable=False)
+    row = Column(Integer, nullable=True)
+    field = Column(String(100), nullable=True)
+    value = Column(Text, nullable=True)
+    message = Column(Text, nullable=False)
+    
+    # Errors are always read by log, in row order
+    __table_args__ = (
+        Index('ix_import_errors_log_id_row', 'log_id', 'row'),
+    )
+    
+    def __repr__(self):
+        return f"<ImportRowError(log_id={self.log_id}, row={self.row}, field={self.field})>"
+    
+    def to_dict(self):
+        return {
+            "row": self.row,
+            "field": self.field,
+            "value": self.value,
+            "message": self.message
+        }
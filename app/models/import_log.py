@@ -8,12 +8,28 @@ class ImportLog(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String(255), nullable=False)
+    mode = Column(String(20), nullable=False, default="insert")  # insert, upsert
+    dry_run = Column(Boolean, default=False)  # Validate only; rows are committed later with commit_token
+    commit_token = Column(String(64), unique=True, index=True, nullable=True)
+    commit_expires_at = Column(DateTime(timezone=True), nullable=True)  # Validated rows are discarded after this
+    sheet_name = Column(String(255), nullable=True)  # Excel sheet (name or index)
+    skip_rows = Column(Integer, default=0)  # Leading Excel rows skipped before the header
+    file_path = Column(String(500), nullable=True)  # Stored upload, kept until the import completes
+    file_fingerprint = Column(String(64), nullable=True)  # SHA-256 of the stored upload
+    checkpoint_rows = Column(Integer, default=0)  # Data rows consumed by the last committed chunk
     total_rows = Column(Integer, default=0)
     successful_rows = Column(Integer, default=0)
     failed_rows = Column(Integer, default=0)
+    expected_rows = Column(Integer, nullable=True)  # Estimated rows, used for progress/ETA
+    inserted_rows = Column(Integer, default=0)
+    updated_rows = Column(Integer, default=0)
+    unchanged_rows = Column(Integer, default=0)
+    superseded_rows = Column(Integer, default=0)  # Upsert rows overridden by a later row with the same key
     errors = Column(Text, nullable=True)  # JSON string with errors
-    status = Column(String(50), nullable=False, default="processing")  # processing, completed, failed
+    error_message = Column(Text, nullable=True)  # Why the import as a whole failed, if it did
+    status = Column(String(50), nullable=False, default="processing")  # processing, validated, completed, failed, expired
     started_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     completed_at = Column(DateTime(timezone=True), nullable=True)
     
     def __repr__(self):
@@ -23,10 +39,22 @@ class ImportLog(Base):
         return {
             "id": self.id,
             "filename": self.filename,
+            "mode": self.mode,
+            "dry_run": self.dry_run,
+            "commit_expires_at": self.commit_expires_at.isoformat() if self.commit_expires_at else None,
+            "sheet_name": self.sheet_name,
+            "skip_rows": self.skip_rows,
             "total_rows": self.total_rows,
             "successful_rows": self.successful_rows,
             "failed_rows": self.failed_rows,
+            "expected_rows": self.expected_rows,
+            "inserted_rows": self.inserted_rows,
+            "updated_rows": self.updated_rows,
+            "unchanged_rows": self.unchanged_rows,
+            "superseded_rows": self.superseded_rows,
+            "checkpoint_rows": self.checkpoint_rows,
             "errors": self.errors,
+            "error_message": self.error_message,
             "status": self.status,
             "started_at": self.started_at.isoformat() if self.started_at else None,
             "completed_at": self.completed_at.isoformat() if self.completed_at else None
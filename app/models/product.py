@@ -1,5 +1,6 @@
 from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Index
 from sqlalchemy.sql import func
+from datetime import datetime
 from app.database import Base
 
 
@@ -12,12 +13,25 @@ class Product(Base):
     precio = Column(Float, nullable=False)
     stock = Column(Integer, nullable=False, default=0)
     categoria = Column(String(100), nullable=False, index=True)
+    content_hash = Column(String(40), nullable=True)  # Hash of content fields, used by delta imports
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Set on insert and every update (UTC); indexed for the change feed
+    updated_at = Column(
+        DateTime(timezone=True),
+        default=datetime.utcnow,
+        server_default=func.now(),
+        onupdate=datetime.utcnow,
+        index=True
+    )
+    change_seq = Column(Integer, nullable=True)  # Commit-ordered change sequence (see ChangeSequence)
     
     # Create composite index for common queries
     __table_args__ = (
         Index('ix_products_categoria_nombre', 'categoria', 'nombre'),
+        Index('ix_products_categoria_precio', 'categoria', 'precio'),  # Price bands within a category
+        Index('ix_products_precio_id', 'precio', 'id'),  # Keyset pagination sorted by price
+        Index('ix_products_stock_id', 'stock', 'id'),  # Keyset pagination sorted by stock
+        Index('ix_products_change_seq_id', 'change_seq', 'id'),  # Change feed
     )
     
     def __repr__(self):
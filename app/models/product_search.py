@@ -0,0 +1,138 @@
+from contextlib import contextmanager
+from sqlalchemy import event, text
+from app.models.product import Product
+
+# SQLite: FTS5 index over nombre/descripcion, external content kept in sync by triggers
+FTS_TABLE = "products_fts"
+# Single-row flag that pauses the insert trigger while BulkLoader indexes a whole chunk at once.
+# It is only ever set inside the loading transaction, so other connections never see it set.
+FTS_CONTROL_TABLE = "products_fts_control"
+
+SQLITE_CREATE = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        nombre, descripcion,
+        content='products', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"CREATE TABLE IF NOT EXISTS {FTS_CONTROL_TABLE} (paused INTEGER NOT NULL DEFAULT 0)",
+    f"INSERT INTO {FTS_CONTROL_TABLE}(paused) SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM {FTS_CONTROL_TABLE})",
+    f"""CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products
+    WHEN (SELECT paused FROM {FTS_CONTROL_TABLE}) = 0 BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, nombre, descripcion) VALUES (new.id, new.nombre, new.descripcion);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, nombre, descripcion)
+        VALUES ('delete', old.id, old.nombre, old.descripcion);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF nombre, descripcion ON products BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, nombre, descripcion)
+        VALUES ('delete', old.id, old.nombre, old.descripcion);
+        INSERT INTO {FTS_TABLE}(rowid, nombre, descripcion) VALUES (new.id, new.nombre, new.descripcion);
+    END""",
+]
+
+# Index rows that existed before the search index was created
+SQLITE_REBUILD = f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+
+# PostgreSQL: expression GIN index on the document (full-text) and trigram index on nombre
+# (also serves the ilike filter). Queries must use the exact same expression.
+PG_DOCUMENT = "to_tsvector('simple', coalesce(nombre, '') || ' ' || coalesce(descripcion, ''))"
+
+POSTGRES_CREATE = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX IF NOT EXISTS ix_products_search_document ON products USING gin ({PG_DOCUMENT})",
+    "CREATE INDEX IF NOT EXISTS ix_products_nombre_trgm ON products USING gin (nombre gin_trgm_ops)",
+]
+
+
+def create_search_index(connection) -> None:
+    """
+    Create the product search index for the connection's database.
+
+    Idempotent, so it can also be run on databases created before search
+    existed (see init_db.py). Existing rows are only indexed (a full
+    FTS5 rebuild) when the SQLite index is created. Other databases fall
+    back to unindexed search.
+
+    Args:
+        connection: SQLAlchemy connection
+    """
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        for statement in POSTGRES_CREATE:
+            connection.execute(text(statement))
+        return
+
+    if dialect != "sqlite":
+        return
+
+    created = _sqlite_object_sql(connection, "table", FTS_TABLE) is None
+
+    # Insert triggers from before BulkLoader could pause them are replaced
+    insert_trigger = _sqlite_object_sql(connection, "trigger", "products_fts_insert")
+    if insert_trigger is not None and FTS_CONTROL_TABLE not in insert_trigger:
+        connection.execute(text("DROP TRIGGER products_fts_insert"))
+
+    for statement in SQLITE_CREATE:
+        connection.execute(text(statement))
+
+    if created:
+        connection.execute(text(SQLITE_REBUILD))
+
+
+@contextmanager
+def deferred_search_indexing(connection):
+    """
+    Index the products inserted inside the block with one statement.
+
+    On SQLite the per-row insert trigger is paused for the block and the
+    new rows (ids above the previous maximum) are added to the FTS5 index
+    at the end, which is several times faster for bulk inserts. Must be
+    used inside the caller's transaction, which is assumed to be the only
+    writer (as SQLite guarantees). Elsewhere it does nothing.
+
+    Args:
+        connection: SQLAlchemy connection
+    """
+    if connection.dialect.name != "sqlite" or _sqlite_object_sql(connection, "table", FTS_CONTROL_TABLE) is None:
+        yield
+        return
+
+    last_id = connection.execute(text("SELECT coalesce(max(id), 0) FROM products")).scalar()
+    connection.execute(text(f"UPDATE {FTS_CONTROL_TABLE} SET paused = 1"))
+    try:
+        yield
+        connection.execute(
+            text(
+                f"INSERT INTO {FTS_TABLE}(rowid, nombre, descripcion) "
+                "SELECT id, nombre, descripcion FROM products WHERE id > :last_id"
+            ),
+            {"last_id": last_id}
+        )
+    finally:
+        connection.execute(text(f"UPDATE {FTS_CONTROL_TABLE} SET paused = 0"))
+
+
+def _sqlite_object_sql(connection, object_type: str, name: str):
+    """Get the CREATE statement of a SQLite schema object, or None if it does not exist."""
+    return connection.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = :type AND name = :name"),
+        {"type": object_type, "name": name}
+    ).scalar()
+
+
+def drop_search_index(connection) -> None:
+    """Drop the SQLite FTS tables (triggers and PostgreSQL indexes go with the products table)."""
+    if connection.dialect.name == "sqlite":
+        connection.execute(text(f"DROP TABLE IF EXISTS {FTS_TABLE}"))
+        connection.execute(text(f"DROP TABLE IF EXISTS {FTS_CONTROL_TABLE}"))
+
+
+@event.listens_for(Product.__table__, "after_create")
+def _create_search_index(target, connection, **kw):
+    create_search_index(connection)
+
+
+@event.listens_for(Product.__table__, "before_drop")
+def _drop_search_index(target, connection, **kw):
+    drop_search_index(connection)
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, Integer, String, DateTime, Index
+from datetime import datetime
+from app.database import Base
+
+
+class ProductTombstone(Base):
+    """Record of a deleted product, published by the change feed."""
+    
+    __tablename__ = "product_tombstones"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, nullable=False, index=True)
+    nombre = Column(String(255), nullable=True)
+    categoria = Column(String(100), nullable=True)
+    deleted_at = Column(DateTime(timezone=True), default=datetime.utcnow, nullable=False, index=True)
+    change_seq = Column(Integer, nullable=True)  # Commit-ordered change sequence (see ChangeSequence)
+    
+    __table_args__ = (
+        Index('ix_product_tombstones_change_seq_id', 'change_seq', 'id'),  # Change feed
+    )
+    
+    def __repr__(self):
+        return f"<ProductTombstone(product_id={self.product_id}, deleted_at={self.deleted_at})>"
+    
+    def to_dict(self):
+        return {
+            "product_id": self.product_id,
+            "nombre": self.nombre,
+            "categoria": self.categoria,
+            "deleted_at": self.deleted_at.isoformat() if self.deleted_at else None
+        }
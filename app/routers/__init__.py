@@ -1,3 +1,3 @@
-from app.routers import auth, products, import_export
+from app.routers import auth, products, import_export, metrics
 
-__all__ = ["auth", "products", "import_export"]
+__all__ = ["auth", "products", "import_export", "metrics"]
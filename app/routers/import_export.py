@@ -1,13 +1,29 @@
-from fastapi import APIRouter, Depends, UploadFile, File, Query
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, UploadFile, File, Query, Request, Response, HTTPException, status
+from fastapi.responses import StreamingResponse, FileResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
+from typing import Optional
+from datetime import datetime
 from app.database import get_db
 from app.models.user import User
-from app.schemas.import_log import ImportResult
+from app.models.change_sequence import current_change_sequence
+from app.schemas.import_log import ImportResult, ImportProgress, ImportErrorListResponse
+from app.schemas.product import ProductFilter
+from app.schemas.export_job import ExportJobResponse
 from app.services.import_export import ImportExportService
+from app.services.export_job import ExportJobService
+from app.services.change_feed import ChangeFeedService
 from app.utils.dependencies import get_current_active_user
-import io
-from app.models.import_log import ImportLog
+from app.utils.catalog_version import get_catalog_version
+from app.utils.export_cache import get_cached_export
+from app.utils.compression import (
+    ENCODINGS,
+    MEDIA_TYPES as COMPRESSED_MEDIA_TYPES,
+    negotiate_encoding,
+    compress_stream
+)
+import os
 
 router = APIRouter(
     prefix="/products",
@@ -18,41 +34,446 @@ router = APIRouter(
 
 @router.post("/import", response_model=ImportResult)
 async def import_products(
-    file: UploadFile = File(..., description="Archivo CSV o Excel con productos"),
+    response: Response,
+    file: UploadFile = File(..., description="Archivo CSV, Excel, Parquet o Arrow IPC con productos"),
+    background: bool = Query(
+        True,
+        description="Procesar en segundo plano y retornar de inmediato el ID del log"
+    ),
+    mode: str = Query(
+        "insert",
+        description="insert: agrega todas las filas | upsert: inserta, actualiza u omite por (categoria, nombre)"
+    ),
+    sheet: Optional[str] = Query(None, description="Hoja de Excel (nombre o índice desde 0, por defecto la activa)"),
+    skip_rows: int = Query(0, ge=0, description="Filas iniciales de Excel a omitir antes del encabezado"),
+    dry_run: bool = Query(
+        False,
+        description="Solo validar; retorna un token para confirmar la importación sin volver a subir el archivo"
+    ),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Importar productos desde un archivo CSV, Excel, Parquet o Arrow IPC.
+    
+    Por defecto la importación se encola y se retorna el ID del log de inmediato
+    (HTTP 202). El avance se consulta en `/import-logs/{log_id}/progress`.
+    Use `background=false` para procesar el archivo dentro de la petición.
+    
+    Con `mode=upsert` los productos se identifican por (categoria, nombre):
+    los nuevos se insertan, los modificados se actualizan y los idénticos
+    se omiten sin escribir en la base de datos.
+    
+    Con `dry_run=true` el archivo solo se valida: se retorna el resumen y un
+    `commit_token` para importar las filas válidas en `/products/import/commit/{token}`
+    antes de que expire (`commit_expires_at`).
+    """
+    if background:
+        response.status_code = status.HTTP_202_ACCEPTED
+    
+    return await ImportExportService.import_products(
+        db,
+        file,
+        background=background,
+        mode=mode,
+        sheet=sheet,
+        skip_rows=skip_rows,
+        dry_run=dry_run
+    )
+
+
+@router.post("/import/commit/{commit_token}", response_model=ImportResult)
+async def commit_import(
+    commit_token: str,
+    response: Response,
+    background: bool = Query(
+        True,
+        description="Procesar en segundo plano y retornar de inmediato el ID del log"
+    ),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Importar productos desde un archivo CSV o Excel."""
-    return await ImportExportService.import_products(db, file)
+    """
+    Confirmar una validación previa (`dry_run=true`) e importar sus filas válidas.
+    
+    Las filas se toman del resultado de la validación, sin volver a leer ni
+    validar el archivo.
+    """
+    if background:
+        response.status_code = status.HTTP_202_ACCEPTED
+    
+    # A foreground commit writes every validated row: keep it off the event loop
+    return await run_in_threadpool(ImportExportService.commit_dry_run, db, commit_token, background=background)
+
+
+def get_export_filters(
+    categoria: Optional[str] = Query(None, description="Filtrar por categoría"),
+    nombre: Optional[str] = Query(None, description="Buscar por nombre (parcial)"),
+    precio_min: Optional[float] = Query(None, ge=0, description="Precio mínimo"),
+    precio_max: Optional[float] = Query(None, ge=0, description="Precio máximo"),
+    stock_min: Optional[int] = Query(None, ge=0, description="Stock mínimo")
+) -> ProductFilter:
+    """Filtros de exportación, iguales a los del listado de productos."""
+    return ProductFilter(
+        categoria=categoria,
+        nombre=nombre,
+        precio_min=precio_min,
+        precio_max=precio_max,
+        stock_min=stock_min
+    )
+
+
+EXPORT_COLUMNS_DESCRIPTION = (
+    "Columnas a exportar separadas por comas "
+    f"(por defecto: {','.join(ImportExportService.EXPORT_COLUMNS)})"
+)
+
+# Export format -> (media type, file extension)
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "excel": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.file", "arrow"),
+}
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check whether the request's If-None-Match header matches an ETag."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def resolve_compression(request: Request, compression: Optional[str]) -> tuple[Optional[str], bool]:
+    """
+    Resolve the compression of a streamed export.
+    
+    Returns:
+        Tuple of (encoding or None, whether it was requested as a compressed
+        file instead of negotiated as a Content-Encoding)
+    """
+    if compression is None:
+        return negotiate_encoding(request.headers.get("accept-encoding")), False
+    
+    encoding = ImportExportService.validate_compression(compression)
+    return encoding, encoding is not None
+
+
+async def build_export_response(
+    request: Request,
+    db: Session,
+    file_format: str,
+    filters: ProductFilter,
+    columns: Optional[str],
+    compression: Optional[str] = None
+) -> Response:
+    """
+    Build an export response, served from the export cache when possible.
+    
+    The ETag is derived from the export parameters and the catalog version,
+    so a matching If-None-Match is answered with 304 without querying the
+    products table. CSV exports are compressed while they stream, either as
+    a negotiated Content-Encoding or as a compressed file (`compression=`).
+    Identical concurrent exports are rendered once: CSV exports are read by
+    every request while they stream, other formats share the cached copy.
+    """
+    selected = ImportExportService.parse_export_columns(columns)
+    encoding, as_file = resolve_compression(request, compression) if file_format == "csv" else (None, False)
+    version = get_catalog_version(db)
+    key = ImportExportService.export_cache_key(
+        file_format, version, filters, selected, encoding=encoding, as_file=as_file
+    )
+    media_type, extension = EXPORT_FORMATS[file_format]
+    filename = f"productos_export.{extension}"
+    headers = {"ETag": f'"{key}"', "Cache-Control": "private, no-cache"}
+    
+    if file_format == "csv":
+        headers["Vary"] = "Accept-Encoding"
+        if as_file:
+            media_type = COMPRESSED_MEDIA_TYPES[encoding]
+            filename += ENCODINGS[encoding]
+        elif encoding:
+            headers["Content-Encoding"] = encoding
+    
+    if etag_matches(request, headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    cached = get_cached_export(key)
+    if cached:
+        return FileResponse(cached, media_type=media_type, filename=filename, headers=headers)
+    
+    if file_format == "csv":
+        headers["Content-Disposition"] = f"attachment; filename={filename}"
+        return StreamingResponse(
+            ImportExportService.share_export_stream(
+                key,
+                version,
+                db.get_bind(),
+                lambda: compress_stream(
+                    ImportExportService.export_to_csv(db.get_bind(), filters, selected),
+                    encoding
+                ),
+                suffix=f".{extension}{ENCODINGS.get(encoding, '')}"
+            ),
+            media_type=media_type,
+            headers=headers
+        )
+    
+    path, cached = await run_in_threadpool(
+        ImportExportService.render_export, db.get_bind(), file_format, filters, selected, key, version
+    )
+    if cached:
+        return FileResponse(path, media_type=media_type, filename=filename, headers=headers)
+    
+    return FileResponse(
+        path,
+        media_type=media_type,
+        filename=filename,
+        headers=headers,
+        background=BackgroundTask(os.remove, path)
+    )
 
 
 @router.get("/export/csv")
 async def export_products_csv(
+    request: Request,
+    filters: ProductFilter = Depends(get_export_filters),
+    columns: Optional[str] = Query(None, description=EXPORT_COLUMNS_DESCRIPTION),
+    compression: Optional[str] = Query(
+        None,
+        description="gzip | zstd | none: descargar un archivo comprimido (por defecto se negocia con Accept-Encoding)"
+    ),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Exportar todos los productos a formato CSV."""
-    csv_content = ImportExportService.export_to_csv(db)
+    """
+    Exportar productos a formato CSV.
     
-    return StreamingResponse(
-        io.BytesIO(csv_content),
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=productos_export.csv"}
-    )
+    Acepta los mismos filtros que el listado de productos y `columns` para
+    elegir las columnas. El archivo se genera por tandas mientras se descarga
+    (máximo `MAX_EXPORT_RECORDS` productos).
+    
+    La respuesta incluye un `ETag`; si el catálogo no cambió, `If-None-Match`
+    retorna 304 y las descargas repetidas se sirven desde caché.
+    
+    El CSV se comprime mientras se genera: con `Accept-Encoding` (gzip o zstd)
+    se envía con `Content-Encoding`, y con `compression=gzip|zstd` se descarga
+    como archivo `.csv.gz` / `.csv.zst`.
+    """
+    return await build_export_response(request, db, "csv", filters, columns, compression)
 
 
 @router.get("/export/excel")
 async def export_products_excel(
+    request: Request,
+    filters: ProductFilter = Depends(get_export_filters),
+    columns: Optional[str] = Query(None, description=EXPORT_COLUMNS_DESCRIPTION),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Exportar productos a formato Excel.
+    
+    Acepta los mismos filtros que el listado de productos y `columns` para
+    elegir las columnas. Si se supera el límite de filas de Excel, los
+    productos continúan en hojas adicionales. Admite `ETag` / `If-None-Match`.
+    """
+    return await build_export_response(request, db, "excel", filters, columns)
+
+
+@router.get("/export/parquet")
+async def export_products_parquet(
+    request: Request,
+    filters: ProductFilter = Depends(get_export_filters),
+    columns: Optional[str] = Query(None, description=EXPORT_COLUMNS_DESCRIPTION),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Exportar productos a formato Apache Parquet (requiere pyarrow).
+    
+    Acepta los mismos filtros que el listado de productos y `columns` para
+    elegir las columnas. Las columnas conservan su tipo. Admite `ETag` / `If-None-Match`.
+    """
+    return await build_export_response(request, db, "parquet", filters, columns)
+
+
+@router.get("/export/arrow")
+async def export_products_arrow(
+    request: Request,
+    filters: ProductFilter = Depends(get_export_filters),
+    columns: Optional[str] = Query(None, description=EXPORT_COLUMNS_DESCRIPTION),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Exportar productos a formato Arrow IPC (requiere pyarrow).
+    
+    Acepta los mismos filtros que el listado de productos y `columns` para
+    elegir las columnas. Las columnas conservan su tipo. Admite `ETag` / `If-None-Match`.
+    """
+    return await build_export_response(request, db, "arrow", filters, columns)
+
+
+@router.get("/export/changes")
+async def export_product_changes(
+    request: Request,
+    since: Optional[datetime] = Query(None, description="Cambios realizados desde esta fecha (ISO 8601, UTC si no tiene zona)"),
+    cursor: Optional[str] = Query(None, description="Cursor devuelto por la exportación anterior (tiene prioridad sobre since)"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Exportar de forma incremental los cambios de productos como NDJSON.
+    
+    Envía una línea por cambio (`op` `upsert` o `delete`) desde `since` o desde
+    `cursor`, sin paginar. La cabecera `X-Next-Cursor` contiene el cursor para
+    pedir sólo los cambios posteriores en la siguiente exportación. Admite
+    compresión con `Accept-Encoding`.
+    """
+    until = current_change_sequence(db)
+    position = ChangeFeedService.start_position(db, until, since, cursor)
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    headers = {
+        "Vary": "Accept-Encoding",
+        "X-Next-Cursor": ChangeFeedService.encode_cursor(ChangeFeedService.end_position(position, until))
+    }
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    
+    return StreamingResponse(
+        compress_stream(ChangeFeedService.stream_changes(db.get_bind(), position, until), encoding),
+        media_type="application/x-ndjson",
+        headers=headers
+    )
+
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[tuple[int, int]]:
+    """
+    Parse a single-range "bytes=" Range header.
+    
+    Returns:
+        Inclusive (start, end) byte offsets, or None to send the whole file
+        
+    Raises:
+        HTTPException: 416 if the range cannot be satisfied
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    
+    start, _, end = range_header[len("bytes="):].strip().partition("-")
+    try:
+        if start:
+            first = int(start)
+            last = min(int(end), size - 1) if end else size - 1
+        else:
+            first = max(size - int(end), 0)  # Suffix range: last N bytes
+            last = size - 1
+    except ValueError:
+        return None
+    
+    if first > last or first >= size:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Rango no válido",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    
+    return first, last
+
+
+def iter_file_range(path: str, start: int, end: int, block_size: int = 1024 * 1024):
+    """Read the inclusive byte range [start, end] of a file in blocks."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            block = f.read(min(block_size, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+
+@router.post(
+    "/export/jobs",
+    response_model=ExportJobResponse,
+    status_code=status.HTTP_202_ACCEPTED
+)
+async def submit_export_job(
+    format: str = Query("csv", description="csv | excel | parquet | arrow"),
+    filters: ProductFilter = Depends(get_export_filters),
+    columns: Optional[str] = Query(None, description=EXPORT_COLUMNS_DESCRIPTION),
+    compression: Optional[str] = Query(None, description="gzip | zstd (solo CSV)"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Exportar todos los productos a formato Excel."""
-    excel_content = ImportExportService.export_to_excel(db)
+    """
+    Encolar una exportación para catálogos grandes.
     
+    Retorna de inmediato el ID del trabajo. El archivo se genera en segundo
+    plano; el avance se consulta en `/products/export/jobs/{job_id}` y el
+    archivo terminado se descarga en `/products/export/jobs/{job_id}/download`
+    hasta que expire (`EXPORT_JOB_TTL_SECONDS`).
+    """
+    return ExportJobService.submit_export(db, format, filters, columns, compression)
+
+
+@router.get("/export/jobs/{job_id}", response_model=ExportJobResponse)
+async def get_export_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Consultar el estado y el avance de un trabajo de exportación."""
+    return ExportJobService.build_job_status(ExportJobService.get_job(db, job_id))
+
+
+@router.get("/export/jobs/{job_id}/download")
+async def download_export_job(
+    job_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Descargar el archivo de un trabajo de exportación terminado.
+    
+    Admite el header `Range` (un solo rango de bytes) para reanudar descargas
+    interrumpidas. Si el filtro coincidía con más de `MAX_EXPORT_RECORDS`
+    productos, el archivo contiene solo los primeros y la respuesta incluye
+    el header `X-Export-Truncated: true` (y el estado del trabajo `truncated`).
+    """
+    job = ExportJobService.get_downloadable_job(db, job_id)
+    filename = ExportJobService.file_name(job)
+    media_type = (
+        COMPRESSED_MEDIA_TYPES[job.compression] if job.compression
+        else EXPORT_FORMATS[job.format][0]
+    )
+    size = os.path.getsize(job.file_path)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f"attachment; filename={filename}"
+    }
+    if job.truncated:
+        headers["X-Export-Truncated"] = "true"
+    
+    byte_range = parse_range(request.headers.get("range"), size)
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(iter_file_range(job.file_path, 0, size - 1), media_type=media_type, headers=headers)
+    
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
     return StreamingResponse(
-        io.BytesIO(excel_content),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": "attachment; filename=productos_export.xlsx"}
+        iter_file_range(job.file_path, start, end),
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        media_type=media_type,
+        headers=headers
     )
 
 
@@ -81,11 +502,20 @@ async def get_import_logs(
             {
                 "id": log.id,
                 "filename": log.filename,
+                "mode": log.mode,
+                "dry_run": log.dry_run,
+                "commit_expires_at": str(log.commit_expires_at) if log.commit_expires_at else None,
                 "total_rows": log.total_rows,
                 "successful_rows": log.successful_rows,
                 "failed_rows": log.failed_rows,
-                "errors": log.errors,
+                "expected_rows": log.expected_rows,
+                "inserted_rows": log.inserted_rows,
+                "updated_rows": log.updated_rows,
+                "unchanged_rows": log.unchanged_rows,
+                "superseded_rows": log.superseded_rows,
+                "checkpoint_rows": log.checkpoint_rows,
                 "status": log.status,
+                "error_message": log.error_message,
                 "started_at": str(log.started_at) if log.started_at else None,
                 "completed_at": str(log.completed_at) if log.completed_at else None
             }
@@ -93,6 +523,68 @@ async def get_import_logs(
         ]
     }
 
+@logs_router.get("/import-logs/{log_id}/progress", response_model=ImportProgress)
+async def get_import_progress(
+    log_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Consultar el progreso de una importación.
+    
+    Retorna filas procesadas, filas por segundo y tiempo estimado restante (ETA)
+    mientras la importación está en estado `processing`.
+    """
+    return ImportExportService.get_import_progress(db, log_id)
+
+
+@logs_router.get("/import-logs/{log_id}/errors", response_model=ImportErrorListResponse)
+async def get_import_errors(
+    log_id: int,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Obtener los errores por fila de una importación, paginados y ordenados por fila.
+    
+    Cada registro indica la fila, el campo, el valor original y el mensaje de error.
+    """
+    errors, total = ImportExportService.get_import_errors(db, log_id, skip, limit)
+    
+    return {
+        "total": total,
+        "skip": skip,
+        "limit": limit,
+        "items": errors
+    }
+
+
+@logs_router.post("/import-logs/{log_id}/resume", response_model=ImportResult)
+async def resume_import(
+    log_id: int,
+    response: Response,
+    background: bool = Query(
+        True,
+        description="Procesar en segundo plano y retornar de inmediato el ID del log"
+    ),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Reanudar una importación fallida desde su último punto de control.
+    
+    Continúa con el archivo original almacenado a partir de la última tanda
+    confirmada, sin volver a insertar las filas ya importadas.
+    """
+    if background:
+        response.status_code = status.HTTP_202_ACCEPTED
+    
+    # Hashing the stored file (and a foreground import) must not block the event loop
+    return await run_in_threadpool(ImportExportService.resume_import, db, log_id, background=background)
+
+
 @router.get("/import-logs/{log_id}/download-errors")
 async def download_import_errors(
     log_id: int,
@@ -101,57 +593,21 @@ async def download_import_errors(
 ):
     """
     Descargar los registros fallidos de una importación específica en formato CSV.
-    """
-    # Obtener el log
-    import_log = db.query(ImportLog).filter(ImportLog.id == log_id).first()
     
-    if not import_log:
-        from fastapi import HTTPException, status
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Log de importación no encontrado"
-        )
+    El archivo se genera por tandas desde la base de datos mientras se descarga.
+    """
+    import_log = ImportExportService.get_import_log(db, log_id)
     
-    if not import_log.errors or import_log.failed_rows == 0:
-        from fastapi import HTTPException, status
+    if not ImportExportService.has_import_errors(db, import_log):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No hay errores registrados en esta importación"
         )
     
-    # Parsear errores
-    import json
-    try:
-        errors = json.loads(import_log.errors)
-    except:
-        errors = []
-    
-    # Crear CSV con los errores
-    import csv
-    from io import StringIO
-    
-    output = StringIO()
-    writer = csv.writer(output)
-    
-    # Header
-    writer.writerow(['Fila', 'Campo', 'Valor', 'Error'])
-    
-    # Datos
-    for error in errors:
-        writer.writerow([
-            error.get('row', 'N/A'),
-            error.get('field', 'N/A'),
-            error.get('value', 'N/A'),
-            error.get('error', 'N/A')
-        ])
-    
-    # Convertir a bytes
-    csv_content = output.getvalue().encode('utf-8')
-    
     return StreamingResponse(
-        io.BytesIO(csv_content),
+        ImportExportService.iter_import_errors_csv(db.get_bind(), log_id),
         media_type="text/csv",
         headers={
             "Content-Disposition": f"attachment; filename=errores_importacion_{log_id}.csv"
         }
-    )
\ No newline at end of file
+    )
@@ -0,0 +1,36 @@
+from fastapi import APIRouter, Depends
+from app.models.user import User
+from app.utils.dependencies import get_current_active_user
+from app.utils.single_flight import get_single_flight_stats
+from app.utils.cache import get_cache_stats
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["Métricas"],
+    dependencies=[Depends(get_current_active_user)]
+)
+
+
+@router.get("/single-flight")
+async def get_single_flight_metrics(
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Obtener los contadores de agrupación de peticiones idénticas concurrentes.
+    
+    Para cada grupo (exportaciones y listados de productos):
+    - executions: cálculos realmente ejecutados
+    - coalesced: peticiones atendidas con el resultado de otra petición en curso
+    - in_flight: cálculos en curso en este momento
+    """
+    return get_single_flight_stats()
+
+
+@router.get("/caches")
+async def get_cache_metrics(
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Obtener los contadores de las cachés en memoria (aciertos, fallos y entradas).
+    """
+    return get_cache_stats()
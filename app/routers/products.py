@@ -1,16 +1,22 @@
-from fastapi import APIRouter, Depends, Query, status
+from fastapi import APIRouter, Depends, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import Optional
+from datetime import datetime
 from app.database import get_db
 from app.models.user import User
 from app.schemas.product import (
     ProductCreate,
     ProductUpdate,
     ProductResponse,
-    ProductListResponse
+    ProductListResponse,
+    ProductFilter,
+    ProductChangeListResponse
 )
 from app.services.product import ProductService
+from app.services.change_feed import ChangeFeedService
 from app.utils.dependencies import get_current_active_user
+from app.utils.compression import negotiate_encoding, compress_stream
 from app.config import settings
 
 router = APIRouter(
@@ -21,7 +27,7 @@ router = APIRouter(
 
 
 @router.get("", response_model=ProductListResponse)
-async def get_products(
+def get_products(
     skip: int = Query(0, ge=0, description="Número de registros a omitir"),
     limit: int = Query(
         settings.DEFAULT_PAGE_SIZE,
@@ -34,6 +40,14 @@ async def get_products(
     precio_min: Optional[float] = Query(None, ge=0, description="Precio mínimo"),
     precio_max: Optional[float] = Query(None, ge=0, description="Precio máximo"),
     stock_min: Optional[int] = Query(None, ge=0, description="Stock mínimo"),
+    q: Optional[str] = Query(None, description="Búsqueda de texto completo en nombre y descripción"),
+    sort_by: Optional[str] = Query(
+        None,
+        description="Ordenar por: id, nombre, precio, stock o relevance (con q). Default: relevance con q, id sin q"
+    ),
+    sort_order: str = Query("asc", description="asc | desc"),
+    cursor: Optional[str] = Query(None, description="Cursor de la página siguiente (next_cursor de la respuesta anterior)"),
+    include_total: str = Query("exact", description="exact | estimate | false: cómo calcular el total"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
@@ -46,30 +60,113 @@ async def get_products(
     - precio_min: Productos con precio mayor o igual al especificado
     - precio_max: Productos con precio menor o igual al especificado
     - stock_min: Productos con stock mayor o igual al especificado
+    - q: Búsqueda de texto completo (indexada) en nombre y descripción; cada
+      palabra debe aparecer, también como prefijo ("lap" encuentra "Laptop")
+    
+    **Orden:**
+    - sort_by: id, nombre, precio, stock o relevance (default: relevance con q, id sin q;
+      los empates se ordenan por id)
+    - sort_order: asc o desc (default: asc)
     
     **Paginación:**
     - skip: Número de registros a omitir (default: 0)
     - limit: Número máximo de registros a retornar (default: 50, máx: 1000)
+    - cursor: `next_cursor` de la respuesta anterior. Recomendado para recorrer
+      páginas profundas: cada página cuesta lo mismo que la primera. Con cursor
+      se ignora `skip`; mantenga los mismos filtros y orden.
+    
+    **Total:**
+    - include_total=exact: conteo exacto (default), en caché hasta el siguiente cambio del catálogo
+    - include_total=estimate: estimación rápida a partir de estadísticas por categoría
+      (`total_estimated=true`; con `nombre` o `q` se cuenta de forma exacta)
+    - include_total=false: no calcula el total (`total=null`)
+    
+    Las respuestas se guardan en caché hasta el siguiente cambio del catálogo
+    (alta, modificación, eliminación o importación de productos).
     """
-    products, total = ProductService.get_products(
+    payload = ProductService.get_listing_payload(
         db=db,
         skip=skip,
         limit=limit,
+        categoria=categoria,
+        nombre=nombre,
+        precio_min=precio_min,
+        precio_max=precio_max,
+        stock_min=stock_min,
+        sort_by=sort_by,
+        sort_order=sort_order,
+        cursor=cursor,
+        q=q,
+        include_total=include_total
+    )
+    
+    return Response(content=payload, media_type="application/json")
+
+
+@router.get("/stream")
+async def stream_products(
+    request: Request,
+    categoria: Optional[str] = Query(None, description="Filtrar por categoría"),
+    nombre: Optional[str] = Query(None, description="Buscar por nombre (parcial)"),
+    precio_min: Optional[float] = Query(None, ge=0, description="Precio mínimo"),
+    precio_max: Optional[float] = Query(None, ge=0, description="Precio máximo"),
+    stock_min: Optional[int] = Query(None, ge=0, description="Stock mínimo"),
+    q: Optional[str] = Query(None, description="Búsqueda de texto completo en nombre y descripción"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Obtener todos los productos filtrados como JSON delimitado por saltos de línea (NDJSON).
+    
+    Pensado para lecturas masivas de otros sistemas: acepta los mismos filtros
+    que el listado (incluida la búsqueda `q`), no pagina ni cuenta, y envía un
+    producto por línea, ordenados por id, a medida que se leen de la base de
+    datos. Admite compresión con `Accept-Encoding`.
+    """
+    filters = ProductFilter(
         categoria=categoria,
         nombre=nombre,
         precio_min=precio_min,
         precio_max=precio_max,
         stock_min=stock_min
     )
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
     
-    return ProductListResponse(
-        total=total,
-        skip=skip,
-        limit=limit,
-        items=products
+    return StreamingResponse(
+        compress_stream(ProductService.stream_products(db.get_bind(), filters, q), encoding),
+        media_type="application/x-ndjson",
+        headers=headers
     )
 
 
+@router.get("/changes", response_model=ProductChangeListResponse)
+async def get_product_changes(
+    since: Optional[datetime] = Query(None, description="Cambios realizados desde esta fecha (ISO 8601, UTC si no tiene zona)"),
+    cursor: Optional[str] = Query(None, description="Cursor devuelto por la página anterior (tiene prioridad sobre since)"),
+    limit: int = Query(
+        settings.DEFAULT_PAGE_SIZE,
+        ge=1,
+        le=settings.MAX_PAGE_SIZE,
+        description="Número máximo de cambios a retornar"
+    ),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Obtener los cambios de productos (altas, modificaciones y eliminaciones) para sincronización.
+    
+    Cada cambio trae `op` (`upsert` con el producto completo, o `delete` con el
+    id eliminado) y `changed_at`. Guarde `next_cursor` y envíelo en la siguiente
+    llamada: con `has_more` en false ya no hay más cambios por ahora, y el mismo
+    cursor devolverá los cambios posteriores. Sin `since` ni `cursor` se lee
+    desde el principio.
+    """
+    return ChangeFeedService.get_changes(db, since=since, cursor=cursor, limit=limit)
+
+
 @router.get("/{product_id}", response_model=ProductResponse)
 async def get_product(
     product_id: int,
@@ -79,7 +176,10 @@ async def get_product(
     """
     Obtener un producto específico por ID.
     """
-    return ProductService.get_product(db, product_id)
+    return Response(
+        content=ProductService.get_product_payload(db, product_id),
+        media_type="application/json"
+    )
 
 
 @router.post("", response_model=ProductResponse, status_code=status.HTTP_201_CREATED)
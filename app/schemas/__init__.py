@@ -10,13 +10,19 @@ from app.schemas.product import (
     ProductUpdate,
     ProductResponse,
     ProductListResponse,
-    ProductFilter
+    ProductFilter,
+    ProductChange,
+    ProductChangeListResponse
 )
 from app.schemas.import_log import (
     ImportLogResponse,
     ImportLogListResponse,
-    ImportResult
+    ImportResult,
+    ImportErrorResponse,
+    ImportErrorListResponse,
+    ImportProgress
 )
+from app.schemas.export_job import ExportJobResponse
 
 __all__ = [
     "UserCreate",
@@ -29,7 +35,13 @@ __all__ = [
     "ProductResponse",
     "ProductListResponse",
     "ProductFilter",
+    "ProductChange",
+    "ProductChangeListResponse",
     "ImportLogResponse",
     "ImportLogListResponse",
-    "ImportResult"
+    "ImportResult",
+    "ImportErrorResponse",
+    "ImportErrorListResponse",
+    "ImportProgress",
+    "ExportJobResponse"
 ]
@@ -0,0 +1,21 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional
+
+
+class ExportJobResponse(BaseModel):
+    id: int
+    format: str
+    compression: Optional[str] = None
+    columns: Optional[str] = None
+    status: str
+    expected_rows: Optional[int] = None
+    rows_written: int = 0
+    truncated: bool = False
+    percent: Optional[float] = None
+    file_size: Optional[int] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
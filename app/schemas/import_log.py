@@ -6,10 +6,22 @@ from typing import Optional, List
 class ImportLogResponse(BaseModel):
     id: int
     filename: str
+    mode: str = "insert"
+    dry_run: bool = False
+    commit_expires_at: Optional[datetime] = None
+    sheet_name: Optional[str] = None
+    skip_rows: int = 0
     total_rows: int
     successful_rows: int
     failed_rows: int
+    expected_rows: Optional[int] = None
+    inserted_rows: int = 0
+    updated_rows: int = 0
+    unchanged_rows: int = 0
+    superseded_rows: int = 0
+    checkpoint_rows: int = 0
     errors: Optional[str] = None
+    error_message: Optional[str] = None
     status: str
     started_at: datetime
     completed_at: Optional[datetime] = None
@@ -28,9 +40,54 @@ class ImportLogListResponse(BaseModel):
 class ImportResult(BaseModel):
     log_id: int
     filename: str
+    mode: str = "insert"
+    dry_run: bool = False
+    commit_token: Optional[str] = None
+    commit_expires_at: Optional[datetime] = None
     total_rows: int
     successful_rows: int
     failed_rows: int
+    inserted_rows: int = 0
+    updated_rows: int = 0
+    unchanged_rows: int = 0
+    superseded_rows: int = 0
     status: str
     message: str
     errors: Optional[List[dict]] = None
+
+
+class ImportErrorResponse(BaseModel):
+    row: int
+    field: Optional[str] = None
+    value: Optional[str] = None
+    message: str
+    
+    class Config:
+        from_attributes = True
+
+
+class ImportErrorListResponse(BaseModel):
+    total: int
+    skip: int
+    limit: int
+    items: List[ImportErrorResponse]
+
+
+class ImportProgress(BaseModel):
+    log_id: int
+    filename: str
+    status: str
+    rows_processed: int
+    expected_rows: Optional[int] = None
+    successful_rows: int
+    failed_rows: int
+    inserted_rows: int = 0
+    updated_rows: int = 0
+    unchanged_rows: int = 0
+    superseded_rows: int = 0
+    percent: Optional[float] = None
+    rows_per_second: Optional[float] = None
+    eta_seconds: Optional[float] = None
+    error_message: Optional[str] = None
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
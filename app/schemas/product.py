@@ -57,10 +57,12 @@ class ProductResponse(ProductBase):
 
 
 class ProductListResponse(BaseModel):
-    total: int
+    total: Optional[int] = Field(None, description="Total de productos filtrados (None con include_total=false)")
+    total_estimated: bool = Field(False, description="Indica si total es una estimación")
     skip: int
     limit: int
     items: List[ProductResponse]
+    next_cursor: Optional[str] = Field(None, description="Cursor de la página siguiente (None en la última)")
 
 
 class ProductFilter(BaseModel):
@@ -69,3 +71,20 @@ class ProductFilter(BaseModel):
     precio_min: Optional[float] = None
     precio_max: Optional[float] = None
     stock_min: Optional[int] = None
+
+
+class ProductChange(BaseModel):
+    op: str = Field(..., description="Tipo de cambio: upsert o delete")
+    id: int
+    changed_at: datetime
+    nombre: Optional[str] = None
+    descripcion: Optional[str] = None
+    precio: Optional[float] = None
+    stock: Optional[int] = None
+    categoria: Optional[str] = None
+
+
+class ProductChangeListResponse(BaseModel):
+    items: List[ProductChange]
+    next_cursor: str
+    has_more: bool
@@ -1,5 +1,19 @@
 from app.services.auth import AuthService
 from app.services.product import ProductService
 from app.services.import_export import ImportExportService
+from app.services.validation import ImportValidationService
+from app.services.bulk_loader import BulkLoader
+from app.services.export_job import ExportJobService
+from app.services.change_feed import ChangeFeedService
+from app.services.search import ProductSearchService
 
-__all__ = ["AuthService", "ProductService", "ImportExportService"]
+__all__ = [
+    "AuthService",
+    "ProductService",
+    "ImportExportService",
+    "ImportValidationService",
+    "BulkLoader",
+    "ExportJobService",
+    "ChangeFeedService",
+    "ProductSearchService"
+]
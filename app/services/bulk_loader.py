@@ -0,0 +1,256 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import insert, update, select, tuple_, bindparam
+from typing import List, Union
+import pandas as pd
+import io
+from app.models.product import Product
+from app.models.change_sequence import next_change_sequence
+from app.models.product_search import deferred_search_indexing
+from app.utils.hashing import dataframe_content_hashes
+
+
+class BulkLoader:
+    """
+    Dialect-aware bulk insertion of products.
+    
+    - PostgreSQL: COPY FROM STDIN through the psycopg2 connection.
+    - Other databases (SQLite): Core insert() executed as a single
+      executemany, with no ORM objects involved. The FTS5 search index is
+      updated once per call instead of by a trigger per row.
+    
+    Rows are written inside the session's current transaction; committing
+    is left to the caller so a whole chunk (plus its import log update) is
+    stored atomically. Every call stamps the rows it writes with the next
+    change sequence value, for the change feed.
+    """
+    
+    COLUMNS = ['nombre', 'descripcion', 'precio', 'stock', 'categoria', 'content_hash', 'change_seq']
+    NATURAL_KEY = ['categoria', 'nombre']
+    UPDATE_COLUMNS = ['descripcion', 'precio', 'stock']  # Columns an upsert may change
+    NULL_MARKER = '\\N'
+    LOOKUP_BATCH_SIZE = 500  # Natural keys per lookup query
+    
+    @staticmethod
+    def get_dialect(db: Session) -> str:
+        """
+        Get the dialect name of the session's database.
+        
+        Args:
+            db: Database session
+        
+        Returns:
+            Dialect name (e.g. "sqlite", "postgresql")
+        """
+        return db.get_bind().dialect.name
+    
+    @staticmethod
+    def prepare(rows: Union[pd.DataFrame, List[dict]]) -> pd.DataFrame:
+        """
+        Build a DataFrame with the product columns and their content hash.
+        
+        Args:
+            rows: DataFrame or list of dictionaries with product columns
+        
+        Returns:
+            DataFrame with COLUMNS
+        """
+        df = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows)
+        df = df.reindex(columns=BulkLoader.COLUMNS)
+        
+        # Missing descriptions are stored as NULL, never as NaN
+        df['descripcion'] = df['descripcion'].astype(object).where(df['descripcion'].notna(), None)
+        df['content_hash'] = df['content_hash'].astype(object)
+        
+        missing = df['content_hash'].isna()
+        if missing.any():
+            df.loc[missing, 'content_hash'] = dataframe_content_hashes(df[missing])
+        
+        return df
+    
+    @staticmethod
+    def load(db: Session, rows: Union[pd.DataFrame, List[dict]]) -> int:
+        """
+        Insert products using the fastest path for the configured database.
+        
+        Args:
+            db: Database session
+            rows: DataFrame or list of dictionaries with product columns
+        
+        Returns:
+            Number of products inserted
+        """
+        if len(rows) == 0:
+            return 0
+        
+        if BulkLoader.get_dialect(db) == 'postgresql':
+            return BulkLoader.copy_postgres(db, rows)
+        
+        return BulkLoader.insert_many(db, rows)
+    
+    @staticmethod
+    def insert_many(db: Session, rows: Union[pd.DataFrame, List[dict]]) -> int:
+        """
+        Insert products with a Core executemany.
+        
+        On SQLite the inserted rows are added to the search index in one
+        statement after the insert (see deferred_search_indexing).
+        
+        Args:
+            db: Database session
+            rows: DataFrame or list of dictionaries with product columns
+        
+        Returns:
+            Number of products inserted
+        """
+        df = BulkLoader.prepare(rows)
+        df['change_seq'] = next_change_sequence(db)
+        rows = df.to_dict('records')
+        
+        with deferred_search_indexing(db.connection()):
+            db.execute(insert(Product.__table__), rows)
+        
+        return len(rows)
+    
+    @staticmethod
+    def copy_postgres(db: Session, rows: Union[pd.DataFrame, List[dict]]) -> int:
+        """
+        Insert products with PostgreSQL COPY FROM STDIN.
+        
+        Falls back to executemany if the driver has no copy support.
+        
+        Args:
+            db: Database session
+            rows: DataFrame or list of dictionaries with product columns
+        
+        Returns:
+            Number of products inserted
+        """
+        dbapi_connection = db.connection().connection
+        cursor = dbapi_connection.cursor()
+        
+        try:
+            if not hasattr(cursor, 'copy_expert'):
+                return BulkLoader.insert_many(db, rows)
+            
+            df = BulkLoader.prepare(rows)
+            df['change_seq'] = next_change_sequence(db)
+            buffer = io.StringIO()
+            df.to_csv(
+                buffer, header=False, index=False, na_rep=BulkLoader.NULL_MARKER
+            )
+            buffer.seek(0)
+            
+            cursor.copy_expert(
+                f"COPY {Product.__tablename__} ({', '.join(BulkLoader.COLUMNS)}) "
+                f"FROM STDIN WITH (FORMAT csv, NULL '{BulkLoader.NULL_MARKER}')",
+                buffer
+            )
+            
+            return len(df)
+        
+        finally:
+            cursor.close()
+    
+    @staticmethod
+    def upsert(db: Session, rows: Union[pd.DataFrame, List[dict]]) -> tuple[int, int, int, int]:
+        """
+        Insert new products, update changed ones and skip identical ones.
+        
+        Products are matched on the (categoria, nombre) natural key, which is
+        covered by the ix_products_categoria_nombre index. Rows whose content
+        hash matches the stored one cost no writes, and updates only write
+        the columns that changed (so, e.g., the search index is not touched
+        by price or stock changes). If the same key appears more than once in
+        rows, the last occurrence wins and the earlier ones are superseded.
+        
+        Args:
+            db: Database session
+            rows: DataFrame or list of dictionaries with product columns
+        
+        Returns:
+            Tuple of (inserted, updated, unchanged, superseded) row counts
+        """
+        df = BulkLoader.prepare(rows)
+        if df.empty:
+            return 0, 0, 0, 0
+        
+        unique = df.drop_duplicates(subset=BulkLoader.NATURAL_KEY, keep='last')
+        superseded = len(df) - len(unique)
+        
+        # Look up existing products by natural key
+        existing = {}
+        keys = list(zip(unique['categoria'], unique['nombre']))
+        for start in range(0, len(keys), BulkLoader.LOOKUP_BATCH_SIZE):
+            batch = keys[start:start + BulkLoader.LOOKUP_BATCH_SIZE]
+            result = db.execute(
+                select(
+                    Product.id, Product.categoria, Product.nombre, Product.content_hash,
+                    *[getattr(Product, column) for column in BulkLoader.UPDATE_COLUMNS]
+                )
+                .where(tuple_(Product.categoria, Product.nombre).in_(batch))
+            )
+            for product_id, categoria, nombre, content_hash, *values in result:
+                existing.setdefault((categoria, nombre), []).append((product_id, content_hash, values))
+        
+        new_rows = []
+        # Changed column names -> parameters of the products to update
+        changed_rows = {}
+        rehashed_rows = []
+        updated = 0
+        unchanged = 0
+        for row in unique.to_dict('records'):
+            matches = existing.get((row['categoria'], row['nombre']))
+            if not matches:
+                new_rows.append(row)
+                continue
+            
+            changed = False
+            for product_id, content_hash, values in matches:
+                if content_hash == row['content_hash']:
+                    continue
+                
+                columns = tuple(
+                    column for column, value in zip(BulkLoader.UPDATE_COLUMNS, values)
+                    if value != row[column]
+                )
+                parameters = {'b_id': product_id, 'b_content_hash': row['content_hash']}
+                if not columns:
+                    # Same content under an outdated hash: no change to record
+                    rehashed_rows.append(parameters)
+                    continue
+                
+                changed = True
+                parameters.update({f'b_{column}': row[column] for column in columns})
+                changed_rows.setdefault(columns, []).append(parameters)
+            
+            if changed:
+                updated += 1
+            else:
+                unchanged += 1
+        
+        inserted = BulkLoader.load(db, new_rows) if new_rows else 0
+        
+        table = Product.__table__
+        if changed_rows:
+            change_seq = next_change_sequence(db)
+            for columns, parameters in changed_rows.items():
+                db.execute(
+                    update(table)
+                    .where(table.c.id == bindparam('b_id'))
+                    .values(
+                        **{column: bindparam(f'b_{column}') for column in columns},
+                        content_hash=bindparam('b_content_hash'),
+                        change_seq=change_seq
+                    ),
+                    parameters
+                )
+        
+        if rehashed_rows:
+            db.execute(
+                update(table)
+                .where(table.c.id == bindparam('b_id'))
+                .values(content_hash=bindparam('b_content_hash')),
+                rehashed_rows
+            )
+        
+        return inserted, updated, unchanged, superseded
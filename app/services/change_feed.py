@@ -0,0 +1,269 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, func, and_, or_
+from fastapi import HTTPException, status
+from typing import Dict, Iterator, List, Optional
+from datetime import datetime, timezone
+import json
+from app.config import settings
+from app.database import SessionLocal
+from app.models.change_sequence import current_change_sequence
+from app.models.product import Product
+from app.models.product_tombstone import ProductTombstone
+from app.utils.cursor import encode_cursor, decode_cursor
+
+
+class ChangeFeedService:
+    """
+    Incremental feed of product changes: upserts and deletes (tombstones).
+    
+    Changes are ordered by (change_seq, kind, key) and read with keyset
+    conditions on the indexed products.change_seq and
+    product_tombstones.change_seq columns. The sequence is handed out in
+    commit order (see ChangeSequence), so reading up to the last committed
+    value never skips a change that commits later, however long its
+    transaction runs. A position in the feed is handed to clients as an
+    opaque cursor.
+    """
+    
+    UPSERT = 0
+    DELETE = 1
+    
+    @staticmethod
+    def encode_cursor(position: tuple) -> str:
+        """
+        Encode a feed position as an opaque cursor.
+        
+        Args:
+            position: Tuple of (change_seq, kind, key)
+            
+        Returns:
+            URL-safe cursor string
+        """
+        change_seq, kind, key = position
+        return encode_cursor({"s": change_seq, "k": kind, "i": key})
+    
+    @staticmethod
+    def decode_cursor(cursor: str) -> tuple:
+        """
+        Decode an opaque cursor into a feed position.
+        
+        Args:
+            cursor: Cursor returned by a previous read
+            
+        Returns:
+            Tuple of (change_seq, kind, key)
+            
+        Raises:
+            HTTPException: If the cursor is not valid
+        """
+        try:
+            payload = decode_cursor(cursor)
+            return int(payload["s"]), int(payload["k"]), int(payload["i"])
+        except (ValueError, KeyError, TypeError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Cursor no válido"
+            )
+    
+    @staticmethod
+    def start_position(
+        db: Session,
+        until: int,
+        since: Optional[datetime] = None,
+        cursor: Optional[str] = None
+    ) -> tuple:
+        """
+        Get the feed position to read from.
+        
+        Args:
+            db: Database session
+            until: Last committed change sequence value
+            since: Start at the first transaction that changed products at or
+                after this time
+            cursor: Cursor returned by a previous read (takes precedence)
+            
+        Returns:
+            Tuple of (change_seq, kind, key)
+        """
+        if cursor:
+            return ChangeFeedService.decode_cursor(cursor)
+        
+        if since is None:
+            return 0, -1, 0
+        
+        # Timestamps are stored as naive UTC
+        if since.tzinfo is not None:
+            since = since.astimezone(timezone.utc).replace(tzinfo=None)
+        
+        first = [
+            db.execute(select(func.min(Product.change_seq)).where(Product.updated_at >= since)).scalar(),
+            db.execute(
+                select(func.min(ProductTombstone.change_seq)).where(ProductTombstone.deleted_at >= since)
+            ).scalar(),
+        ]
+        first = [change_seq for change_seq in first if change_seq is not None]
+        if not first:
+            return ChangeFeedService.end_position((0, -1, 0), until)
+        
+        return min(first), -1, 0
+    
+    @staticmethod
+    def end_position(position: tuple, until: int) -> tuple:
+        """Get the position after every change up to a committed sequence value."""
+        return max(position, (until, ChangeFeedService.DELETE + 1, 0))
+    
+    @staticmethod
+    def _after(change_seq, key, kind: int, position: tuple):
+        """Build the keyset condition for rows of one kind after a position."""
+        position_seq, position_kind, position_key = position
+        
+        if kind > position_kind:
+            return change_seq >= position_seq
+        if kind < position_kind:
+            return change_seq > position_seq
+        return or_(change_seq > position_seq, and_(change_seq == position_seq, key > position_key))
+    
+    @staticmethod
+    def read_changes(db: Session, position: tuple, until: int, limit: int) -> tuple[List[tuple], bool]:
+        """
+        Read the changes after a position, up to a committed sequence value.
+        
+        Args:
+            db: Database session
+            position: Feed position to read after
+            until: Last change sequence value to include
+            limit: Maximum number of changes
+            
+        Returns:
+            Tuple of (list of (position, change) tuples in feed order, whether
+            more changes remain)
+        """
+        products = db.execute(
+            select(
+                Product.id, Product.nombre, Product.descripcion, Product.precio,
+                Product.stock, Product.categoria, Product.updated_at, Product.change_seq
+            )
+            .where(
+                ChangeFeedService._after(Product.change_seq, Product.id, ChangeFeedService.UPSERT, position),
+                Product.change_seq <= until
+            )
+            .order_by(Product.change_seq, Product.id)
+            .limit(limit + 1)
+        ).all()
+        
+        tombstones = db.execute(
+            select(
+                ProductTombstone.id, ProductTombstone.product_id, ProductTombstone.nombre,
+                ProductTombstone.categoria, ProductTombstone.deleted_at, ProductTombstone.change_seq
+            )
+            .where(
+                ChangeFeedService._after(
+                    ProductTombstone.change_seq, ProductTombstone.id, ChangeFeedService.DELETE, position
+                ),
+                ProductTombstone.change_seq <= until
+            )
+            .order_by(ProductTombstone.change_seq, ProductTombstone.id)
+            .limit(limit + 1)
+        ).all()
+        
+        changes = [
+            (
+                (change_seq, ChangeFeedService.UPSERT, product_id),
+                {
+                    "op": "upsert",
+                    "id": product_id,
+                    "nombre": nombre,
+                    "descripcion": descripcion,
+                    "precio": precio,
+                    "stock": stock,
+                    "categoria": categoria,
+                    "changed_at": updated_at
+                }
+            )
+            for product_id, nombre, descripcion, precio, stock, categoria, updated_at, change_seq in products
+        ]
+        changes.extend(
+            (
+                (change_seq, ChangeFeedService.DELETE, tombstone_id),
+                {
+                    "op": "delete",
+                    "id": product_id,
+                    "nombre": nombre,
+                    "categoria": categoria,
+                    "changed_at": deleted_at
+                }
+            )
+            for tombstone_id, product_id, nombre, categoria, deleted_at, change_seq in tombstones
+        )
+        changes.sort(key=lambda change: change[0])
+        
+        return changes[:limit], len(changes) > limit
+    
+    @staticmethod
+    def get_changes(
+        db: Session,
+        since: Optional[datetime] = None,
+        cursor: Optional[str] = None,
+        limit: int = 1000
+    ) -> Dict:
+        """
+        Get a page of product changes.
+        
+        Args:
+            db: Database session
+            since: Return changes made at or after this time
+            cursor: Cursor returned by a previous page (takes precedence)
+            limit: Maximum number of changes to return
+            
+        Returns:
+            Dictionary with the changes, the cursor to continue from and
+            whether more changes are already available
+        """
+        until = current_change_sequence(db)
+        position = ChangeFeedService.start_position(db, until, since, cursor)
+        
+        changes, has_more = ChangeFeedService.read_changes(db, position, until, limit)
+        
+        if has_more:
+            next_position = changes[-1][0]
+        else:
+            # Everything committed so far has been read
+            next_position = ChangeFeedService.end_position(position, until)
+        
+        return {
+            "items": [change for _, change in changes],
+            "next_cursor": ChangeFeedService.encode_cursor(next_position),
+            "has_more": has_more
+        }
+    
+    @staticmethod
+    def stream_changes(bind, position: tuple, until: int) -> Iterator[bytes]:
+        """
+        Stream all changes after a position, up to a committed sequence value, as NDJSON.
+        
+        Args:
+            bind: Engine or connection of the request's session
+            position: Feed position to read after
+            until: Last change sequence value to include
+            
+        Yields:
+            Encoded NDJSON lines, one piece per EXPORT_BATCH_SIZE changes
+        """
+        db = SessionLocal(bind=bind)
+        try:
+            while True:
+                changes, has_more = ChangeFeedService.read_changes(
+                    db, position, until, settings.EXPORT_BATCH_SIZE
+                )
+                if changes:
+                    yield "".join(
+                        json.dumps(change, default=lambda value: value.isoformat(), ensure_ascii=False) + "\n"
+                        for _, change in changes
+                    ).encode("utf-8")
+                
+                if not has_more:
+                    return
+                position = changes[-1][0]
+        
+        finally:
+            db.close()
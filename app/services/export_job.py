@@ -0,0 +1,359 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, func
+from fastapi import HTTPException, status
+from typing import Dict, Optional
+from datetime import datetime, timedelta
+import json
+import logging
+import os
+import shutil
+from app.config import settings
+from app.database import SessionLocal
+from app.models.export_job import ExportJob
+from app.models.product import Product
+from app.schemas.product import ProductFilter
+from app.services.product import ProductService
+from app.services.import_export import ImportExportService
+from app.utils.background import is_process_running, submit_export_job
+from app.utils.compression import ENCODINGS, compress_stream
+
+logger = logging.getLogger(__name__)
+
+
+class ExportJobService:
+    """Service for exports generated in the background and downloaded later."""
+    
+    EXPORT_FORMATS = {
+        'csv': 'csv',
+        'excel': 'xlsx',
+        'parquet': 'parquet',
+        'arrow': 'arrow'
+    }
+    
+    @staticmethod
+    def get_job(db: Session, job_id: int) -> ExportJob:
+        """
+        Get an export job by ID.
+        
+        Args:
+            db: Database session
+            job_id: Export job ID
+            
+        Returns:
+            Export job
+            
+        Raises:
+            HTTPException: If the export job is not found
+        """
+        job = db.query(ExportJob).filter(ExportJob.id == job_id).first()
+        
+        if not job:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Trabajo de exportación no encontrado"
+            )
+        
+        return job
+    
+    @staticmethod
+    def build_job_status(job: ExportJob) -> Dict:
+        """
+        Build the status of an export job returned to the client.
+        
+        Args:
+            job: Export job
+            
+        Returns:
+            Dictionary with the job status and progress
+        """
+        percent = None
+        if job.status == "completed":
+            percent = 100.0
+        elif job.expected_rows:
+            percent = round(min(job.rows_written / job.expected_rows, 1.0) * 100, 1)
+        
+        return {
+            "id": job.id,
+            "format": job.format,
+            "compression": job.compression,
+            "columns": job.columns,
+            "status": job.status,
+            "expected_rows": job.expected_rows,
+            "rows_written": job.rows_written or 0,
+            "truncated": bool(job.truncated),
+            "percent": percent,
+            "file_size": job.file_size,
+            "error": job.error,
+            "created_at": job.created_at,
+            "started_at": job.started_at,
+            "completed_at": job.completed_at,
+            "expires_at": job.expires_at
+        }
+    
+    @staticmethod
+    def file_name(job: ExportJob) -> str:
+        """
+        Get the download file name of an export job.
+        
+        Args:
+            job: Export job
+            
+        Returns:
+            File name with the format (and compression) extension
+        """
+        extension = ExportJobService.EXPORT_FORMATS[job.format]
+        return f"productos_export_{job.id}.{extension}{ENCODINGS.get(job.compression, '')}"
+    
+    @staticmethod
+    def job_path(job: ExportJob) -> str:
+        """
+        Get the path the file of an export job is written to.
+        
+        Args:
+            job: Export job
+            
+        Returns:
+            Path under UPLOAD_FOLDER/exports
+        """
+        return os.path.join(settings.UPLOAD_FOLDER, "exports", ExportJobService.file_name(job))
+    
+    @staticmethod
+    def submit_export(
+        db: Session,
+        file_format: str,
+        filters: Optional[ProductFilter] = None,
+        columns: Optional[str] = None,
+        compression: Optional[str] = None
+    ) -> Dict:
+        """
+        Queue an export to the export job pool.
+        
+        Args:
+            db: Database session
+            file_format: csv, excel, parquet or arrow
+            filters: Same filters as the product listing
+            columns: Comma-separated columns to export
+            compression: gzip or zstd (CSV only)
+            
+        Returns:
+            Dictionary with the job status
+            
+        Raises:
+            HTTPException: If the format, columns or compression are not valid
+        """
+        if file_format not in ExportJobService.EXPORT_FORMATS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Formato de exportación no válido. Use: {', '.join(ExportJobService.EXPORT_FORMATS)}"
+            )
+        
+        if file_format in ImportExportService.ARROW_EXTENSIONS:
+            ImportExportService.require_pyarrow(file_format)
+        
+        selected = ImportExportService.parse_export_columns(columns)
+        encoding = ImportExportService.validate_compression(compression) if file_format == "csv" else None
+        
+        ExportJobService.purge_expired_jobs(db)
+        
+        job = ExportJob(
+            format=file_format,
+            compression=encoding,
+            filters=json.dumps(filters.model_dump()) if filters else None,
+            columns=','.join(selected),
+            status="queued",
+            worker_pid=os.getpid()
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        
+        submit_export_job(ExportJobService.run_export_job, db.get_bind(), job.id)
+        
+        return ExportJobService.build_job_status(job)
+    
+    @staticmethod
+    def run_export_job(bind, job_id: int) -> None:
+        """
+        Write the file of a queued export job in a background worker.
+        
+        Args:
+            bind: Engine or connection to bind the session to
+            job_id: Export job ID
+        """
+        db = SessionLocal(bind=bind)
+        path = None
+        
+        try:
+            job = db.query(ExportJob).filter(ExportJob.id == job_id).first()
+            filters = ProductFilter(**json.loads(job.filters)) if job.filters else None
+            columns = job.columns.split(',')
+            
+            job.status = "processing"
+            job.started_at = datetime.utcnow()
+            matching = db.execute(
+                select(func.count(Product.id)).where(
+                    *ProductService.build_filters(**filters.model_dump()) if filters else []
+                )
+            ).scalar()
+            # The file is capped at MAX_EXPORT_RECORDS like every export; the
+            # job says so rather than looking like a complete export
+            job.expected_rows = min(matching, settings.MAX_EXPORT_RECORDS)
+            job.truncated = matching > settings.MAX_EXPORT_RECORDS
+            db.commit()
+            
+            def progress(rows: int) -> None:
+                job.rows_written += rows
+                db.commit()
+            
+            path = ExportJobService.job_path(job)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            
+            if job.format == "csv":
+                with open(path, "wb") as output:
+                    for chunk in compress_stream(
+                        ImportExportService.export_to_csv(bind, filters, columns, progress),
+                        job.compression
+                    ):
+                        output.write(chunk)
+            elif job.format == "excel":
+                shutil.move(ImportExportService.export_to_excel(bind, filters, columns, progress), path)
+            else:
+                shutil.move(
+                    ImportExportService.export_to_columnar(bind, job.format, filters, columns, progress),
+                    path
+                )
+            
+            job.status = "completed"
+            job.file_path = path
+            job.file_size = os.path.getsize(path)
+            job.completed_at = datetime.utcnow()
+            job.expires_at = job.completed_at + timedelta(seconds=settings.EXPORT_JOB_TTL_SECONDS)
+            db.commit()
+        
+        except Exception as e:
+            logger.exception("Export job %s failed", job_id)
+            db.rollback()
+            if path and os.path.exists(path):
+                os.remove(path)
+            job = db.query(ExportJob).filter(ExportJob.id == job_id).first()
+            if job is not None:
+                job.status = "failed"
+                job.error = str(e)
+                job.completed_at = datetime.utcnow()
+                db.commit()
+        
+        finally:
+            db.close()
+    
+    @staticmethod
+    def get_downloadable_job(db: Session, job_id: int) -> ExportJob:
+        """
+        Get a finished export job whose file can be downloaded.
+        
+        Args:
+            db: Database session
+            job_id: Export job ID
+            
+        Returns:
+            Export job
+            
+        Raises:
+            HTTPException: If the job is not found, not finished, or its file
+                has expired
+        """
+        ExportJobService.purge_expired_jobs(db)
+        job = ExportJobService.get_job(db, job_id)
+        
+        if job.status == "expired" or (job.status == "completed" and not os.path.exists(job.file_path)):
+            raise HTTPException(
+                status_code=status.HTTP_410_GONE,
+                detail="El archivo de la exportación expiró"
+            )
+        
+        if job.status != "completed":
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"La exportación aún no está disponible (estado: {job.status})"
+            )
+        
+        return job
+    
+    @staticmethod
+    def purge_expired_jobs(db: Session) -> int:
+        """
+        Delete the files of finished export jobs older than EXPORT_JOB_TTL_SECONDS.
+        
+        Args:
+            db: Database session
+            
+        Returns:
+            Number of export jobs expired
+        """
+        expired = db.query(ExportJob).filter(
+            ExportJob.status == "completed",
+            ExportJob.expires_at < datetime.utcnow()
+        ).all()
+        
+        for job in expired:
+            if job.file_path and os.path.exists(job.file_path):
+                os.remove(job.file_path)
+            job.status = "expired"
+            job.file_path = None
+        
+        if expired:
+            db.commit()
+        
+        return len(expired)
+    
+    @staticmethod
+    def purge_expired_files(bind) -> int:
+        """
+        Purge expired export jobs in a session of its own (periodic task).
+        
+        Args:
+            bind: Engine to bind the session to
+            
+        Returns:
+            Number of export jobs expired
+        """
+        db = SessionLocal(bind=bind)
+        try:
+            return ExportJobService.purge_expired_jobs(db)
+        finally:
+            db.close()
+    
+    @staticmethod
+    def recover_stale_jobs(db: Session) -> int:
+        """
+        Fail the export jobs that will never finish and delete their partial files.
+        
+        A job runs in the pool of the process that queued it, so a queued or
+        processing job is stale once that process has stopped. Meant to run at
+        startup, when no job of this process can be running yet either (its
+        ID may be the one of a stopped process, e.g. in a container).
+        
+        Args:
+            db: Database session
+            
+        Returns:
+            Number of export jobs failed
+        """
+        pid = os.getpid()
+        stale = [
+            job for job in db.query(ExportJob).filter(ExportJob.status.in_(("queued", "processing"))).all()
+            if job.worker_pid is None or job.worker_pid == pid or not is_process_running(job.worker_pid)
+        ]
+        
+        for job in stale:
+            path = ExportJobService.job_path(job)
+            if os.path.exists(path):
+                os.remove(path)
+            job.status = "failed"
+            job.error = "La exportación se interrumpió porque el servidor se detuvo"
+            job.completed_at = datetime.utcnow()
+        
+        if stale:
+            db.commit()
+            logger.warning("Failed %s export jobs interrupted by a restart", len(stale))
+        
+        return len(stale)
@@ -1,23 +1,72 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, defer
+from sqlalchemy import insert, select
 from fastapi import UploadFile, HTTPException, status
-from typing import List, Dict
+from starlette.concurrency import run_in_threadpool
+from typing import List, Dict, Iterator, AsyncIterator, Optional, Union, BinaryIO, Callable
+from collections import deque
+from concurrent.futures.process import BrokenProcessPool
+import itertools
+import numpy as np
 import pandas as pd
+from openpyxl import Workbook, load_workbook
 import io
+import os
 import json
-from datetime import datetime
+import tempfile
+import uuid
+import hashlib
+import pickle
+import secrets
+import logging
+import csv
+from datetime import datetime, timedelta, timezone
+from app.config import settings
+from app.database import SessionLocal
 from app.models.product import Product
 from app.models.import_log import ImportLog
-from app.schemas.product import ProductCreate
+from app.models.import_error import ImportRowError
+from app.schemas.product import ProductFilter
 from app.services.product import ProductService
-from pydantic import ValidationError
+from app.services.bulk_loader import BulkLoader
+from app.services.validation import ImportValidationService
+from app.utils.compression import ENCODINGS, is_available
+from app.utils.export_cache import get_cache_folder, store_export
+from app.utils.shared_stream import SharedStream
+from app.utils.single_flight import export_flight
+from app.utils.background import (
+    submit_job,
+    get_process_pool,
+    get_process_pool_size,
+    reset_process_pool
+)
 
+try:  # Optional dependency: Parquet / Arrow IPC support
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
 
 class ImportExportService:
     """Service for import/export operations."""
     
-    ALLOWED_EXTENSIONS = ['csv', 'xlsx', 'xls']
+    ALLOWED_EXTENSIONS = ['csv', 'xlsx', 'xls', 'parquet', 'arrow']
+    ARROW_EXTENSIONS = ['parquet', 'arrow']  # Require pyarrow
     REQUIRED_COLUMNS = ['nombre', 'descripcion', 'precio', 'stock', 'categoria']
-    BATCH_SIZE = 1000  # Insert in batches for better performance
+    IMPORT_MODES = ['insert', 'upsert']
+    ERROR_SAMPLE_SIZE = 100  # Row errors returned in the import result
+    EXPORT_COLUMNS = ['id', 'nombre', 'descripcion', 'precio', 'stock', 'categoria']
+    EXCEL_MAX_ROWS = 1048576  # Rows per Excel sheet, header included
+    ARROW_TYPES = {
+        'id': 'int64',
+        'nombre': 'string',
+        'descripcion': 'string',
+        'precio': 'double',
+        'stock': 'int64',
+        'categoria': 'string'
+    }
     
     @staticmethod
     def validate_file_extension(filename: str) -> str:
@@ -41,33 +90,254 @@ class ImportExportService:
                 detail=f"Formato de archivo no permitido. Use: {', '.join(ImportExportService.ALLOWED_EXTENSIONS)}"
             )
         
+        if extension in ImportExportService.ARROW_EXTENSIONS:
+            ImportExportService.require_pyarrow(extension)
+        
         return extension
     
     @staticmethod
-    async def read_file_to_dataframe(file: UploadFile) -> pd.DataFrame:
+    def require_pyarrow(file_format: str) -> None:
         """
-        Read uploaded file and convert to DataFrame.
+        Check that pyarrow is installed for Parquet / Arrow IPC files.
         
         Args:
-            file: Uploaded file
+            file_format: Requested format (used in the error message)
+            
+        Raises:
+            HTTPException: If pyarrow is not installed
+        """
+        if pa is None:
+            raise HTTPException(
+                status_code=status.HTTP_501_NOT_IMPLEMENTED,
+                detail=f"El formato {file_format} requiere el paquete pyarrow"
+            )
+    
+    @staticmethod
+    def get_worksheet(workbook, sheet: Optional[str] = None):
+        """
+        Get a worksheet by name or zero-based index.
+        
+        Args:
+            workbook: openpyxl workbook
+            sheet: Sheet name or index (defaults to the active sheet)
             
         Returns:
-            Pandas DataFrame
+            openpyxl worksheet
+            
+        Raises:
+            ValueError: If the sheet does not exist
+        """
+        if sheet is None:
+            return workbook.active
+        
+        if sheet in workbook.sheetnames:
+            return workbook[sheet]
+        
+        if sheet.isdigit() and int(sheet) < len(workbook.worksheets):
+            return workbook.worksheets[int(sheet)]
+        
+        raise ValueError(f"La hoja '{sheet}' no existe. Hojas disponibles: {', '.join(workbook.sheetnames)}")
+    
+    @staticmethod
+    def iter_excel_chunks(
+        source: Union[str, BinaryIO],
+        chunk_size: int,
+        sheet: Optional[str] = None,
+        skip_rows: int = 0,
+        start_row: int = 0
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Read an xlsx workbook lazily with openpyxl read-only mode.
+        
+        Rows are streamed from the sheet XML instead of loading the whole
+        workbook DOM. Fully empty rows are skipped, and the DataFrame index
+        is set so that index + 2 is the spreadsheet row number.
+        
+        Args:
+            source: Path or binary file object to read
+            chunk_size: Number of rows per chunk
+            sheet: Sheet name or index (defaults to the active sheet)
+            skip_rows: Leading rows to skip before the header row
+            start_row: Data rows to skip after the header (resume offset)
+            
+        Yields:
+            Pandas DataFrames
+        """
+        workbook = load_workbook(source, read_only=True, data_only=True)
+        
+        try:
+            worksheet = ImportExportService.get_worksheet(workbook, sheet)
+            rows = itertools.islice(worksheet.iter_rows(values_only=True), skip_rows, None)
+            
+            header = next(rows, None)
+            if header is None:
+                raise ValueError("La hoja no contiene encabezados")
+            
+            columns = [
+                str(value).strip() if value is not None else f"Unnamed: {position}"
+                for position, value in enumerate(header)
+            ]
+            width = len(columns)
+            
+            # Spreadsheet row of the first data row, minus 2 (header offset)
+            next_index = skip_rows
+            records = []
+            index = []
+            
+            for row in rows:
+                position = next_index
+                next_index += 1
+                
+                if all(value is None for value in row):
+                    continue
+                
+                if start_row > 0:
+                    start_row -= 1
+                    continue
+                
+                row = tuple(row[:width]) + (None,) * (width - len(row))
+                records.append(row)
+                index.append(position)
+                
+                if len(records) >= chunk_size:
+                    yield pd.DataFrame.from_records(records, columns=columns, index=index)
+                    records = []
+                    index = []
+            
+            if records:
+                yield pd.DataFrame.from_records(records, columns=columns, index=index)
+        
+        finally:
+            workbook.close()
+    
+    @staticmethod
+    def iter_arrow_chunks(
+        source: Union[str, BinaryIO],
+        extension: str,
+        chunk_size: int,
+        start_row: int = 0
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Read a Parquet or Arrow IPC file lazily, record batch by record batch.
+        
+        Columns keep their stored types, so no dtype inference is needed.
+        Parquet row groups before the resume offset are skipped using the
+        file metadata, without reading them.
+        
+        Args:
+            source: Path or binary file object to read
+            extension: "parquet" or "arrow"
+            chunk_size: Maximum number of rows per chunk
+            start_row: Data rows to skip (resume offset)
+            
+        Yields:
+            Pandas DataFrames indexed by data row position in the file
+        """
+        position = 0
+        
+        if extension == 'parquet':
+            parquet_file = pq.ParquetFile(source)
+            first_group = parquet_file.num_row_groups
+            for group in range(parquet_file.num_row_groups):
+                group_rows = parquet_file.metadata.row_group(group).num_rows
+                if position + group_rows > start_row:
+                    first_group = group
+                    break
+                position += group_rows
+            
+            if first_group == parquet_file.num_row_groups:
+                return
+            
+            batches = parquet_file.iter_batches(
+                batch_size=chunk_size,
+                row_groups=range(first_group, parquet_file.num_row_groups)
+            )
+        else:
+            stream = pa.memory_map(source) if isinstance(source, str) else source
+            try:
+                reader = pa.ipc.open_file(stream)
+                batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+            except pa.ArrowInvalid:
+                # Not the random-access file format: read it as an IPC stream
+                stream.seek(0)
+                batches = pa.ipc.open_stream(stream)
+        
+        for batch in batches:
+            for offset in range(0, batch.num_rows, chunk_size):
+                piece = batch.slice(offset, chunk_size)
+                end = position + piece.num_rows
+                skip = max(start_row - position, 0)
+                
+                if skip < piece.num_rows:
+                    df = piece.slice(skip).to_pandas()
+                    df.index = pd.RangeIndex(position + skip, end)
+                    yield df
+                
+                position = end
+    
+    @staticmethod
+    def iter_file_chunks(
+        source: Union[str, BinaryIO],
+        filename: str,
+        chunk_size: Optional[int] = None,
+        sheet: Optional[str] = None,
+        skip_rows: int = 0,
+        start_row: int = 0
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Read a file lazily as a sequence of DataFrames.
+        
+        CSV files are parsed incrementally from disk or from the upload spool,
+        xlsx workbooks are streamed row by row in read-only mode and Parquet /
+        Arrow IPC files record batch by record batch, so memory depends on the
+        chunk size instead of the file size.
+        
+        Args:
+            source: Path or binary file object to read
+            filename: Original file name (used to detect the format)
+            chunk_size: Number of rows per chunk (defaults to IMPORT_CHUNK_SIZE)
+            sheet: Excel sheet name or index (defaults to the active sheet)
+            skip_rows: Leading Excel rows to skip before the header row
+            start_row: Data rows to skip after the header (resume offset)
+            
+        Yields:
+            Pandas DataFrames indexed by data row position in the file
             
         Raises:
             HTTPException: If file cannot be read
         """
-        extension = ImportExportService.validate_file_extension(file.filename)
+        extension = ImportExportService.validate_file_extension(filename)
+        chunk_size = chunk_size or settings.IMPORT_CHUNK_SIZE
         
         try:
-            content = await file.read()
+            if hasattr(source, 'seek'):
+                source.seek(0)
             
             if extension == 'csv':
-                df = pd.read_csv(io.BytesIO(content))
-            else:  # xlsx or xls
-                df = pd.read_excel(io.BytesIO(content))
+                reader = pd.read_csv(source, chunksize=chunk_size)
+                if start_row:
+                    # The checkpoint counts parsed records, not lines (quoted fields may span
+                    # lines and blank lines are skipped): parse and drop the committed ones
+                    reader = (chunk.loc[start_row:] for chunk in reader if chunk.index[-1] >= start_row)
+            elif extension == 'xlsx':
+                reader = ImportExportService.iter_excel_chunks(
+                    source, chunk_size, sheet, skip_rows, start_row
+                )
+            elif extension in ImportExportService.ARROW_EXTENSIONS:
+                reader = ImportExportService.iter_arrow_chunks(
+                    source, extension, chunk_size, start_row
+                )
+            else:  # xls (binary format, not supported by openpyxl)
+                sheet_name = int(sheet) if sheet and sheet.isdigit() else (sheet or 0)
+                df = pd.read_excel(source, sheet_name=sheet_name, skiprows=skip_rows)
+                df.index = df.index + skip_rows
+                reader = (
+                    df.iloc[start:start + chunk_size]
+                    for start in range(start_row, len(df), chunk_size)
+                )
             
-            return df
+            for chunk in reader:
+                yield chunk
         
         except Exception as e:
             raise HTTPException(
@@ -95,208 +365,1469 @@ class ImportExportService:
             )
     
     @staticmethod
-    def validate_row(row_data: dict, row_number: int) -> tuple[bool, str]:
+    def _collect_shards(shards: List[pd.DataFrame], futures: list) -> tuple[pd.DataFrame, List[Dict]]:
+        """
+        Merge the validation results of a chunk's shards in order.
+        
+        Falls back to in-process validation if a worker process died.
+        
+        Args:
+            shards: Shards submitted to the process pool
+            futures: Futures with the (valid rows, errors) of each shard
+            
+        Returns:
+            Tuple of (valid rows, errors) for the whole chunk
+        """
+        valid_frames = []
+        errors = []
+        
+        for shard, future in zip(shards, futures):
+            try:
+                valid_df, shard_errors = future.result()
+            except BrokenProcessPool:
+                logger.warning("Validation worker died, validating shard in-process")
+                reset_process_pool()
+                valid_df, shard_errors = ImportValidationService.validate_dataframe(shard, details=True)
+            
+            valid_frames.append(valid_df)
+            errors.extend(shard_errors)
+        
+        return pd.concat(valid_frames), errors
+    
+    @staticmethod
+    def validate_chunks(
+        chunks: Iterator[pd.DataFrame]
+    ) -> Iterator[tuple[int, pd.DataFrame, List[Dict]]]:
+        """
+        Validate chunks, using the process pool for large imports.
+        
+        Imports with at least PARALLEL_VALIDATION_MIN_ROWS rows are sharded
+        across VALIDATION_WORKERS processes. A few chunks are validated ahead
+        while the caller inserts the previous ones, and results are yielded in
+        file order with their original row numbers.
+        
+        Args:
+            chunks: Iterator of DataFrames to validate
+            
+        Yields:
+            Tuples of (rows in chunk, valid rows, errors)
+        """
+        chunks = iter(chunks)
+        workers = get_process_pool_size()
+        
+        # Look ahead to decide whether the import is worth the process pool
+        lookahead = []
+        buffered_rows = 0
+        if workers > 1:
+            for chunk in chunks:
+                lookahead.append(chunk)
+                buffered_rows += len(chunk)
+                if buffered_rows >= settings.PARALLEL_VALIDATION_MIN_ROWS:
+                    break
+        chunks = itertools.chain(lookahead, chunks)
+        
+        if buffered_rows < settings.PARALLEL_VALIDATION_MIN_ROWS:
+            for chunk in chunks:
+                ImportExportService.validate_dataframe_columns(chunk)
+                valid_df, errors = ImportValidationService.validate_dataframe(chunk, details=True)
+                yield len(chunk), valid_df, errors
+            return
+        
+        pool = get_process_pool()
+        shard_rows = max(settings.PARALLEL_VALIDATION_MIN_ROWS // workers, 1)
+        pending = deque()
+        
+        for chunk in chunks:
+            ImportExportService.validate_dataframe_columns(chunk)
+            
+            shard_count = min(workers, max(len(chunk) // shard_rows, 1))
+            shards = [
+                chunk.iloc[positions]
+                for positions in np.array_split(np.arange(len(chunk)), shard_count)
+            ]
+            futures = [
+                pool.submit(ImportValidationService.validate_dataframe, shard, True)
+                for shard in shards
+            ]
+            pending.append((len(chunk), shards, futures))
+            
+            # Bound the number of chunks held in memory
+            while len(pending) > workers:
+                rows, shards, futures = pending.popleft()
+                yield (rows, *ImportExportService._collect_shards(shards, futures))
+        
+        while pending:
+            rows, shards, futures = pending.popleft()
+            yield (rows, *ImportExportService._collect_shards(shards, futures))
+    
+    @staticmethod
+    def import_chunks(
+        db: Session,
+        import_log: ImportLog,
+        chunks: Iterator[pd.DataFrame],
+        errors: Optional[List[Dict]] = None,
+        spill: Optional[BinaryIO] = None
+    ) -> List[Dict]:
+        """
+        Validate and insert products chunk by chunk, in file order.
+        
+        Each chunk is committed together with its row errors, the import log
+        counters and the checkpoint (data rows consumed so far), so progress
+        is visible while the import is running and a failed import can resume
+        after the last committed chunk. In "upsert" mode rows are matched on
+        (categoria, nombre): new products are inserted, changed ones updated
+        and identical ones skipped.
+        
+        When a spill file is given (dry run) the valid rows are appended to it
+        instead of being written to the products table, and no checkpoint is
+        recorded.
+        
+        Args:
+            db: Database session
+            import_log: Import log to update
+            chunks: Iterator of DataFrames to import
+            errors: Sample of row errors of previously committed chunks (when resuming)
+            spill: Binary file the valid rows of each chunk are pickled to
+            
+        Returns:
+            Sample of the first ERROR_SAMPLE_SIZE row errors
+        """
+        errors = errors if errors is not None else []
+        
+        for chunk_rows, valid_df, chunk_errors in ImportExportService.validate_chunks(chunks):
+            # Write the chunk and its counters in a single transaction
+            if spill is not None:
+                pickle.dump(valid_df, spill, protocol=pickle.HIGHEST_PROTOCOL)
+                inserted, updated, unchanged, superseded = 0, 0, 0, 0
+            elif import_log.mode == "upsert":
+                inserted, updated, unchanged, superseded = BulkLoader.upsert(db, valid_df)
+            else:
+                inserted, updated, unchanged, superseded = BulkLoader.load(db, valid_df), 0, 0, 0
+            
+            ImportExportService.store_row_errors(db, import_log.id, chunk_errors)
+            import_log.total_rows += chunk_rows
+            import_log.successful_rows += len(valid_df)
+            import_log.failed_rows += len(chunk_errors)
+            import_log.inserted_rows += inserted
+            import_log.updated_rows += updated
+            import_log.unchanged_rows += unchanged
+            import_log.superseded_rows += superseded
+            if spill is None:
+                import_log.checkpoint_rows += chunk_rows
+            db.commit()
+            
+            if updated:
+                ProductService.invalidate_cached_products()
+            
+            for error in chunk_errors[:ImportExportService.ERROR_SAMPLE_SIZE - len(errors)]:
+                errors.append({"row": error["row"], "error": error["error"]})
+        
+        return errors
+    
+    @staticmethod
+    def store_row_errors(db: Session, log_id: int, errors: List[Dict]) -> None:
+        """
+        Write row errors to the import_errors table in one executemany.
+        
+        Args:
+            db: Database session
+            log_id: Import log ID
+            errors: Row errors with "details" (field, value, message)
+        """
+        records = [
+            {
+                "log_id": log_id,
+                "row": error["row"],
+                "field": detail["field"],
+                "value": detail["value"],
+                "message": detail["message"]
+            }
+            for error in errors
+            for detail in error.get("details", [])
+        ]
+        
+        if records:
+            db.execute(insert(ImportRowError.__table__), records)
+    
+    @staticmethod
+    def save_upload(file: UploadFile) -> tuple[str, str]:
+        """
+        Copy an uploaded file to UPLOAD_FOLDER so it outlives the request.
+        
+        The file is kept until the import completes, so a failed import can
+        be resumed from its checkpoint.
+        
+        Args:
+            file: Uploaded file
+            
+        Returns:
+            Tuple of (path of the stored file, SHA-256 fingerprint)
+        """
+        folder = os.path.join(settings.UPLOAD_FOLDER, "imports")
+        os.makedirs(folder, exist_ok=True)
+        
+        path = os.path.join(folder, f"{uuid.uuid4().hex}_{os.path.basename(file.filename)}")
+        fingerprint = hashlib.sha256()
+        file.file.seek(0)
+        with open(path, "wb") as destination:
+            for block in iter(lambda: file.file.read(1024 * 1024), b""):
+                fingerprint.update(block)
+                destination.write(block)
+        
+        return path, fingerprint.hexdigest()
+    
+    @staticmethod
+    def file_fingerprint(path: str) -> str:
+        """
+        Compute the SHA-256 fingerprint of a stored file.
+        
+        Args:
+            path: Path of the stored file
+            
+        Returns:
+            SHA-256 hex digest
+        """
+        fingerprint = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                fingerprint.update(block)
+        
+        return fingerprint.hexdigest()
+    
+    @staticmethod
+    def estimate_row_count(
+        path: str,
+        filename: str,
+        sheet: Optional[str] = None,
+        skip_rows: int = 0
+    ) -> Optional[int]:
         """
-        Validate a single row of data.
+        Cheaply estimate the number of data rows in a stored file.
         
         Args:
-            row_data: Dictionary with row data
-            row_number: Row number for error reporting
+            path: Path of the stored file
+            filename: Original file name (used to detect the format)
+            sheet: Excel sheet name or index (defaults to the active sheet)
+            skip_rows: Leading Excel rows to skip before the header row
             
         Returns:
-            Tuple of (is_valid, error_message)
+            Estimated number of rows, or None if it cannot be estimated
         """
+        extension = filename.split('.')[-1].lower()
+        
         try:
-            # Clean NaN values
-            for key, value in row_data.items():
-                if pd.isna(value):
-                    row_data[key] = None if key == 'descripcion' else ''
+            if extension == 'csv':
+                lines = 0
+                last_block = b""
+                with open(path, "rb") as f:
+                    for block in iter(lambda: f.read(1024 * 1024), b""):
+                        lines += block.count(b"\n")
+                        last_block = block
+                if last_block and not last_block.endswith(b"\n"):
+                    lines += 1
+                return max(lines - 1, 0)  # Exclude header
+            
+            if extension == 'parquet' and pq is not None:
+                return pq.ParquetFile(path).metadata.num_rows
             
-            # Validate using Pydantic schema
-            ProductCreate(**row_data)
-            return True, ""
+            if extension == 'xlsx':
+                workbook = load_workbook(path, read_only=True)
+                try:
+                    worksheet = ImportExportService.get_worksheet(workbook, sheet)
+                    return max((worksheet.max_row or 1) - 1 - skip_rows, 0)
+                finally:
+                    workbook.close()
+        
+        except Exception:
+            logger.warning("Could not estimate rows for %s", filename, exc_info=True)
+        
+        return None
+    
+    @staticmethod
+    def build_import_result(import_log: ImportLog, errors: Optional[List[Dict]] = None) -> Dict:
+        """
+        Build the import result returned to the client.
         
-        except ValidationError as e:
-            errors = []
-            for error in e.errors():
-                field = error['loc'][0] if error['loc'] else 'unknown'
-                message = error['msg']
-                errors.append(f"{field}: {message}")
+        Args:
+            import_log: Import log
+            errors: List of row errors
             
-            return False, f"Fila {row_number}: {'; '.join(errors)}"
+        Returns:
+            Dictionary with import results
+        """
+        if import_log.status == "processing" and import_log.dry_run and import_log.commit_expires_at is None:
+            message = "Validación en cola. Consulte el progreso con el ID del log"
+        elif import_log.status == "processing":
+            message = "Importación en cola. Consulte el progreso con el ID del log"
+        elif import_log.status == "validated":
+            message = (
+                f"Validación completada: {import_log.successful_rows} válidos, "
+                f"{import_log.failed_rows} fallidos. Confirme la importación con el token"
+            )
+        elif import_log.mode == "upsert":
+            message = (
+                f"Importación completada: {import_log.inserted_rows} nuevos, "
+                f"{import_log.updated_rows} actualizados, {import_log.unchanged_rows} sin cambios, "
+                f"{import_log.superseded_rows} repetidos, {import_log.failed_rows} fallidos"
+            )
+        else:
+            message = (
+                f"Importación completada: {import_log.successful_rows} exitosos, "
+                f"{import_log.failed_rows} fallidos"
+            )
         
-        except Exception as e:
-            return False, f"Fila {row_number}: Error desconocido - {str(e)}"
+        return {
+            "log_id": import_log.id,
+            "filename": import_log.filename,
+            "mode": import_log.mode,
+            "dry_run": bool(import_log.dry_run),
+            "commit_token": import_log.commit_token,
+            "commit_expires_at": import_log.commit_expires_at,
+            "total_rows": import_log.total_rows or 0,
+            "successful_rows": import_log.successful_rows or 0,
+            "failed_rows": import_log.failed_rows or 0,
+            "inserted_rows": import_log.inserted_rows or 0,
+            "updated_rows": import_log.updated_rows or 0,
+            "unchanged_rows": import_log.unchanged_rows or 0,
+            "superseded_rows": import_log.superseded_rows or 0,
+            "status": import_log.status,
+            "message": message,
+            "errors": errors[:100] if errors else None  # Limit errors in response
+        }
     
     @staticmethod
-    async def import_products(
+    def load_row_errors(db: Session, import_log: ImportLog) -> List[Dict]:
+        """
+        Load a sample of the row errors already stored for an import.
+        
+        Args:
+            db: Database session
+            import_log: Import log
+            
+        Returns:
+            First ERROR_SAMPLE_SIZE row errors, in the import result format
+        """
+        # A row has at most one record per product field
+        records = db.execute(
+            select(ImportRowError.row, ImportRowError.field, ImportRowError.message)
+            .where(ImportRowError.log_id == import_log.id)
+            .order_by(ImportRowError.row, ImportRowError.id)
+            .limit(ImportExportService.ERROR_SAMPLE_SIZE * len(ImportValidationService.COLUMNS))
+        ).all()
+        
+        errors = []
+        for row, field, message in records:
+            if errors and errors[-1]["row"] == row:
+                errors[-1]["error"] += f"; {field}: {message}"
+            elif len(errors) < ImportExportService.ERROR_SAMPLE_SIZE:
+                errors.append({"row": row, "error": f"Fila {row}: {field}: {message}"})
+        
+        return errors
+    
+    @staticmethod
+    def process_import(
         db: Session,
-        file: UploadFile
+        import_log: ImportLog,
+        source: Optional[Union[str, BinaryIO]] = None
     ) -> Dict:
         """
-        Import products from CSV or Excel file.
+        Run the import pipeline for an import log and finalize it.
+        
+        Starts after the log's checkpoint, so the same call resumes a failed
+        import. On success the stored upload is deleted; on failure it is
+        kept for a later resume. Dry runs only validate: the valid rows are
+        spilled to disk and the log is left "validated" until it is committed
+        or DRY_RUN_TTL_SECONDS pass; committing one runs commit_validated_rows.
         
         Args:
             db: Database session
-            file: Uploaded file
+            import_log: Import log in processing state
+            source: Path or binary file object to read (defaults to the stored upload)
             
         Returns:
             Dictionary with import results
+            
+        Raises:
+            Exception: Any import error, after marking the log as failed
         """
-        # Create import log
-        import_log = ImportLog(
-            filename=file.filename,
-            status="processing"
-        )
-        db.add(import_log)
-        db.commit()
-        db.refresh(import_log)
+        if import_log.dry_run and import_log.commit_expires_at is not None:
+            return ImportExportService.commit_validated_rows(db, import_log)
+        
+        source = source if source is not None else import_log.file_path
+        errors = ImportExportService.load_row_errors(db, import_log)
+        spill_path = ImportExportService.dry_run_path(import_log) if import_log.dry_run else None
         
         try:
-            # Read file
-            df = await ImportExportService.read_file_to_dataframe(file)
-            ImportExportService.validate_dataframe_columns(df)
-            
-            total_rows = len(df)
-            successful_rows = 0
-            failed_rows = 0
-            errors = []
-            valid_products = []
-            
-            # Process rows
-            for idx, row in df.iterrows():
-                row_number = idx + 2  # +2 because Excel rows start at 1 and we have header
-                row_data = row.to_dict()
-                
-                # Validate row
-                is_valid, error_message = ImportExportService.validate_row(row_data, row_number)
-                
-                if is_valid:
-                    # Clean data for insertion
-                    if pd.isna(row_data.get('descripcion')):
-                        row_data['descripcion'] = None
-                    
-                    valid_products.append(row_data)
-                    successful_rows += 1
-                    
-                    # Insert in batches for performance
-                    if len(valid_products) >= ImportExportService.BATCH_SIZE:
-                        ProductService.bulk_create_products(db, valid_products)
-                        valid_products = []
-                else:
-                    failed_rows += 1
-                    errors.append({
-                        "row": row_number,
-                        "error": error_message
-                    })
-            
-            # Insert remaining products
-            if valid_products:
-                ProductService.bulk_create_products(db, valid_products)
+            spill = open(spill_path, "wb") if spill_path else None
+            try:
+                ImportExportService.import_chunks(
+                    db,
+                    import_log,
+                    ImportExportService.iter_file_chunks(
+                        source,
+                        import_log.filename,
+                        sheet=import_log.sheet_name,
+                        skip_rows=import_log.skip_rows or 0,
+                        start_row=import_log.checkpoint_rows or 0
+                    ),
+                    errors,
+                    spill
+                )
+            finally:
+                if spill is not None:
+                    spill.close()
             
             # Update import log
-            import_log.total_rows = total_rows
-            import_log.successful_rows = successful_rows
-            import_log.failed_rows = failed_rows
-            import_log.errors = json.dumps(errors) if errors else None
-            import_log.status = "completed"
+            stored_upload = import_log.file_path
+            import_log.errors = None  # Row errors live in the import_errors table
             import_log.completed_at = datetime.utcnow()
+            if import_log.dry_run:
+                import_log.status = "validated"
+                import_log.commit_expires_at = import_log.completed_at + timedelta(
+                    seconds=settings.DRY_RUN_TTL_SECONDS
+                )
+            else:
+                import_log.status = "completed"
+            import_log.file_path = None
             
             db.commit()
             
-            return {
-                "log_id": import_log.id,
-                "filename": file.filename,
-                "total_rows": total_rows,
-                "successful_rows": successful_rows,
-                "failed_rows": failed_rows,
-                "status": "completed",
-                "message": f"Importación completada: {successful_rows} exitosos, {failed_rows} fallidos",
-                "errors": errors[:100] if errors else None  # Limit errors in response
-            }
+            if stored_upload and os.path.exists(stored_upload):
+                os.remove(stored_upload)
+            
+            return ImportExportService.build_import_result(import_log, errors)
         
         except Exception as e:
-            # Update import log with error
+            # Update import log with error (chunks already committed are kept)
+            db.rollback()
+            if spill_path and os.path.exists(spill_path):
+                os.remove(spill_path)
             import_log.status = "failed"
             import_log.errors = json.dumps([{"error": str(e)}])
+            import_log.error_message = ImportExportService.describe_failure(e)
             import_log.completed_at = datetime.utcnow()
             db.commit()
+            raise
+    
+    @staticmethod
+    def dry_run_path(import_log: ImportLog) -> str:
+        """
+        Get the spill file holding the validated rows of a dry run.
+        
+        Args:
+            import_log: Dry run import log
             
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Error durante la importación: {str(e)}"
-            )
+        Returns:
+            Path of the spill file under UPLOAD_FOLDER
+        """
+        folder = os.path.join(settings.UPLOAD_FOLDER, "dry_runs")
+        os.makedirs(folder, exist_ok=True)
+        
+        return os.path.join(folder, f"{import_log.id}.pkl")
+    
+    @staticmethod
+    def iter_spilled_chunks(path: str) -> Iterator[pd.DataFrame]:
+        """
+        Read back the chunks pickled to a dry run spill file, in order.
+        
+        Args:
+            path: Path of the spill file
+            
+        Yields:
+            DataFrames of validated, normalized rows
+        """
+        with open(path, "rb") as spill:
+            while True:
+                try:
+                    yield pickle.load(spill)
+                except EOFError:
+                    return
     
     @staticmethod
-    def export_to_csv(db: Session) -> bytes:
+    def commit_validated_rows(db: Session, import_log: ImportLog) -> Dict:
         """
-        Export all products to CSV.
+        Write the rows validated by a dry run, without reading the file again.
+        
+        Each spilled chunk is committed with the import log counters; the
+        checkpoint counts the rows written so far, so committing a failed
+        commit again skips them.
         
         Args:
             db: Database session
+            import_log: Validated dry run import log in processing state
             
         Returns:
-            CSV file content as bytes
+            Dictionary with import results
+            
+        Raises:
+            Exception: Any import error, after marking the log as failed
+        """
+        spill_path = ImportExportService.dry_run_path(import_log)
+        errors = ImportExportService.load_row_errors(db, import_log)
+        
+        try:
+            skip = import_log.checkpoint_rows or 0
+            for valid_df in ImportExportService.iter_spilled_chunks(spill_path):
+                if skip >= len(valid_df):
+                    skip -= len(valid_df)
+                    continue
+                valid_df, skip = valid_df.iloc[skip:], 0
+                
+                if import_log.mode == "upsert":
+                    inserted, updated, unchanged, superseded = BulkLoader.upsert(db, valid_df)
+                else:
+                    inserted, updated, unchanged, superseded = BulkLoader.load(db, valid_df), 0, 0, 0
+                
+                import_log.inserted_rows += inserted
+                import_log.updated_rows += updated
+                import_log.unchanged_rows += unchanged
+                import_log.superseded_rows += superseded
+                import_log.checkpoint_rows += len(valid_df)
+                db.commit()
+                
+                if updated:
+                    ProductService.invalidate_cached_products()
+            
+            import_log.status = "completed"
+            import_log.completed_at = datetime.utcnow()
+            import_log.commit_token = None
+            import_log.commit_expires_at = None
+            db.commit()
+            
+            os.remove(spill_path)
+            
+            return ImportExportService.build_import_result(import_log, errors)
+        
+        except Exception as e:
+            # The spill file is kept so the commit can be retried before it expires
+            db.rollback()
+            import_log.status = "failed"
+            import_log.errors = json.dumps([{"error": str(e)}])
+            import_log.error_message = ImportExportService.describe_failure(e)
+            import_log.completed_at = datetime.utcnow()
+            db.commit()
+            raise
+    
+    @staticmethod
+    def purge_expired_dry_runs(db: Session) -> int:
         """
-        products = ProductService.get_all_products_for_export(db)
+        Discard the spilled rows of dry runs that were not committed in time.
         
-        # Convert to list of dictionaries
-        data = []
-        for product in products:
-            data.append({
-                'id': product.id,
-                'nombre': product.nombre,
-                'descripcion': product.descripcion,
-                'precio': product.precio,
-                'stock': product.stock,
-                'categoria': product.categoria
-            })
+        Args:
+            db: Database session
+            
+        Returns:
+            Number of dry runs expired
+        """
+        expired = db.query(ImportLog).filter(
+            ImportLog.dry_run.is_(True),
+            ImportLog.commit_token.isnot(None),
+            ImportLog.status.in_(["validated", "failed"]),
+            ImportLog.commit_expires_at < datetime.utcnow()
+        ).all()
         
-        # Create DataFrame and convert to CSV
-        df = pd.DataFrame(data)
+        for import_log in expired:
+            spill_path = ImportExportService.dry_run_path(import_log)
+            if os.path.exists(spill_path):
+                os.remove(spill_path)
+            import_log.status = "expired"
+            import_log.commit_token = None
         
-        # Use StringIO to get CSV as string
-        output = io.StringIO()
-        df.to_csv(output, index=False, encoding='utf-8')
-        csv_content = output.getvalue()
+        if expired:
+            db.commit()
         
-        return csv_content.encode('utf-8')
+        return len(expired)
     
     @staticmethod
-    def export_to_excel(db: Session) -> bytes:
+    def commit_dry_run(db: Session, commit_token: str, background: bool = True) -> Dict:
         """
-        Export all products to Excel.
+        Import the rows validated by a dry run.
+        
+        A failed commit can be committed again with the same token; rows
+        already written are skipped.
         
         Args:
             db: Database session
+            commit_token: Token returned by the dry run
+            background: Queue the import and return right away
             
         Returns:
-            Excel file content as bytes
+            Dictionary with import results
+            
+        Raises:
+            HTTPException: If the token is unknown or expired, or the dry run
+                is not validated yet
         """
-        products = ProductService.get_all_products_for_export(db)
+        ImportExportService.purge_expired_dry_runs(db)
         
-        # Convert to list of dictionaries
-        data = []
-        for product in products:
-            data.append({
-                'id': product.id,
-                'nombre': product.nombre,
-                'descripcion': product.descripcion,
-                'precio': product.precio,
-                'stock': product.stock,
-                'categoria': product.categoria
-            })
+        import_log = db.query(ImportLog).filter(ImportLog.commit_token == commit_token).first()
         
-        # Create DataFrame
-        df = pd.DataFrame(data)
+        if not import_log:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Token de confirmación no válido o expirado"
+            )
+        
+        committable = import_log.status == "validated" or (
+            import_log.status == "failed" and import_log.commit_expires_at is not None
+        )
+        if not committable:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"La validación no se puede confirmar (estado: {import_log.status})"
+            )
+        
+        if not os.path.exists(ImportExportService.dry_run_path(import_log)):
+            raise HTTPException(
+                status_code=status.HTTP_410_GONE,
+                detail="Las filas validadas ya no están disponibles"
+            )
+        
+        # Claim the log atomically so the same token is not committed twice
+        claimed = db.query(ImportLog).filter(
+            ImportLog.id == import_log.id,
+            ImportLog.status == import_log.status,
+            ImportLog.checkpoint_rows == import_log.checkpoint_rows
+        ).update(
+            {"status": "processing", "completed_at": None, "error_message": None},
+            synchronize_session=False
+        )
+        db.commit()
         
-        # Use BytesIO to get Excel as bytes
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='Productos')
+        if not claimed:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="La validación ya fue confirmada"
+            )
+        
+        db.refresh(import_log)
+        return ImportExportService.start_import(db, import_log, background)
+    
+    @staticmethod
+    def run_import_job(bind, log_id: int) -> None:
+        """
+        Run a queued (or resumed) import in a background worker.
+        
+        Uses its own database session, since the request session is closed
+        as soon as the endpoint returns.
+        
+        Args:
+            bind: Engine or connection to bind the session to
+            log_id: Import log ID
+        """
+        db = SessionLocal(bind=bind)
+        
+        try:
+            import_log = db.query(ImportLog).filter(ImportLog.id == log_id).first()
+            ImportExportService.process_import(db, import_log)
+        
+        except Exception:
+            logger.exception("Import %s failed", log_id)
+        
+        finally:
+            db.close()
+    
+    @staticmethod
+    def start_import(db: Session, import_log: ImportLog, background: bool) -> Dict:
+        """
+        Queue an import log to the worker pool or run it in the request.
+        
+        Args:
+            db: Database session
+            import_log: Import log in processing state, with a stored upload
+            background: Queue the import and return right away
+            
+        Returns:
+            Dictionary with import results
+            
+        Raises:
+            HTTPException: If an in-request import fails
+        """
+        if background:
+            submit_job(ImportExportService.run_import_job, db.get_bind(), import_log.id)
+            return ImportExportService.build_import_result(import_log)
+        
+        try:
+            return ImportExportService.process_import(db, import_log)
+        
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error durante la importación: {str(e)}"
+            )
+    
+    @staticmethod
+    async def import_products(
+        db: Session,
+        file: UploadFile,
+        background: bool = False,
+        mode: str = "insert",
+        sheet: Optional[str] = None,
+        skip_rows: int = 0,
+        dry_run: bool = False
+    ) -> Dict:
+        """
+        Import products from CSV or Excel file.
+        
+        With dry_run the file is only validated; the result carries a
+        commit_token to import the validated rows later with commit_dry_run.
+        
+        Args:
+            db: Database session
+            file: Uploaded file
+            background: Queue the import to the worker pool and return right away
+            mode: "insert" to always add rows, "upsert" to insert/update/skip
+                  by (categoria, nombre)
+            sheet: Excel sheet name or index (defaults to the active sheet)
+            skip_rows: Leading Excel rows to skip before the header row
+            dry_run: Validate only and keep the valid rows for a later commit
+            
+        Returns:
+            Dictionary with import results
+            
+        Raises:
+            HTTPException: If the import mode is not valid
+        """
+        if mode not in ImportExportService.IMPORT_MODES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Modo de importación no válido. Use: {', '.join(ImportExportService.IMPORT_MODES)}"
+            )
+        
+        if background:
+            ImportExportService.validate_file_extension(file.filename)
+        
+        if dry_run:
+            ImportExportService.purge_expired_dry_runs(db)
+        
+        # Create import log
+        import_log = ImportLog(
+            filename=file.filename,
+            mode=mode,
+            dry_run=dry_run,
+            commit_token=secrets.token_urlsafe(32) if dry_run else None,
+            sheet_name=sheet,
+            skip_rows=skip_rows,
+            status="processing"
+        )
+        db.add(import_log)
+        db.commit()
+        db.refresh(import_log)
+        
+        # Keep the upload on disk so the import can be resumed if it fails.
+        # Copying, hashing and scanning the file are blocking: keep them off the event loop.
+        import_log.file_path, import_log.file_fingerprint = await run_in_threadpool(
+            ImportExportService.save_upload, file
+        )
+        if background:
+            import_log.expected_rows = await run_in_threadpool(
+                ImportExportService.estimate_row_count, import_log.file_path, file.filename, sheet, skip_rows
+            )
+        db.commit()
+        
+        return await run_in_threadpool(ImportExportService.start_import, db, import_log, background)
+    
+    @staticmethod
+    def is_resumable(import_log: ImportLog) -> bool:
+        """
+        Check whether an import can be resumed from its checkpoint.
+        
+        Failed imports can be resumed, and so can imports stuck in processing
+        without progress for IMPORT_STALE_SECONDS (e.g. after a worker restart).
+        
+        Args:
+            import_log: Import log
+            
+        Returns:
+            True if the import can be resumed
+        """
+        if import_log.dry_run:
+            return False  # Dry runs are committed (or retried) with their token
+        
+        if import_log.status == "failed":
+            return True
+        
+        if import_log.status != "processing":
+            return False
+        
+        last_activity = import_log.updated_at or import_log.started_at
+        if last_activity is None:
+            return False
+        
+        now = datetime.now(timezone.utc) if last_activity.tzinfo else datetime.utcnow()
+        return (now - last_activity).total_seconds() > settings.IMPORT_STALE_SECONDS
+    
+    @staticmethod
+    def resume_import(db: Session, log_id: int, background: bool = True) -> Dict:
+        """
+        Resume a failed import from its last committed checkpoint.
+        
+        Args:
+            db: Database session
+            log_id: Import log ID
+            background: Queue the import and return right away
+            
+        Returns:
+            Dictionary with import results
+            
+        Raises:
+            HTTPException: If the log is not found, cannot be resumed, or its
+                stored upload is missing or was modified
+        """
+        import_log = db.query(ImportLog).filter(ImportLog.id == log_id).first()
+        
+        if not import_log:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Log de importación no encontrado"
+            )
+        
+        if not ImportExportService.is_resumable(import_log):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"La importación no se puede reanudar (estado: {import_log.status})"
+            )
+        
+        if not import_log.file_path or not os.path.exists(import_log.file_path):
+            raise HTTPException(
+                status_code=status.HTTP_410_GONE,
+                detail="El archivo original de la importación ya no está disponible"
+            )
+        
+        if ImportExportService.file_fingerprint(import_log.file_path) != import_log.file_fingerprint:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="El archivo almacenado no coincide con la huella de la importación original"
+            )
+        
+        # Claim the log atomically so concurrent resumes do not run twice
+        claimed = db.query(ImportLog).filter(
+            ImportLog.id == log_id,
+            ImportLog.status == import_log.status,
+            ImportLog.checkpoint_rows == import_log.checkpoint_rows
+        ).update(
+            {"status": "processing", "completed_at": None, "error_message": None},
+            synchronize_session=False
+        )
+        db.commit()
+        
+        if not claimed:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="La importación ya fue reanudada"
+            )
+        
+        db.refresh(import_log)
+        return ImportExportService.start_import(db, import_log, background)
+    
+    @staticmethod
+    def describe_failure(error: Exception) -> str:
+        """
+        Get the message stored on an import log when the import fails.
+        
+        Args:
+            error: Exception that aborted the import
+            
+        Returns:
+            The detail of an HTTPException, or the exception text otherwise
+        """
+        if isinstance(error, HTTPException):
+            return str(error.detail)
+        return str(error) or error.__class__.__name__
+    
+    @staticmethod
+    def get_import_progress(db: Session, log_id: int) -> Dict:
+        """
+        Get live progress of an import.
+        
+        Args:
+            db: Database session
+            log_id: Import log ID
+            
+        Returns:
+            Dictionary with processed rows, throughput and ETA
+            
+        Raises:
+            HTTPException: If the import log is not found
+        """
+        import_log = db.query(ImportLog).filter(ImportLog.id == log_id).first()
+        
+        if not import_log:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Log de importación no encontrado"
+            )
+        
+        rows_processed = import_log.total_rows or 0
+        expected_rows = import_log.expected_rows
+        started_at = import_log.started_at
+        finished_at = import_log.completed_at
+        
+        if finished_at is None:
+            finished_at = (
+                datetime.now(timezone.utc) if started_at and started_at.tzinfo
+                else datetime.utcnow()
+            )
+        
+        rows_per_second = None
+        if started_at:
+            elapsed = (finished_at - started_at).total_seconds()
+            if elapsed > 0:
+                rows_per_second = round(rows_processed / elapsed, 2)
+        
+        percent = None
+        eta_seconds = None
+        if import_log.status != "processing":
+            percent = 100.0 if import_log.status == "completed" else None
+            eta_seconds = 0.0
+        elif expected_rows:
+            percent = round(min(rows_processed / expected_rows, 1.0) * 100, 2)
+            if rows_per_second:
+                eta_seconds = round(max(expected_rows - rows_processed, 0) / rows_per_second, 1)
+        
+        return {
+            "log_id": import_log.id,
+            "filename": import_log.filename,
+            "status": import_log.status,
+            "rows_processed": rows_processed,
+            "expected_rows": expected_rows,
+            "successful_rows": import_log.successful_rows or 0,
+            "failed_rows": import_log.failed_rows or 0,
+            "inserted_rows": import_log.inserted_rows or 0,
+            "updated_rows": import_log.updated_rows or 0,
+            "unchanged_rows": import_log.unchanged_rows or 0,
+            "superseded_rows": import_log.superseded_rows or 0,
+            "percent": percent,
+            "rows_per_second": rows_per_second,
+            "eta_seconds": eta_seconds,
+            "error_message": import_log.error_message,
+            "started_at": import_log.started_at,
+            "completed_at": import_log.completed_at
+        }
+    
+    @staticmethod
+    def get_import_log(db: Session, log_id: int) -> ImportLog:
+        """
+        Get an import log by ID.
+        
+        Args:
+            db: Database session
+            log_id: Import log ID
+            
+        Returns:
+            Import log
+            
+        Raises:
+            HTTPException: If the import log is not found
+        """
+        import_log = db.query(ImportLog).filter(ImportLog.id == log_id).first()
+        
+        if not import_log:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Log de importación no encontrado"
+            )
+        
+        return import_log
+    
+    @staticmethod
+    def get_import_errors(
+        db: Session,
+        log_id: int,
+        skip: int = 0,
+        limit: int = 100
+    ) -> tuple[List[ImportRowError], int]:
+        """
+        Get the row errors of an import with pagination, ordered by row.
+        
+        Args:
+            db: Database session
+            log_id: Import log ID
+            skip: Number of records to skip
+            limit: Maximum number of records to return
+            
+        Returns:
+            Tuple of (list of row errors, total count)
+            
+        Raises:
+            HTTPException: If the import log is not found
+        """
+        ImportExportService.get_import_log(db, log_id)
+        
+        query = db.query(ImportRowError).filter(ImportRowError.log_id == log_id)
+        total = query.count()
+        errors = query.order_by(ImportRowError.row, ImportRowError.id).offset(skip).limit(limit).all()
+        
+        return errors, total
+    
+    @staticmethod
+    def has_import_errors(db: Session, import_log: ImportLog) -> bool:
+        """
+        Check whether an import has row errors to download.
+        
+        Args:
+            db: Database session
+            import_log: Import log
+            
+        Returns:
+            True if there are stored row errors (or a legacy JSON error list)
+        """
+        if import_log.failed_rows == 0:
+            return False
+        
+        stored = db.query(ImportRowError.id).filter(ImportRowError.log_id == import_log.id).first()
+        return stored is not None or bool(import_log.errors)
+    
+    @staticmethod
+    def iter_import_errors_csv(bind, log_id: int) -> Iterator[bytes]:
+        """
+        Stream the row errors of an import as CSV.
+        
+        Rows are read with a server-side cursor in EXPORT_BATCH_SIZE batches
+        through a session of its own, since the response body is produced
+        after the request's session has been closed. Imports made before the
+        import_errors table existed are read from their JSON error list.
+        
+        Args:
+            bind: Engine or connection of the request's session
+            log_id: Import log ID
+            
+        Yields:
+            Encoded CSV lines (header first)
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        
+        def flush() -> bytes:
+            data = buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+            return data
+        
+        writer.writerow(['Fila', 'Campo', 'Valor', 'Error'])
+        yield flush()
+        
+        db = SessionLocal(bind=bind)
+        try:
+            result = db.execute(
+                select(ImportRowError.row, ImportRowError.field, ImportRowError.value, ImportRowError.message)
+                .where(ImportRowError.log_id == log_id)
+                .order_by(ImportRowError.row, ImportRowError.id)
+                .execution_options(stream_results=True, yield_per=settings.EXPORT_BATCH_SIZE)
+            )
+            
+            found = False
+            for partition in result.partitions():
+                found = True
+                writer.writerows(partition)
+                yield flush()
+            
+            if found:
+                return
+            
+            # Legacy logs keep their row errors in the JSON error list
+            import_log = db.get(ImportLog, log_id)
+            try:
+                errors = json.loads(import_log.errors) if import_log and import_log.errors else []
+            except ValueError:
+                errors = []
+            
+            for error in errors:
+                writer.writerow([
+                    error.get('row', 'N/A'),
+                    error.get('field', 'N/A'),
+                    error.get('value', 'N/A'),
+                    error.get('error', 'N/A')
+                ])
+            yield flush()
+        
+        finally:
+            db.close()
+    
+    @staticmethod
+    def parse_export_columns(columns: Optional[str] = None) -> List[str]:
+        """
+        Parse a comma-separated column projection for exports.
+        
+        Args:
+            columns: Comma-separated column names (defaults to EXPORT_COLUMNS)
+            
+        Returns:
+            List of column names, in the requested order
+            
+        Raises:
+            HTTPException: If a column is unknown or none is given
+        """
+        if columns is None:
+            return list(ImportExportService.EXPORT_COLUMNS)
+        
+        selected = list(dict.fromkeys(column.strip() for column in columns.split(',') if column.strip()))
+        unknown = [column for column in selected if column not in ImportExportService.EXPORT_COLUMNS]
+        
+        if unknown or not selected:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Columnas no válidas. Use: {', '.join(ImportExportService.EXPORT_COLUMNS)}"
+            )
+        
+        return selected
+    
+    @staticmethod
+    def iter_export_batches(
+        bind,
+        filters: Optional[ProductFilter] = None,
+        columns: Optional[List[str]] = None,
+        progress: Optional[Callable[[int], None]] = None
+    ) -> Iterator[List[tuple]]:
+        """
+        Read the products to export in EXPORT_BATCH_SIZE batches.
+        
+        Only the requested columns are selected and streamed as plain tuples
+        from a server-side cursor (no ORM objects), ordered by ID and capped
+        at MAX_EXPORT_RECORDS. A session of its own is used, since the
+        response body is produced after the request's session has been closed.
+        
+        Args:
+            bind: Engine or connection of the request's session
+            filters: Same filters as the product listing
+            columns: Columns to export (defaults to EXPORT_COLUMNS)
+            progress: Called with the number of rows of each batch read
+            
+        Yields:
+            Lists of row tuples in columns order
+        """
+        columns = columns or ImportExportService.EXPORT_COLUMNS
+        conditions = ProductService.build_filters(**filters.model_dump()) if filters else []
+        
+        db = SessionLocal(bind=bind)
+        try:
+            result = db.execute(
+                select(*[getattr(Product, column) for column in columns])
+                .where(*conditions)
+                .order_by(Product.id)
+                .limit(settings.MAX_EXPORT_RECORDS)
+                .execution_options(stream_results=True, yield_per=settings.EXPORT_BATCH_SIZE)
+            )
+            
+            for partition in result.partitions():
+                yield partition
+                if progress is not None:
+                    progress(len(partition))
+        
+        finally:
+            db.close()
+    
+    @staticmethod
+    def validate_compression(compression: Optional[str]) -> Optional[str]:
+        """
+        Validate an explicitly requested export compression.
+        
+        Args:
+            compression: "gzip", "zstd", "none" or None
+            
+        Returns:
+            Encoding name, or None for no compression
+            
+        Raises:
+            HTTPException: If the compression is unknown or not installed
+        """
+        if compression is None or compression == "none":
+            return None
+        
+        if compression not in ENCODINGS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Compresión no válida. Use: {', '.join([*ENCODINGS, 'none'])}"
+            )
+        
+        if not is_available(compression):
+            raise HTTPException(
+                status_code=status.HTTP_501_NOT_IMPLEMENTED,
+                detail=f"La compresión {compression} requiere el paquete zstandard"
+            )
+        
+        return compression
+    
+    @staticmethod
+    def export_cache_key(
+        file_format: str,
+        version: str,
+        filters: Optional[ProductFilter] = None,
+        columns: Optional[List[str]] = None,
+        encoding: Optional[str] = None,
+        as_file: bool = False
+    ) -> str:
+        """
+        Build the cache key (and ETag) of an export without touching the database.
+        
+        Args:
+            file_format: Export format
+            version: Catalog version (see get_catalog_version)
+            filters: Same filters as the product listing
+            columns: Exported columns
+            encoding: Compression of the export content
+            as_file: Whether the compressed content is sent as a file
+            
+        Returns:
+            SHA-1 hex digest of the export parameters and catalog version
+        """
+        parameters = {
+            "format": file_format,
+            "version": version,
+            "filters": filters.model_dump() if filters else None,
+            "columns": columns or ImportExportService.EXPORT_COLUMNS,
+            "max_records": settings.MAX_EXPORT_RECORDS,
+            "sheet_rows": ImportExportService.EXCEL_MAX_ROWS,
+            "encoding": encoding,
+            "as_file": as_file
+        }
+        
+        return hashlib.sha1(json.dumps(parameters, sort_keys=True).encode("utf-8")).hexdigest()
+    
+    @staticmethod
+    def export_to_csv(
+        bind,
+        filters: Optional[ProductFilter] = None,
+        columns: Optional[List[str]] = None,
+        progress: Optional[Callable[[int], None]] = None
+    ) -> Iterator[bytes]:
+        """
+        Export products to CSV incrementally.
+        
+        Each batch read from the database is written and yielded right away,
+        so memory use does not grow with the size of the catalog.
+        
+        Args:
+            bind: Engine or connection of the request's session
+            filters: Same filters as the product listing
+            columns: Columns to export (defaults to EXPORT_COLUMNS)
+            progress: Called with the number of rows of each batch read
+            
+        Yields:
+            Encoded CSV content (header first, then one piece per batch)
+        """
+        columns = columns or ImportExportService.EXPORT_COLUMNS
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        
+        def flush() -> bytes:
+            data = buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+            return data
+        
+        writer.writerow(columns)
+        yield flush()
+        
+        for batch in ImportExportService.iter_export_batches(bind, filters, columns, progress):
+            writer.writerows(batch)
+            yield flush()
+    
+    @staticmethod
+    def export_to_excel(
+        bind,
+        filters: Optional[ProductFilter] = None,
+        columns: Optional[List[str]] = None,
+        progress: Optional[Callable[[int], None]] = None
+    ) -> str:
+        """
+        Export products to an Excel file on disk.
+        
+        Uses an openpyxl write-only workbook fed batch by batch from the
+        database, so memory use does not grow with the size of the catalog.
+        A new sheet is started whenever one reaches Excel's row limit.
+        
+        Args:
+            bind: Engine or connection of the request's session
+            filters: Same filters as the product listing
+            columns: Columns to export (defaults to EXPORT_COLUMNS)
+            progress: Called with the number of rows of each batch read
+            
+        Returns:
+            Path of a temporary .xlsx file (the caller must delete it)
+        """
+        fd, path = tempfile.mkstemp(prefix="productos_export_", suffix=".xlsx")
+        os.close(fd)
+        
+        columns = columns or ImportExportService.EXPORT_COLUMNS
+        workbook = Workbook(write_only=True)
+        worksheet = None
+        sheet_rows = 0
+        max_data_rows = ImportExportService.EXCEL_MAX_ROWS - 1  # Minus the header row
+        
+        try:
+            for batch in ImportExportService.iter_export_batches(bind, filters, columns, progress):
+                for row in batch:
+                    if worksheet is None or sheet_rows == max_data_rows:
+                        title = "Productos" if worksheet is None else f"Productos {len(workbook.worksheets) + 1}"
+                        worksheet = workbook.create_sheet(title)
+                        worksheet.append(columns)
+                        sheet_rows = 0
+                    worksheet.append(tuple(row))
+                    sheet_rows += 1
+            
+            if worksheet is None:
+                workbook.create_sheet("Productos").append(columns)
+            
+            workbook.save(path)
+        
+        except Exception:
+            os.remove(path)
+            raise
+        
+        return path
+    
+    @staticmethod
+    def export_to_columnar(
+        bind,
+        file_format: str,
+        filters: Optional[ProductFilter] = None,
+        columns: Optional[List[str]] = None,
+        progress: Optional[Callable[[int], None]] = None
+    ) -> str:
+        """
+        Export products to a Parquet or Arrow IPC file on disk.
+        
+        Each EXPORT_BATCH_SIZE batch read from the database is written as one
+        Parquet row group (or Arrow record batch) with typed columns.
+        
+        Args:
+            bind: Engine or connection of the request's session
+            file_format: "parquet" or "arrow"
+            filters: Same filters as the product listing
+            columns: Columns to export (defaults to EXPORT_COLUMNS)
+            progress: Called with the number of rows of each batch read
+            
+        Returns:
+            Path of a temporary file (the caller must delete it)
+            
+        Raises:
+            HTTPException: If pyarrow is not installed
+        """
+        ImportExportService.require_pyarrow(file_format)
+        
+        columns = columns or ImportExportService.EXPORT_COLUMNS
+        schema = pa.schema([
+            (column, pa.type_for_alias(ImportExportService.ARROW_TYPES[column]))
+            for column in columns
+        ])
+        
+        fd, path = tempfile.mkstemp(prefix="productos_export_", suffix=f".{file_format}")
+        os.close(fd)
+        
+        try:
+            if file_format == 'parquet':
+                writer = pq.ParquetWriter(path, schema)
+            else:
+                sink = pa.OSFile(path, 'wb')
+                writer = pa.ipc.new_file(sink, schema)
+            
+            try:
+                for batch in ImportExportService.iter_export_batches(bind, filters, columns, progress):
+                    writer.write_batch(pa.RecordBatch.from_arrays(
+                        [pa.array(values, type=field.type) for values, field in zip(zip(*batch), schema)],
+                        schema=schema
+                    ))
+            finally:
+                writer.close()
+                if file_format != 'parquet':
+                    sink.close()
+        
+        except Exception:
+            os.remove(path)
+            raise
+        
+        return path
+    
+    @staticmethod
+    def render_export(
+        bind,
+        file_format: str,
+        filters: Optional[ProductFilter],
+        columns: Optional[List[str]],
+        key: str,
+        version: str
+    ) -> tuple[str, bool]:
+        """
+        Render an Excel, Parquet or Arrow export and store it in the export cache.
+        
+        Identical concurrent exports (same cache key) are coalesced: one
+        request renders the file and the others are served the cached copy.
+        If the file could not be cached, it belongs to the request that
+        rendered it and the others render their own.
+        
+        Args:
+            bind: Engine or connection of the request's session
+            file_format: "excel", "parquet" or "arrow"
+            filters: Same filters as the product listing
+            columns: Columns to export
+            key: Export cache key
+            version: Catalog version the export is rendered from
+            
+        Returns:
+            Tuple of (file path, whether it is the cached copy); uncached
+            files are temporary and must be deleted by the caller
+        """
+        def render() -> tuple[str, bool]:
+            if file_format == 'excel':
+                path = ImportExportService.export_to_excel(bind, filters, columns)
+            else:
+                path = ImportExportService.export_to_columnar(bind, file_format, filters, columns)
+            
+            cached = store_export(key, path, version, bind)
+            return (cached, True) if cached else (path, False)
+        
+        result, shared = export_flight.do(key, render)
+        if shared and not result[1]:
+            result = render()
+        
+        return result
+    
+    @staticmethod
+    def share_export_stream(
+        key: str,
+        version: str,
+        bind,
+        chunks: Callable[[], Iterator[bytes]],
+        suffix: str = ""
+    ) -> AsyncIterator[bytes]:
+        """
+        Stream an export, sharing it with identical exports in flight.
+        
+        The first request starts producing the export into a spool file and
+        every identical request (same cache key) reads that file while it is
+        written, each from the start and at its own pace, so the export runs
+        once and every client still gets its first bytes right away. The
+        complete file is then kept in the export cache.
+        
+        Args:
+            key: Export cache key
+            version: Catalog version the export is rendered from
+            bind: Engine or connection of the request's session
+            chunks: Builds the encoded export content (called once, by the
+                request that starts the export)
+            suffix: File extension of the export
+            
+        Returns:
+            Async iterator over the export content
+        """
+        def keep(stream: SharedStream, complete: bool) -> bool:
+            export_flight.unshare(key, stream)
+            if not complete or settings.EXPORT_CACHE_MAX_BYTES <= 0:
+                return False
+            try:
+                return store_export(key, stream.path, version, bind) is not None
+            except OSError:
+                logger.warning("Could not cache streamed export %s", key)
+                return False
+        
+        stream, leader = export_flight.share(
+            key, lambda: SharedStream(get_cache_folder(), suffix, on_close=keep)
+        )
+        if leader:
+            stream.start(chunks())
         
-        output.seek(0)
-        return output.getvalue()
+        return stream.read()
     
     @staticmethod
     def get_import_logs(
@@ -315,7 +1846,8 @@ class ImportExportService:
         Returns:
             Tuple of (list of import logs, total count)
         """
-        query = db.query(ImportLog).order_by(ImportLog.started_at.desc())
+        # The error column may hold a large legacy JSON list; it is not listed
+        query = db.query(ImportLog).options(defer(ImportLog.errors)).order_by(ImportLog.started_at.desc())
         total = query.count()
         logs = query.offset(skip).limit(limit).all()
         
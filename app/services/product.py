@@ -1,32 +1,61 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, select, func, tuple_, literal
 from fastapi import HTTPException, status
-from typing import List, Optional
+from typing import Dict, Iterator, List, Optional
+from datetime import datetime
+import json
+import time
+from app.config import settings
+from app.database import SessionLocal
 from app.models.product import Product
-from app.schemas.product import ProductCreate, ProductUpdate
+from app.models.product_tombstone import ProductTombstone
+from app.models.change_sequence import next_change_sequence
+from app.schemas.product import ProductCreate, ProductUpdate, ProductFilter, ProductResponse, ProductListResponse
+from app.services.bulk_loader import BulkLoader
+from app.services.search import ProductSearchService
+from app.utils.hashing import product_content_hash
+from app.utils.catalog_version import get_catalog_version
+from app.utils.single_flight import listing_flight
+from app.utils.cursor import encode_cursor, decode_cursor
+from app.utils.cache import LRUCache
 
 
 class ProductService:
     """Service for product-related operations."""
     
+    # Fields of ProductResponse, in order
+    STREAM_COLUMNS = ['id', 'nombre', 'descripcion', 'precio', 'stock', 'categoria', 'created_at', 'updated_at']
+    
+    # Fields the listing can be sorted by (ties are broken by id)
+    SORT_FIELDS = ['id', 'nombre', 'precio', 'stock']
+    
+    # Ways of computing the listing total (include_total)
+    TOTAL_MODES = ['exact', 'estimate', 'false']
+    
+    # Exact listing totals by (catalog version, normalized filters)
+    COUNT_CACHE = LRUCache("product_counts", settings.COUNT_CACHE_SIZE)
+    
+    # Latest per-category statistics, used for estimated totals
+    CATEGORY_STATS = LRUCache("category_stats", 1)
+    
+    # Serialized ProductResponse payloads by product id, for GET /products/{id}
+    PRODUCT_CACHE = LRUCache("products", settings.PRODUCT_CACHE_SIZE, settings.PRODUCT_CACHE_TTL_SECONDS)
+    
+    # Serialized ProductListResponse bodies by (catalog version, filters, sort, page, total mode)
+    LISTING_CACHE = LRUCache("product_listings", settings.LISTING_CACHE_SIZE, settings.LISTING_CACHE_TTL_SECONDS)
+    
     @staticmethod
-    def get_products(
-        db: Session,
-        skip: int = 0,
-        limit: int = 50,
+    def build_filters(
         categoria: Optional[str] = None,
         nombre: Optional[str] = None,
         precio_min: Optional[float] = None,
         precio_max: Optional[float] = None,
         stock_min: Optional[int] = None
-    ) -> tuple[List[Product], int]:
+    ) -> list:
         """
-        Get a list of products with optional filters.
+        Build the filter conditions shared by the product listing and exports.
         
         Args:
-            db: Database session
-            skip: Number of records to skip (pagination)
-            limit: Maximum number of records to return
             categoria: Filter by category
             nombre: Filter by name (partial match)
             precio_min: Filter by minimum price
@@ -34,11 +63,8 @@ class ProductService:
             stock_min: Filter by minimum stock
             
         Returns:
-            Tuple of (list of products, total count)
+            List of SQLAlchemy conditions
         """
-        query = db.query(Product)
-        
-        # Apply filters
         filters = []
         if categoria:
             filters.append(Product.categoria == categoria)
@@ -51,16 +77,506 @@ class ProductService:
         if stock_min is not None:
             filters.append(Product.stock >= stock_min)
         
-        if filters:
-            query = query.filter(and_(*filters))
+        return filters
+    
+    @staticmethod
+    def decode_page_cursor(cursor: str, sort_by: str, sort_order: str) -> tuple:
+        """
+        Decode a listing cursor into the (sort value, id) of the last row seen.
+        
+        Args:
+            cursor: Cursor returned as next_cursor by a previous page
+            sort_by: Sort field of the current request
+            sort_order: Sort order of the current request
+            
+        Returns:
+            Tuple of (sort value, product id)
+            
+        Raises:
+            HTTPException: If the cursor is not valid or was built for another order
+        """
+        try:
+            payload = decode_cursor(cursor)
+            position = payload["v"], int(payload["i"])
+            if isinstance(position[0], bool) or not isinstance(position[0], (str, int, float)):
+                raise TypeError("Invalid sort value")
+            same_order = payload["s"] == sort_by and payload["o"] == sort_order
+        except (ValueError, KeyError, TypeError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Cursor no válido"
+            )
+        
+        if not same_order:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="El cursor no corresponde al orden solicitado (sort_by / sort_order)"
+            )
+        
+        return position
+    
+    @staticmethod
+    def get_products(
+        db: Session,
+        skip: int = 0,
+        limit: int = 50,
+        categoria: Optional[str] = None,
+        nombre: Optional[str] = None,
+        precio_min: Optional[float] = None,
+        precio_max: Optional[float] = None,
+        stock_min: Optional[int] = None,
+        sort_by: Optional[str] = None,
+        sort_order: str = "asc",
+        cursor: Optional[str] = None,
+        q: Optional[str] = None
+    ) -> tuple[List[ProductResponse], Optional[str]]:
+        """
+        Get a page of products with optional filters (see count_products for the total).
+        
+        Products are ordered by (sort_by, id). With a cursor the page is
+        found by seeking past the last row of the previous page on that key,
+        so every page costs the same; skip is then ignored. Without a cursor
+        skip/limit offset paging is used. A full-text query (q) restricts the
+        listing to matching products, by default most relevant first.
+        
+        Identical concurrent listings (same normalized parameters and catalog
+        version) are coalesced: one request runs the queries and the others
+        receive the same products. They are returned as ProductResponse
+        models, not ORM objects, so no request depends on the session of the
+        one that loaded them.
+        
+        Args:
+            db: Database session
+            skip: Number of records to skip (pagination)
+            limit: Maximum number of records to return
+            categoria: Filter by category
+            nombre: Filter by name (partial match)
+            precio_min: Filter by minimum price
+            precio_max: Filter by maximum price
+            stock_min: Filter by minimum stock
+            sort_by: Field to sort by (one of SORT_FIELDS, or "relevance" with
+                q); defaults to "relevance" with q and "id" otherwise
+            sort_order: "asc" or "desc"
+            cursor: Cursor returned as next_cursor by the previous page
+            q: Full-text search over nombre and descripcion
+            
+        Returns:
+            Tuple of (list of products, cursor of the next page or None on
+            the last page)
+            
+        Raises:
+            HTTPException: If the sort, the cursor or the search are not valid
+        """
+        q = q.strip() if q else None
+        sort_by = sort_by or ("relevance" if q else "id")
+        sort_fields = ProductService.SORT_FIELDS + (["relevance"] if q else [])
+        if sort_by not in sort_fields or sort_order not in ("asc", "desc"):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Orden no válido. Campos permitidos: {', '.join(sort_fields)} (asc / desc)"
+            )
+        
+        position = ProductService.decode_page_cursor(cursor, sort_by, sort_order) if cursor else None
+        
+        key = (
+            "page",
+            get_catalog_version(db),
+            ProductService.filters_key(categoria, nombre, precio_min, precio_max, stock_min, q),
+            None if position else skip,
+            limit,
+            sort_by,
+            sort_order,
+            position
+        )
+        
+        def run_queries() -> tuple[List[ProductResponse], Optional[str]]:
+            query = db.query(Product)
+            
+            # Apply filters
+            filters = ProductService.build_filters(categoria, nombre, precio_min, precio_max, stock_min)
+            
+            if filters:
+                query = query.filter(and_(*filters))
+            
+            sort_column = getattr(Product, sort_by, None)
+            if q:
+                search = ProductSearchService.search_subquery(db, q)
+                query = query.join(search, search.c.id == Product.id)
+                if sort_by == "relevance":
+                    sort_column = search.c.score
+            
+            # Get paginated results, one extra row to know if there is a next page
+            sort_key = tuple_(sort_column, Product.id)
+            if sort_order == "desc":
+                query = query.order_by(sort_column.desc(), Product.id.desc())
+            else:
+                query = query.order_by(sort_column, Product.id)
+            
+            if position:
+                seek = tuple_(literal(position[0]), literal(position[1]))
+                query = query.filter(sort_key < seek if sort_order == "desc" else sort_key > seek)
+            else:
+                query = query.offset(skip)
+            
+            # The sort value of each row is read back for the next cursor
+            rows = query.add_columns(sort_column).limit(limit + 1).all()
+            products = [ProductResponse.model_validate(product) for product, _ in rows[:limit]]
+            
+            next_cursor = None
+            if len(rows) > limit:
+                last, sort_value = rows[limit - 1]
+                next_cursor = encode_cursor({
+                    "s": sort_by,
+                    "o": sort_order,
+                    "v": sort_value,
+                    "i": last.id
+                })
+            
+            return products, next_cursor
+        
+        result, _ = listing_flight.do(key, run_queries, timeout=settings.LISTING_WAIT_SECONDS)
+        return result
+    
+    @staticmethod
+    def get_listing_payload(
+        db: Session,
+        skip: int = 0,
+        limit: int = 50,
+        categoria: Optional[str] = None,
+        nombre: Optional[str] = None,
+        precio_min: Optional[float] = None,
+        precio_max: Optional[float] = None,
+        stock_min: Optional[int] = None,
+        sort_by: Optional[str] = None,
+        sort_order: str = "asc",
+        cursor: Optional[str] = None,
+        q: Optional[str] = None,
+        include_total: str = "exact"
+    ) -> bytes:
+        """
+        Get a product listing serialized as a ProductListResponse JSON body.
+        
+        Bodies are cached by catalog version and normalized parameters, so a
+        repeated listing runs neither the count nor the page query. Any product
+        write or import bumps the version, which invalidates every cached
+        listing at once; a listing is only cached if the version did not
+        change while it was built.
         
-        # Get total count
-        total = query.count()
+        Args:
+            db: Database session
+            skip: Number of records to skip (ignored with a cursor)
+            limit: Maximum number of records to return
+            categoria: Filter by category
+            nombre: Filter by name (partial match)
+            precio_min: Filter by minimum price
+            precio_max: Filter by maximum price
+            stock_min: Filter by minimum stock
+            sort_by: Field to sort by (see get_products)
+            sort_order: "asc" or "desc"
+            cursor: Cursor returned as next_cursor by the previous page
+            q: Full-text search over nombre and descripcion
+            include_total: "exact", "estimate" or "false" (see count_products)
+            
+        Returns:
+            JSON body
+            
+        Raises:
+            HTTPException: If any listing parameter is not valid
+        """
+        version = get_catalog_version(db)
+        filters = ProductService.filters_key(categoria, nombre, precio_min, precio_max, stock_min, q)
+        key = (
+            version,
+            filters,
+            sort_by or ("relevance" if filters[-1] else "id"),
+            sort_order,
+            cursor or None,
+            None if cursor else skip,
+            limit,
+            include_total
+        )
+        payload = ProductService.LISTING_CACHE.get(key)
+        if payload is not None:
+            return payload
+        
+        total, total_estimated = ProductService.count_products(
+            db, include_total, categoria, nombre, precio_min, precio_max, stock_min, q
+        )
+        products, next_cursor = ProductService.get_products(
+            db, skip, limit, categoria, nombre, precio_min, precio_max, stock_min,
+            sort_by, sort_order, cursor, q
+        )
+        payload = ProductListResponse(
+            total=total,
+            total_estimated=total_estimated,
+            skip=0 if cursor else skip,
+            limit=limit,
+            items=products,
+            next_cursor=next_cursor
+        ).model_dump_json().encode("utf-8")
         
-        # Get paginated results
-        products = query.offset(skip).limit(limit).all()
+        if get_catalog_version(db) == version:
+            ProductService.LISTING_CACHE.set(key, payload)
         
-        return products, total
+        return payload
+    
+    @staticmethod
+    def filters_key(
+        categoria: Optional[str] = None,
+        nombre: Optional[str] = None,
+        precio_min: Optional[float] = None,
+        precio_max: Optional[float] = None,
+        stock_min: Optional[int] = None,
+        q: Optional[str] = None
+    ) -> tuple:
+        """
+        Normalize listing filters into a hashable key (for caches and coalescing).
+        
+        Returns:
+            Tuple with one entry per filter, None when it is not applied
+        """
+        return (
+            categoria or None,
+            nombre or None,
+            None if precio_min is None else float(precio_min),
+            None if precio_max is None else float(precio_max),
+            stock_min,
+            q.strip() or None if q else None
+        )
+    
+    @staticmethod
+    def get_category_stats(db: Session) -> Dict[str, Dict]:
+        """
+        Get per-category statistics (product count and price/stock ranges).
+        
+        Statistics are computed with one grouped query over the categoria
+        index and kept in memory. They are recomputed after a catalog write,
+        at most once every CATEGORY_STATS_MAX_AGE_SECONDS, so a burst of
+        writes does not trigger a burst of recomputations.
+        
+        Args:
+            db: Database session
+            
+        Returns:
+            Dictionary of categoria -> {count, precio_min, precio_max, stock_min, stock_max}
+        """
+        version = get_catalog_version(db)
+        cached = ProductService.CATEGORY_STATS.get("categories")
+        if cached is not None:
+            stats_version, computed_at, stats = cached
+            if stats_version == version or time.monotonic() - computed_at < settings.CATEGORY_STATS_MAX_AGE_SECONDS:
+                return stats
+        
+        def compute() -> Dict[str, Dict]:
+            rows = db.execute(
+                select(
+                    Product.categoria,
+                    func.count(Product.id),
+                    func.min(Product.precio),
+                    func.max(Product.precio),
+                    func.min(Product.stock),
+                    func.max(Product.stock)
+                ).group_by(Product.categoria)
+            ).all()
+            stats = {
+                categoria: {
+                    "count": count,
+                    "precio_min": precio_min,
+                    "precio_max": precio_max,
+                    "stock_min": stock_min,
+                    "stock_max": stock_max
+                }
+                for categoria, count, precio_min, precio_max, stock_min, stock_max in rows
+            }
+            ProductService.CATEGORY_STATS.set("categories", (version, time.monotonic(), stats))
+            return stats
+        
+        stats, _ = listing_flight.do(("category_stats", version), compute, timeout=settings.LISTING_WAIT_SECONDS)
+        return stats
+    
+    @staticmethod
+    def _range_fraction(
+        low: float,
+        high: float,
+        minimum: Optional[float],
+        maximum: Optional[float]
+    ) -> float:
+        """Fraction of a [low, high] range inside [minimum, maximum], assuming uniform values."""
+        start = low if minimum is None else max(low, minimum)
+        end = high if maximum is None else min(high, maximum)
+        if end < start:
+            return 0.0
+        if high == low:
+            return 1.0
+        return (end - start) / (high - low)
+    
+    @staticmethod
+    def estimate_count(
+        stats: Dict[str, Dict],
+        categoria: Optional[str] = None,
+        precio_min: Optional[float] = None,
+        precio_max: Optional[float] = None,
+        stock_min: Optional[int] = None
+    ) -> int:
+        """
+        Estimate the number of products matching the filters from category statistics.
+        
+        Exact for the category filter alone; price and stock filters are
+        estimated assuming values are spread evenly over each category's range.
+        
+        Args:
+            stats: Result of get_category_stats()
+            categoria: Filter by category
+            precio_min: Filter by minimum price
+            precio_max: Filter by maximum price
+            stock_min: Filter by minimum stock
+            
+        Returns:
+            Estimated product count
+        """
+        if categoria:
+            categories = [stats[categoria]] if categoria in stats else []
+        else:
+            categories = stats.values()
+        
+        estimate = 0.0
+        for category in categories:
+            estimate += (
+                category["count"]
+                * ProductService._range_fraction(category["precio_min"], category["precio_max"], precio_min, precio_max)
+                * ProductService._range_fraction(category["stock_min"], category["stock_max"], stock_min, None)
+            )
+        
+        return round(estimate)
+    
+    @staticmethod
+    def count_products(
+        db: Session,
+        include_total: str = "exact",
+        categoria: Optional[str] = None,
+        nombre: Optional[str] = None,
+        precio_min: Optional[float] = None,
+        precio_max: Optional[float] = None,
+        stock_min: Optional[int] = None,
+        q: Optional[str] = None
+    ) -> tuple[Optional[int], bool]:
+        """
+        Get the total number of products matching the listing filters.
+        
+        Exact totals are cached per catalog version and normalized filters,
+        so paging through a listing counts it once. Estimates come from the
+        per-category statistics; the name filter and full-text search cannot
+        be estimated from them, so they are always counted exactly.
+        
+        Args:
+            db: Database session
+            include_total: "exact", "estimate" or "false" (no total)
+            categoria: Filter by category
+            nombre: Filter by name (partial match)
+            precio_min: Filter by minimum price
+            precio_max: Filter by maximum price
+            stock_min: Filter by minimum stock
+            q: Full-text search over nombre and descripcion
+            
+        Returns:
+            Tuple of (total or None, whether it is an estimate)
+            
+        Raises:
+            HTTPException: If include_total is not valid
+        """
+        if include_total not in ProductService.TOTAL_MODES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"include_total no válido. Valores permitidos: {', '.join(ProductService.TOTAL_MODES)}"
+            )
+        
+        if include_total == "false":
+            return None, False
+        
+        q = q.strip() if q else None
+        
+        if include_total == "estimate" and not nombre and not q:
+            stats = ProductService.get_category_stats(db)
+            return ProductService.estimate_count(stats, categoria, precio_min, precio_max, stock_min), True
+        
+        key = (get_catalog_version(db), ProductService.filters_key(categoria, nombre, precio_min, precio_max, stock_min, q))
+        total = ProductService.COUNT_CACHE.get(key)
+        if total is not None:
+            return total, False
+        
+        def count() -> int:
+            query = select(func.count(Product.id))
+            filters = ProductService.build_filters(categoria, nombre, precio_min, precio_max, stock_min)
+            if filters:
+                query = query.where(and_(*filters))
+            if q:
+                search = ProductSearchService.search_subquery(db, q)
+                query = query.join(search, search.c.id == Product.id)
+            return db.execute(query).scalar_one()
+        
+        total, _ = listing_flight.do(("count",) + key, count, timeout=settings.LISTING_WAIT_SECONDS)
+        ProductService.COUNT_CACHE.set(key, total)
+        return total, False
+    
+    @staticmethod
+    def stream_products(bind, filters: Optional[ProductFilter] = None, q: Optional[str] = None) -> Iterator[bytes]:
+        """
+        Stream products as newline-delimited JSON (one object per line).
+        
+        Rows are read as plain tuples from a server-side cursor in
+        EXPORT_BATCH_SIZE batches and serialized directly, without ORM
+        objects or response models, so memory stays constant. A session of
+        its own is used, since the body is produced after the request's
+        session has been closed. The filters and the full-text query select
+        the same products as the listing; they are streamed ordered by ID.
+        
+        Args:
+            bind: Engine or connection of the request's session
+            filters: Same filters as the product listing
+            q: Full-text search over nombre and descripcion
+            
+        Returns:
+            Iterator of encoded NDJSON lines, one piece per batch
+            
+        Raises:
+            HTTPException: If the search is not valid (before anything is streamed)
+        """
+        conditions = ProductService.build_filters(**filters.model_dump()) if filters else []
+        columns = ProductService.STREAM_COLUMNS
+        q = q.strip() if q else None
+        if q:
+            ProductSearchService.get_terms(q)
+        
+        def serialize(value):
+            return value.isoformat() if isinstance(value, datetime) else value
+        
+        def generate() -> Iterator[bytes]:
+            db = SessionLocal(bind=bind)
+            try:
+                query = select(*[getattr(Product, column) for column in columns]).where(*conditions)
+                if q:
+                    search = ProductSearchService.search_subquery(db, q)
+                    query = query.join(search, search.c.id == Product.id)
+                
+                result = db.execute(
+                    query
+                    .order_by(Product.id)
+                    .execution_options(stream_results=True, yield_per=settings.EXPORT_BATCH_SIZE)
+                )
+                
+                for partition in result.partitions():
+                    yield "".join(
+                        json.dumps(
+                            {column: serialize(value) for column, value in zip(columns, row)},
+                            ensure_ascii=False
+                        ) + "\n"
+                        for row in partition
+                    ).encode("utf-8")
+            
+            finally:
+                db.close()
+        
+        return generate()
     
     @staticmethod
     def get_product(db: Session, product_id: int) -> Product:
@@ -87,6 +603,50 @@ class ProductService:
         
         return product
     
+    @staticmethod
+    def get_product_payload(db: Session, product_id: int) -> bytes:
+        """
+        Get a product serialized as a ProductResponse JSON body, read through the product cache.
+        
+        A loaded product is only cached if the catalog did not change while
+        it was read, so a concurrent write cannot leave a stale entry behind.
+        
+        Args:
+            db: Database session
+            product_id: Product ID
+            
+        Returns:
+            JSON body
+            
+        Raises:
+            HTTPException: If product not found
+        """
+        payload = ProductService.PRODUCT_CACHE.get(product_id)
+        if payload is not None:
+            return payload
+        
+        version = get_catalog_version(db)
+        product = ProductService.get_product(db, product_id)
+        payload = ProductResponse.model_validate(product).model_dump_json().encode("utf-8")
+        
+        if get_catalog_version(db) == version:
+            ProductService.PRODUCT_CACHE.set(product_id, payload)
+        
+        return payload
+    
+    @staticmethod
+    def invalidate_cached_products(product_id: Optional[int] = None) -> None:
+        """
+        Drop cached products after a write (call after committing it).
+        
+        Args:
+            product_id: Product to drop, or None to drop every product (e.g. after an import)
+        """
+        if product_id is None:
+            ProductService.PRODUCT_CACHE.clear()
+        else:
+            ProductService.PRODUCT_CACHE.delete(product_id)
+    
     @staticmethod
     def create_product(db: Session, product_data: ProductCreate) -> Product:
         """
@@ -99,7 +659,12 @@ class ProductService:
         Returns:
             The created Product object
         """
-        db_product = Product(**product_data.model_dump())
+        data = product_data.model_dump()
+        db_product = Product(
+            **data,
+            content_hash=product_content_hash(**data),
+            change_seq=next_change_sequence(db)
+        )
         
         db.add(db_product)
         db.commit()
@@ -134,7 +699,18 @@ class ProductService:
         for field, value in update_data.items():
             setattr(product, field, value)
         
+        # Keep the content hash in sync so delta imports detect the change
+        product.content_hash = product_content_hash(
+            product.nombre,
+            product.descripcion,
+            product.precio,
+            product.stock,
+            product.categoria
+        )
+        product.change_seq = next_change_sequence(db)
+        
         db.commit()
+        ProductService.invalidate_cached_products(product_id)
         db.refresh(product)
         
         return product
@@ -156,28 +732,26 @@ class ProductService:
         """
         product = ProductService.get_product(db, product_id)
         
+        # Leave a tombstone in the same transaction so the change feed reports the delete
+        db.add(ProductTombstone(
+            product_id=product.id,
+            nombre=product.nombre,
+            categoria=product.categoria,
+            change_seq=next_change_sequence(db)
+        ))
         db.delete(product)
         db.commit()
+        ProductService.invalidate_cached_products(product_id)
         
         return {"message": f"Producto '{product.nombre}' eliminado exitosamente"}
     
-    @staticmethod
-    def get_all_products_for_export(db: Session) -> List[Product]:
-        """
-        Get all products for export (no pagination).
-        
-        Args:
-            db: Database session
-            
-        Returns:
-            List of all products
-        """
-        return db.query(Product).all()
-    
     @staticmethod
     def bulk_create_products(db: Session, products_data: List[dict]) -> int:
         """
-        Bulk create multiple products.
+        Bulk create multiple products in a single transaction.
+        
+        Uses the dialect-aware BulkLoader (COPY on PostgreSQL, Core
+        executemany elsewhere) instead of building ORM objects.
         
         Args:
             db: Database session
@@ -186,8 +760,7 @@ class ProductService:
         Returns:
             Number of products created
         """
-        products = [Product(**data) for data in products_data]
-        db.bulk_save_objects(products)
+        created = BulkLoader.load(db, products_data)
         db.commit()
         
-        return len(products)
+        return created
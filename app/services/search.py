@@ -0,0 +1,85 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, table, column, literal, literal_column, func, and_, or_
+from fastapi import HTTPException, status
+from typing import List
+import re
+from app.models.product import Product
+from app.models.product_search import FTS_TABLE, PG_DOCUMENT
+
+
+class ProductSearchService:
+    """
+    Full-text product search over nombre and descripcion.
+    
+    - SQLite: FTS5 table (products_fts) ranked with bm25.
+    - PostgreSQL: GIN index on a tsvector expression, ranked with ts_rank.
+    - Other databases: unindexed ilike matching, without ranking.
+    
+    Every word of the query must match, as a prefix ("lap" finds "Laptop").
+    """
+    
+    TERM_PATTERN = re.compile(r"\w+", re.UNICODE)
+    
+    @staticmethod
+    def get_terms(q: str) -> List[str]:
+        """
+        Split a search query into words, dropping operators and punctuation.
+        
+        Args:
+            q: Search query
+            
+        Returns:
+            List of words
+            
+        Raises:
+            HTTPException: If the query has no searchable words
+        """
+        terms = ProductSearchService.TERM_PATTERN.findall(q)
+        if not terms:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="La búsqueda no contiene palabras válidas"
+            )
+        return terms
+    
+    @staticmethod
+    def search_subquery(db: Session, q: str):
+        """
+        Build a subquery with the id and relevance score of the matching products.
+        
+        Args:
+            db: Database session
+            q: Search query
+            
+        Returns:
+            Subquery with "id" and "score" columns; a lower score is more relevant
+        """
+        terms = ProductSearchService.get_terms(q)
+        dialect = db.get_bind().dialect.name
+        
+        if dialect == "sqlite":
+            fts = table(FTS_TABLE, column("rowid"), column("rank"))
+            match = " ".join(f'"{term}"*' for term in terms)
+            return (
+                select(fts.c.rowid.label("id"), fts.c.rank.label("score"))
+                .where(literal_column(FTS_TABLE).op("MATCH")(match))
+                .subquery("search")
+            )
+        
+        if dialect == "postgresql":
+            document = literal_column(PG_DOCUMENT)
+            query = func.to_tsquery(literal_column("'simple'"), " & ".join(f"{term}:*" for term in terms))
+            return (
+                select(Product.id.label("id"), (-func.ts_rank(document, query)).label("score"))
+                .where(document.op("@@")(query))
+                .subquery("search")
+            )
+        
+        return (
+            select(Product.id.label("id"), literal(0.0).label("score"))
+            .where(and_(*[
+                or_(Product.nombre.ilike(f"%{term}%"), Product.descripcion.ilike(f"%{term}%"))
+                for term in terms
+            ]))
+            .subquery("search")
+        )
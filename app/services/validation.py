@@ -0,0 +1,362 @@
+from typing import List, Dict, Optional
+import datetime
+import numpy as np
+import pandas as pd
+from pydantic import TypeAdapter, ValidationError
+
+
+class ImportValidationService:
+    """
+    Column-wise validation of product DataFrames.
+    
+    Applies the same rules as the ProductCreate schema to a whole DataFrame at
+    once using pandas/NumPy masks, producing the same per-row error messages
+    that Pydantic would report for each row.
+    """
+    
+    COLUMNS = ['nombre', 'descripcion', 'precio', 'stock', 'categoria']
+    
+    # Error messages as reported by Pydantic for the ProductCreate fields
+    MSG_INVALID_STRING = "Input should be a valid string"
+    MSG_INVALID_NUMBER = "Input should be a valid number"
+    MSG_INVALID_INT = "Input should be a valid integer"
+    MSG_PARSE_FLOAT = "Input should be a valid number, unable to parse string as a number"
+    MSG_PARSE_INT = "Input should be a valid integer, unable to parse string as an integer"
+    MSG_FRACTIONAL_INT = "Input should be a valid integer, got a number with a fractional part"
+    MSG_FINITE_INT = "Input should be a finite number"
+    MSG_INT_TOO_LARGE = "Unable to parse input string as an integer, exceeded maximum size"  # Floats >= 2**63
+    MSG_PRECIO_GT = "Input should be greater than 0"
+    MSG_STOCK_GE = "Input should be greater than or equal to 0"
+    
+    # Pydantic rejects floats this large as integers. Integer strings of any size are valid for the
+    # schema but cannot be stored in the stock column, so they get the same message.
+    MAX_INT = 2 ** 63
+    
+    # Strings are parsed by the same validators ProductCreate uses ("1_000" and " 7 " are
+    # integers, "1e3" is not)
+    FLOAT_ADAPTER = TypeAdapter(float)
+    INT_ADAPTER = TypeAdapter(int)
+    
+    # Dates, times and durations (e.g. date-formatted spreadsheet cells) are not numbers for the
+    # schema, although pandas converts them to nanoseconds
+    TEMPORAL_TYPES = (datetime.date, datetime.time, datetime.timedelta, np.datetime64, np.timedelta64)
+    
+    @staticmethod
+    def _min_length_message(min_length: int) -> str:
+        unit = "character" if min_length == 1 else "characters"
+        return f"String should have at least {min_length} {unit}"
+    
+    @staticmethod
+    def _max_length_message(max_length: int) -> str:
+        unit = "character" if max_length == 1 else "characters"
+        return f"String should have at most {max_length} {unit}"
+    
+    @staticmethod
+    def _select(conditions: List[tuple], size: int) -> np.ndarray:
+        """
+        Build an object array with the first matching message for each row.
+        
+        Args:
+            conditions: List of (boolean mask, message) in priority order
+            size: Number of rows
+        
+        Returns:
+            Object array with a message or None for each row
+        """
+        result = np.full(size, None, dtype=object)
+        pending = np.ones(size, dtype=bool)
+        
+        for mask, message in conditions:
+            hit = pending & np.asarray(mask, dtype=bool)
+            result[hit] = message
+            pending &= ~hit
+        
+        return result
+    
+    @staticmethod
+    def _string_mask(series: pd.Series) -> pd.Series:
+        """Return a mask of the values that are Python strings."""
+        if series.dtype == object:
+            return series.map(lambda value: isinstance(value, str)).astype(bool)
+        if pd.api.types.is_string_dtype(series.dtype):
+            return series.notna()
+        return pd.Series(False, index=series.index)
+    
+    @staticmethod
+    def _is_temporal_dtype(dtype) -> bool:
+        """Check whether a column dtype holds dates or durations."""
+        return (
+            pd.api.types.is_datetime64_any_dtype(dtype)
+            or pd.api.types.is_timedelta64_dtype(dtype)
+            or isinstance(dtype, pd.PeriodDtype)
+        )
+    
+    @staticmethod
+    def _temporal_mask(series: pd.Series) -> pd.Series:
+        """Return a mask of the values that are dates, times or durations."""
+        if ImportValidationService._is_temporal_dtype(series.dtype):
+            return series.notna()
+        if series.dtype == object:
+            return series.map(
+                lambda value: isinstance(value, ImportValidationService.TEMPORAL_TYPES) and not pd.isna(value)
+            ).astype(bool)
+        return pd.Series(False, index=series.index)
+    
+    @staticmethod
+    def _to_numeric(
+        series: pd.Series,
+        is_str: pd.Series,
+        is_temporal: pd.Series,
+        adapter: TypeAdapter
+    ) -> tuple[pd.Series, pd.Series]:
+        """
+        Coerce a column to float, parsing strings like Pydantic does.
+        
+        Non-string values are converted by pandas, except dates, times and
+        durations, which are left unparsed. Each distinct string is parsed
+        once with the adapter, so strings are accepted or rejected exactly as
+        the schema would (including "nan" and "inf" for floats).
+        
+        Args:
+            series: Column values
+            is_str: Mask of the values that are strings
+            is_temporal: Mask of the values that are dates, times or durations
+            adapter: Pydantic adapter of the field type
+        
+        Returns:
+            Tuple of (values as float, NaN where unparseable; parsed Python
+            numbers of the strings, None where unparseable)
+        """
+        if pd.api.types.is_bool_dtype(series.dtype) or pd.api.types.is_numeric_dtype(series.dtype):
+            return series.astype(float), pd.Series(dtype=object)
+        
+        if ImportValidationService._is_temporal_dtype(series.dtype):
+            return pd.Series(np.nan, index=series.index), pd.Series(dtype=object)
+        
+        values = pd.to_numeric(series.where(~is_str & ~is_temporal), errors='coerce').astype(float)
+        strings = series[is_str]
+        if strings.empty:
+            return values, pd.Series(dtype=object)
+        
+        texts = strings.tolist()
+        parsed = {}
+        for text in dict.fromkeys(texts):
+            try:
+                parsed[text] = adapter.validate_python(text)
+            except ValidationError:
+                parsed[text] = None
+        
+        numbers = pd.Series([parsed[text] for text in texts], index=strings.index, dtype=object)
+        values[is_str] = [np.nan if number is None else float(number) for number in numbers]
+        return values, numbers
+    
+    @staticmethod
+    def validate_string_column(
+        series: pd.Series,
+        min_length: int,
+        max_length: Optional[int] = None,
+        nullable: bool = False
+    ) -> np.ndarray:
+        """
+        Validate a text column.
+        
+        Args:
+            series: Column values
+            min_length: Minimum string length
+            max_length: Maximum string length
+            nullable: Whether missing values are allowed
+        
+        Returns:
+            Object array with the error message (or None) for each row
+        """
+        isna = series.isna()
+        is_str = ImportValidationService._string_mask(series)
+        if is_str.any():
+            lengths = series.where(is_str).astype(object).str.len()
+        else:
+            lengths = pd.Series(np.nan, index=series.index)
+        
+        if nullable:
+            conditions = [(isna, None)]
+        else:
+            # Missing values are sent to the schema as empty strings
+            lengths = lengths.where(~isna, 0)
+            conditions = []
+        
+        conditions.append((~isna & ~is_str, ImportValidationService.MSG_INVALID_STRING))
+        if min_length > 0:
+            conditions.append((
+                lengths < min_length,
+                ImportValidationService._min_length_message(min_length)
+            ))
+        if max_length is not None:
+            conditions.append((
+                lengths > max_length,
+                ImportValidationService._max_length_message(max_length)
+            ))
+        
+        return ImportValidationService._select(conditions, len(series))
+    
+    @staticmethod
+    def validate_precio_column(series: pd.Series) -> tuple[np.ndarray, pd.Series]:
+        """
+        Validate the price column.
+        
+        Args:
+            series: Column values
+        
+        Returns:
+            Tuple of (error messages, values coerced to float)
+        """
+        isna = series.isna()
+        is_str = ImportValidationService._string_mask(series)
+        is_temporal = ImportValidationService._temporal_mask(series)
+        values, numbers = ImportValidationService._to_numeric(
+            series, is_str, is_temporal, ImportValidationService.FLOAT_ADAPTER
+        )
+        unparsed_str = pd.Series(False, index=series.index)
+        if not numbers.empty:
+            unparsed_str[numbers.index] = [number is None for number in numbers]
+        
+        conditions = [
+            (isna, ImportValidationService.MSG_PARSE_FLOAT),
+            (unparsed_str, ImportValidationService.MSG_PARSE_FLOAT),
+            (~is_str & values.isna(), ImportValidationService.MSG_INVALID_NUMBER),  # Dates included
+            (~(values > 0), ImportValidationService.MSG_PRECIO_GT),  # NaN parsed from "nan" included
+        ]
+        
+        return ImportValidationService._select(conditions, len(series)), values
+    
+    @staticmethod
+    def validate_stock_column(series: pd.Series) -> tuple[np.ndarray, pd.Series]:
+        """
+        Validate the stock column, including integer coercion.
+        
+        Args:
+            series: Column values
+        
+        Returns:
+            Tuple of (error messages, values; strings keep their exact
+            parsed integer)
+        """
+        isna = series.isna()
+        is_str = ImportValidationService._string_mask(series)
+        is_temporal = ImportValidationService._temporal_mask(series)
+        values, numbers = ImportValidationService._to_numeric(
+            series, is_str, is_temporal, ImportValidationService.INT_ADAPTER
+        )
+        unparsed_str = pd.Series(False, index=series.index)
+        if not numbers.empty:
+            unparsed_str[numbers.index] = [number is None for number in numbers]
+        too_large = values.abs() >= ImportValidationService.MAX_INT
+        if not numbers.empty:
+            # Compared as Python ints: floats round integers near the limit
+            too_large[numbers.index] = [
+                number is not None and abs(number) >= ImportValidationService.MAX_INT for number in numbers
+            ]
+        unparsed = values.isna()
+        infinite = np.isinf(values)
+        fractional = ~unparsed & ~infinite & (values != np.floor(values))
+        
+        conditions = [
+            (isna, ImportValidationService.MSG_PARSE_INT),
+            (is_temporal, ImportValidationService.MSG_INVALID_INT),
+            (unparsed_str, ImportValidationService.MSG_PARSE_INT),
+            (unparsed, ImportValidationService.MSG_PARSE_INT),
+            (infinite, ImportValidationService.MSG_FINITE_INT),
+            (fractional, ImportValidationService.MSG_FRACTIONAL_INT),
+            (too_large, ImportValidationService.MSG_INT_TOO_LARGE),
+            (values < 0, ImportValidationService.MSG_STOCK_GE),
+        ]
+        
+        exact = values.astype(object)
+        if not numbers.empty:
+            exact[numbers.index] = numbers
+        
+        return ImportValidationService._select(conditions, len(series)), exact
+    
+    @staticmethod
+    def format_value(value) -> Optional[str]:
+        """Format an original cell value for error reporting."""
+        if value is None or (not isinstance(value, str) and pd.isna(value)):
+            return None
+        return str(value)
+    
+    @staticmethod
+    def validate_dataframe(
+        df: pd.DataFrame,
+        details: bool = False
+    ) -> tuple[pd.DataFrame, List[Dict]]:
+        """
+        Validate all rows of a DataFrame at once.
+        
+        Row numbers are derived from the DataFrame index (index + 2, since
+        spreadsheet rows start at 1 and the first row is the header).
+        
+        Args:
+            df: Pandas DataFrame with the required columns
+            details: Add a "details" list (field, value, message) to each error
+        
+        Returns:
+            Tuple of (DataFrame with the valid, normalized rows, list of errors)
+        """
+        size = len(df)
+        
+        precio_errors, precio = ImportValidationService.validate_precio_column(df['precio'])
+        stock_errors, stock = ImportValidationService.validate_stock_column(df['stock'])
+        
+        # Same order as the fields are declared in ProductCreate
+        field_errors = [
+            ('nombre', ImportValidationService.validate_string_column(df['nombre'], 3, 255)),
+            ('descripcion', ImportValidationService.validate_string_column(
+                df['descripcion'], 0, nullable=True
+            )),
+            ('precio', precio_errors),
+            ('stock', stock_errors),
+            ('categoria', ImportValidationService.validate_string_column(df['categoria'], 1, 100)),
+        ]
+        
+        invalid = np.zeros(size, dtype=bool)
+        for _, messages in field_errors:
+            invalid |= messages != None  # noqa: E711 - element-wise comparison
+        
+        errors = []
+        row_numbers = np.asarray(df.index) + 2
+        positions = np.flatnonzero(invalid)
+        values = {}
+        if details and len(positions):
+            values = {field: df[field].to_numpy() for field, _ in field_errors}
+        
+        for position in positions:
+            row_number = int(row_numbers[position])
+            failed_fields = [
+                (field, field_messages[position])
+                for field, field_messages in field_errors
+                if field_messages[position] is not None
+            ]
+            error = {
+                "row": row_number,
+                "error": f"Fila {row_number}: {'; '.join(f'{field}: {message}' for field, message in failed_fields)}"
+            }
+            if details:
+                error["details"] = [
+                    {
+                        "field": field,
+                        "value": ImportValidationService.format_value(values[field][position]),
+                        "message": message
+                    }
+                    for field, message in failed_fields
+                ]
+            errors.append(error)
+        
+        valid = ~invalid
+        descripcion = df['descripcion'][valid]
+        valid_df = pd.DataFrame({
+            'nombre': df['nombre'][valid].astype(object),
+            'descripcion': descripcion.astype(object).where(descripcion.notna(), None),
+            'precio': precio[valid],
+            'stock': stock[valid].astype('int64'),
+            'categoria': df['categoria'][valid].astype(object),
+        }, index=df.index[valid])
+        
+        return valid_df, errors
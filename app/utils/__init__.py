@@ -8,6 +8,22 @@ from app.utils.dependencies import (
     get_current_user,
     get_current_active_user
 )
+from app.utils.background import (
+    get_executor,
+    submit_job,
+    get_process_pool,
+    shutdown_executor
+)
+from app.utils.catalog_version import get_catalog_version
+from app.utils.single_flight import (
+    SingleFlight,
+    get_single_flight_stats
+)
+from app.utils.shared_stream import SharedStream
+from app.utils.cache import (
+    LRUCache,
+    get_cache_stats
+)
 
 __all__ = [
     "verify_password",
@@ -15,5 +31,15 @@ __all__ = [
     "create_access_token",
     "decode_access_token",
     "get_current_user",
-    "get_current_active_user"
+    "get_current_active_user",
+    "get_executor",
+    "submit_job",
+    "get_process_pool",
+    "shutdown_executor",
+    "get_catalog_version",
+    "SingleFlight",
+    "get_single_flight_stats",
+    "SharedStream",
+    "LRUCache",
+    "get_cache_stats"
 ]
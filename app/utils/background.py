@@ -0,0 +1,223 @@
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future
+from typing import Callable, Optional
+import multiprocessing
+import threading
+import logging
+import os
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Local worker pool shared by background jobs (no external broker needed)
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+# Pool of its own for export jobs, so a long export never holds up imports
+_export_executor: Optional[ThreadPoolExecutor] = None
+
+# Stop signals of the periodic tasks
+_periodic_stops: list[threading.Event] = []
+
+# Process pool for CPU-bound work (e.g. validation of large imports)
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Get the background worker pool, creating it on first use.
+
+    Returns:
+        ThreadPoolExecutor sized from BACKGROUND_WORKERS
+    """
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, settings.BACKGROUND_WORKERS),
+                thread_name_prefix="background-job"
+            )
+        return _executor
+
+
+def get_export_executor() -> ThreadPoolExecutor:
+    """
+    Get the export job pool, creating it on first use.
+
+    Returns:
+        ThreadPoolExecutor sized from EXPORT_WORKERS
+    """
+    global _export_executor
+
+    with _executor_lock:
+        if _export_executor is None:
+            _export_executor = ThreadPoolExecutor(
+                max_workers=max(1, settings.EXPORT_WORKERS),
+                thread_name_prefix="export-job"
+            )
+        return _export_executor
+
+
+def _submit(executor: ThreadPoolExecutor, func: Callable, *args, **kwargs) -> Future:
+    """Queue a function to an executor, logging its unhandled exceptions."""
+    future = executor.submit(func, *args, **kwargs)
+
+    def _log_exception(done: Future) -> None:
+        exception = done.exception()
+        if exception is not None:
+            logger.error("Background job failed", exc_info=exception)
+
+    future.add_done_callback(_log_exception)
+    return future
+
+
+def submit_job(func: Callable, *args, **kwargs) -> Future:
+    """
+    Queue a function to run in the background worker pool.
+
+    Unhandled exceptions are logged, since nobody waits on the future.
+
+    Args:
+        func: Function to run
+        *args: Positional arguments for the function
+        **kwargs: Keyword arguments for the function
+
+    Returns:
+        Future for the queued job
+    """
+    return _submit(get_executor(), func, *args, **kwargs)
+
+
+def submit_export_job(func: Callable, *args, **kwargs) -> Future:
+    """
+    Queue a function to run in the export job pool.
+
+    Exports run apart from the other background jobs (imports), so a large
+    export only waits for other exports.
+
+    Args:
+        func: Function to run
+        *args: Positional arguments for the function
+        **kwargs: Keyword arguments for the function
+
+    Returns:
+        Future for the queued job
+    """
+    return _submit(get_export_executor(), func, *args, **kwargs)
+
+
+def run_periodically(func: Callable, interval_seconds: float, *args) -> None:
+    """
+    Run a function every interval_seconds in a daemon thread until shutdown.
+
+    Exceptions are logged and the next run happens on schedule.
+
+    Args:
+        func: Function to run
+        interval_seconds: Seconds between runs (0 = never run)
+        *args: Positional arguments for the function
+    """
+    if interval_seconds <= 0:
+        return
+
+    stop = threading.Event()
+
+    def _loop() -> None:
+        while not stop.wait(interval_seconds):
+            try:
+                func(*args)
+            except Exception:
+                logger.exception("Periodic task %s failed", getattr(func, "__name__", func))
+
+    with _executor_lock:
+        _periodic_stops.append(stop)
+    threading.Thread(target=_loop, name="periodic-task", daemon=True).start()
+
+
+def is_process_running(pid: int) -> bool:
+    """
+    Check whether a process of this host is running.
+
+    Args:
+        pid: Process ID
+
+    Returns:
+        True if the process exists (this process included)
+    """
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass  # Running, owned by another user
+    return True
+
+
+def get_process_pool_size() -> int:
+    """
+    Get the number of processes used for CPU-bound work.
+
+    Returns:
+        VALIDATION_WORKERS, or one process per CPU core when it is 0
+    """
+    if settings.VALIDATION_WORKERS > 0:
+        return settings.VALIDATION_WORKERS
+    return os.cpu_count() or 1
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Get the process pool, creating it on first use.
+
+    Workers are spawned (not forked) so they do not inherit database
+    connections or locks held by the parent's threads.
+
+    Returns:
+        ProcessPoolExecutor sized from VALIDATION_WORKERS
+    """
+    global _process_pool
+
+    with _executor_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=get_process_pool_size(),
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _process_pool
+
+
+def reset_process_pool() -> None:
+    """Discard the process pool (e.g. after a worker died) so it is recreated."""
+    global _process_pool
+
+    with _executor_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False, cancel_futures=True)
+            _process_pool = None
+
+
+def shutdown_executor(wait: bool = True) -> None:
+    """
+    Stop the periodic tasks, the background and export worker pools and
+    the process pool.
+
+    Args:
+        wait: Whether to wait for queued jobs to finish
+    """
+    global _executor, _export_executor, _process_pool
+
+    with _executor_lock:
+        for stop in _periodic_stops:
+            stop.set()
+        _periodic_stops.clear()
+        if _executor is not None:
+            _executor.shutdown(wait=wait)
+            _executor = None
+        if _export_executor is not None:
+            _export_executor.shutdown(wait=wait)
+            _export_executor = None
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=wait)
+            _process_pool = None
@@ -0,0 +1,108 @@
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+import threading
+import time
+
+# Every cache created, by name, for the metrics endpoint
+_caches: Dict[str, "LRUCache"] = {}
+_registry_lock = threading.Lock()
+
+
+class LRUCache:
+    """
+    Thread-safe in-process LRU cache with an optional time to live.
+
+    Keys that embed the catalog version never return stale data: entries of
+    older versions are simply never read again and age out of the LRU.
+    """
+
+    def __init__(self, name: str, max_entries: int, ttl_seconds: Optional[float] = None):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+        with _registry_lock:
+            _caches[name] = self
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Get a value and mark it as recently used.
+
+        Args:
+            key: Cache key
+            default: Value returned on a miss
+
+        Returns:
+            The cached value, or default if missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (self.ttl_seconds is None or entry[1] > time.monotonic()):
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[0]
+
+            if entry is not None:
+                del self._entries[key]
+            self._misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Store a value, evicting the least recently used entries beyond max_entries.
+
+        Args:
+            key: Cache key
+            value: Value to store
+        """
+        if self.max_entries <= 0:
+            return
+
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds is not None else 0.0
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        """
+        Remove an entry, if present.
+
+        Args:
+            key: Cache key
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the cache counters.
+
+        Returns:
+            Dictionary with hits, misses and current entries
+        """
+        with self._lock:
+            return {"hits": self._hits, "misses": self._misses, "entries": len(self._entries)}
+
+
+def get_cache_stats() -> Dict[str, Dict[str, int]]:
+    """
+    Get the counters of every in-process cache.
+
+    Returns:
+        Dictionary of cache name -> counters
+    """
+    with _registry_lock:
+        caches = list(_caches.values())
+
+    return {cache.name: cache.stats() for cache in caches}
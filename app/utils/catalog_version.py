@@ -0,0 +1,26 @@
+from sqlalchemy.engine import Engine
+from app.models.change_sequence import current_change_sequence
+
+
+def get_catalog_version(db) -> str:
+    """
+    Get the current catalog version.
+
+    The version is the last committed change sequence value, which every
+    product write takes (see app.models.change_sequence). It only changes
+    when the catalog does, and every worker and restart sees the same
+    value, so ETags and cached listings, totals and exports stay valid
+    until the next write wherever it was made. Reading it is a primary key
+    lookup on a one-row table.
+
+    Args:
+        db: Database session, connection or engine
+
+    Returns:
+        Version string
+    """
+    if isinstance(db, Engine):
+        with db.connect() as connection:
+            return get_catalog_version(connection)
+
+    return str(current_change_sequence(db))
@@ -0,0 +1,100 @@
+from typing import Iterator, Optional
+import zlib
+
+try:  # Optional dependency: zstd compression
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Supported content encodings, in order of preference -> file suffix
+ENCODINGS = {
+    "zstd": ".zst",
+    "gzip": ".gz",
+}
+MEDIA_TYPES = {
+    "zstd": "application/zstd",
+    "gzip": "application/gzip",
+}
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def is_available(encoding: str) -> bool:
+    """
+    Check whether an encoding can be produced in this environment.
+
+    Args:
+        encoding: Content encoding name
+
+    Returns:
+        True if the encoding is supported (zstd needs the zstandard package)
+    """
+    if encoding == "zstd":
+        return zstandard is not None
+    return encoding in ENCODINGS
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Pick the best supported encoding from an Accept-Encoding header.
+
+    Args:
+        accept_encoding: Accept-Encoding header value
+
+    Returns:
+        Encoding name, or None to send the content uncompressed
+    """
+    if not accept_encoding:
+        return None
+
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip().lower()] = weight
+
+    candidates = [
+        (weights.get(encoding, weights.get("*", 0.0)), -position, encoding)
+        for position, encoding in enumerate(ENCODINGS)
+        if is_available(encoding)
+    ]
+    weight, _, encoding = max(candidates, default=(0.0, 0, None))
+
+    return encoding if weight > 0 else None
+
+
+def compress_stream(chunks: Iterator[bytes], encoding: Optional[str]) -> Iterator[bytes]:
+    """
+    Compress a byte stream incrementally.
+
+    Each chunk is fed to a streaming compressor as it arrives, so memory
+    use stays at the compressor's window instead of the whole content.
+
+    Args:
+        chunks: Uncompressed content
+        encoding: "gzip", "zstd" or None (no compression)
+
+    Yields:
+        Compressed content
+    """
+    if encoding is None:
+        yield from chunks
+        return
+
+    if encoding == "zstd":
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31 = gzip container
+
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+
+    yield compressor.flush()
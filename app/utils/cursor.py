@@ -0,0 +1,42 @@
+from typing import Dict
+import base64
+import json
+
+
+def encode_cursor(payload: Dict) -> str:
+    """
+    Encode a pagination position as an opaque, URL-safe cursor.
+
+    Args:
+        payload: JSON-serializable position (e.g. last sort value and id)
+
+    Returns:
+        Cursor string
+    """
+    data = json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+    return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict:
+    """
+    Decode a cursor built by encode_cursor().
+
+    Args:
+        cursor: Cursor string
+
+    Returns:
+        The encoded position
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, TypeError) as error:
+        raise ValueError("Malformed cursor") from error
+
+    if not isinstance(payload, dict):
+        raise ValueError("Malformed cursor")
+
+    return payload
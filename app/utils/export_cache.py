@@ -0,0 +1,147 @@
+from collections import OrderedDict
+from typing import Optional
+import logging
+import os
+import re
+import shutil
+import threading
+from app.config import settings
+from app.utils.background import is_process_running
+from app.utils.catalog_version import get_catalog_version
+
+logger = logging.getLogger(__name__)
+
+# Rendered exports on local disk, least recently used first: key -> (path, size, version).
+# The folder is shared by every worker process; each one only tracks (and deletes) its own
+# files, whose names carry the owner's process ID.
+_entries: "OrderedDict[str, tuple[str, int, str]]" = OrderedDict()
+_total_bytes = 0
+_cache_lock = threading.Lock()
+_initialized = False
+
+# "<key>_<pid>.<ext>" for cached exports, "export_<pid>_<random>.<ext>" while streaming (SharedStream)
+_OWNER_PATTERN = re.compile(r"^[^_]+_(\d+)[_.]")
+
+
+def get_cache_folder() -> str:
+    """
+    Get the export cache folder, removing orphaned files on first use.
+
+    Other workers may be using the folder, so only files nobody can serve
+    anymore are removed: files of processes that are no longer running.
+
+    Returns:
+        Path of the cache folder under UPLOAD_FOLDER
+    """
+    global _initialized
+
+    folder = os.path.join(settings.UPLOAD_FOLDER, "export_cache")
+    with _cache_lock:
+        os.makedirs(folder, exist_ok=True)
+        if not _initialized:
+            _remove_orphans(folder)
+            _initialized = True
+
+    return folder
+
+
+def _remove_orphans(folder: str) -> None:
+    """Delete cached exports left by stopped processes (the cache lock must be held)."""
+    owned = {entry[0] for entry in _entries.values()}
+
+    for entry in os.scandir(folder):
+        if entry.path in owned or not entry.is_file():
+            continue
+        match = _OWNER_PATTERN.match(entry.name)
+        if match and is_process_running(int(match.group(1))):
+            continue
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass  # Removed by another process meanwhile
+
+
+def get_cached_export(key: str) -> Optional[str]:
+    """
+    Get the file of a cached export and mark it as recently used.
+
+    Args:
+        key: Export cache key
+
+    Returns:
+        Path of the cached file, or None on a miss
+    """
+    with _cache_lock:
+        entry = _entries.get(key)
+        if entry is None:
+            return None
+
+        if not os.path.exists(entry[0]):
+            _discard(key)
+            return None
+
+        _entries.move_to_end(key)
+        return entry[0]
+
+
+def store_export(key: str, path: str, version: str, bind) -> Optional[str]:
+    """
+    Move a rendered export file into the cache.
+
+    The file is only cached if the catalog did not change while it was
+    rendered, and if it fits in EXPORT_CACHE_MAX_BYTES. Least recently used
+    exports are evicted to make room.
+
+    Args:
+        key: Export cache key
+        path: Rendered file (moved into the cache on success)
+        version: Catalog version the export was rendered from
+        bind: Engine or connection to read the current catalog version from
+
+    Returns:
+        Path of the cached file, or None if it was not cached
+    """
+    global _total_bytes
+
+    size = os.path.getsize(path)
+    if size > settings.EXPORT_CACHE_MAX_BYTES or version != get_catalog_version(bind):
+        return None
+
+    # Other workers cache the same keys under their own process ID
+    cached_path = os.path.join(get_cache_folder(), f"{key}_{os.getpid()}{os.path.splitext(path)[1]}")
+
+    with _cache_lock:
+        # Exports of older versions can never be served again
+        for stale in [stale for stale, entry in _entries.items() if entry[2] != version]:
+            _discard(stale)
+
+        if key in _entries:
+            _discard(key)
+
+        while _entries and _total_bytes + size > settings.EXPORT_CACHE_MAX_BYTES:
+            _discard(next(iter(_entries)))
+
+        shutil.move(path, cached_path)  # Rendered files may live on another filesystem (tmp)
+        _entries[key] = (cached_path, size, version)
+        _total_bytes += size
+
+    return cached_path
+
+
+def clear_export_cache() -> None:
+    """Remove every cached export."""
+    with _cache_lock:
+        for key in list(_entries):
+            _discard(key)
+
+
+def _discard(key: str) -> None:
+    """Drop a cache entry and its file (the cache lock must be held)."""
+    global _total_bytes
+
+    path, size, _ = _entries.pop(key)
+    _total_bytes -= size
+    try:
+        os.remove(path)
+    except OSError:
+        logger.warning("Could not remove cached export %s", path)
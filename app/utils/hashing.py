@@ -0,0 +1,58 @@
+from typing import List, Optional
+import hashlib
+import pandas as pd
+
+# Separator and NULL marker that cannot appear in normal product text
+FIELD_SEPARATOR = "\x1f"
+NULL_MARKER = "\x00"
+
+
+def product_content_hash(
+    nombre: str,
+    descripcion: Optional[str],
+    precio: float,
+    stock: int,
+    categoria: str
+) -> str:
+    """
+    Compute a stable hash of the product's content fields.
+
+    Used by delta imports to detect unchanged rows without comparing
+    every column against the database.
+
+    Args:
+        nombre: Product name
+        descripcion: Product description (may be None)
+        precio: Product price
+        stock: Product stock
+        categoria: Product category
+
+    Returns:
+        SHA-1 hex digest of the product content
+    """
+    payload = FIELD_SEPARATOR.join([
+        str(nombre),
+        NULL_MARKER if descripcion is None else str(descripcion),
+        repr(float(precio)),
+        str(int(stock)),
+        str(categoria)
+    ])
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def dataframe_content_hashes(df: pd.DataFrame) -> List[str]:
+    """
+    Compute the content hash of every row of a normalized product DataFrame.
+
+    Args:
+        df: DataFrame with nombre, descripcion, precio, stock and categoria
+
+    Returns:
+        List of SHA-1 hex digests, in row order
+    """
+    return [
+        product_content_hash(nombre, descripcion, precio, stock, categoria)
+        for nombre, descripcion, precio, stock, categoria in zip(
+            df['nombre'], df['descripcion'], df['precio'], df['stock'], df['categoria']
+        )
+    ]
@@ -0,0 +1,189 @@
+from typing import AsyncIterator, Callable, Iterator, Optional
+import asyncio
+import logging
+import os
+import tempfile
+import threading
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+
+class SharedStream:
+    """
+    A stream produced once and read by any number of requests while it is written.
+
+    A dedicated thread writes the chunks to a spool file and every reader
+    follows that file from the start at its own pace, waiting for more data
+    on its event loop rather than in a worker thread. Readers therefore get
+    their first bytes right away and a slow or disconnected reader does not
+    hold back the others. If every reader disconnects, production stops.
+
+    Once production has ended and the last reader is done, the file is
+    handed to on_close (e.g. to keep it in a cache) or removed.
+    """
+
+    READ_SIZE = 65536
+
+    def __init__(
+        self,
+        folder: str,
+        suffix: str = "",
+        on_close: Optional[Callable[["SharedStream", bool], bool]] = None
+    ):
+        """
+        Create the spool file. The creator is the first reader of the stream.
+
+        Args:
+            folder: Folder of the spool file
+            suffix: File extension of the spool file
+            on_close: Called with (stream, whether it is complete) when the
+                stream can no longer be read; returns True if it took the file
+        """
+        fd, self.path = tempfile.mkstemp(prefix=f"export_{os.getpid()}_", suffix=suffix, dir=folder)
+        self._file = os.fdopen(fd, "wb")
+        self._on_close = on_close
+        self._lock = threading.Lock()
+        self._size = 0
+        self._done = False
+        self._error: Optional[BaseException] = None
+        self._readers = 1
+        self._closed = False
+        # Futures of readers waiting for data, resolved on their own event loop
+        self._waiters: list[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    def start(self, chunks: Iterator[bytes]) -> None:
+        """
+        Start producing the stream in a dedicated thread.
+
+        Args:
+            chunks: Stream content
+        """
+        threading.Thread(target=self._produce, args=(chunks,), name="shared-stream", daemon=True).start()
+
+    def acquire(self) -> bool:
+        """
+        Register a new reader.
+
+        Returns:
+            False if the stream can no longer be read
+        """
+        with self._lock:
+            if self._closed or (self._readers == 0 and not self._done):
+                return False
+            self._readers += 1
+            return True
+
+    async def read(self) -> AsyncIterator[bytes]:
+        """
+        Read the whole stream from the start, waiting for the chunks not yet
+        produced. The reader is released when the iteration ends.
+
+        Yields:
+            Stream content
+
+        Raises:
+            RuntimeError: If production failed before the end of the stream
+        """
+        try:
+            position = 0
+            with open(self.path, "rb") as reader:
+                while True:
+                    future = None
+                    with self._lock:
+                        size, done, error = self._size, self._done, self._error
+                        if position >= size and not done:
+                            future = asyncio.get_running_loop().create_future()
+                            self._waiters.append((asyncio.get_running_loop(), future))
+
+                    if future is not None:
+                        await future
+                    elif position < size:
+                        data = await run_in_threadpool(reader.read, min(size - position, self.READ_SIZE))
+                        position += len(data)
+                        yield data
+                    elif error is not None:
+                        raise RuntimeError("The shared stream failed") from error
+                    else:
+                        return
+        finally:
+            self.release()
+
+    def release(self) -> None:
+        """Unregister a reader, closing the stream after the last one."""
+        with self._lock:
+            self._readers -= 1
+            close = self._readers == 0 and self._done and not self._closed
+            if close:
+                self._closed = True
+
+        if close:
+            self._close()
+
+    def _produce(self, chunks: Iterator[bytes]) -> None:
+        """Write the chunks to the spool file and wake the readers (producer thread)."""
+        error = None
+        try:
+            for chunk in chunks:
+                if not chunk:
+                    continue
+                self._file.write(chunk)
+                self._file.flush()
+                with self._lock:
+                    self._size += len(chunk)
+                    abandoned = self._readers == 0
+                    waiters, self._waiters = self._waiters, []
+                self._wake(waiters)
+                if abandoned:
+                    error = RuntimeError("Every reader disconnected")
+                    break
+
+        except Exception as exc:
+            logger.exception("Shared stream %s failed", self.path)
+            error = exc
+
+        finally:
+            if hasattr(chunks, "close"):
+                chunks.close()
+            self._file.close()
+            with self._lock:
+                self._done = True
+                self._error = error
+                waiters, self._waiters = self._waiters, []
+                close = self._readers == 0 and not self._closed
+                if close:
+                    self._closed = True
+            self._wake(waiters)
+
+        if close:
+            self._close()
+
+    def _close(self) -> None:
+        """Hand the spool file to on_close, or remove it (runs once)."""
+        kept = False
+        if self._on_close is not None:
+            try:
+                kept = self._on_close(self, self._error is None)
+            except Exception:
+                logger.exception("Could not close shared stream %s", self.path)
+
+        if not kept:
+            try:
+                os.remove(self.path)
+            except OSError:
+                logger.warning("Could not remove shared stream %s", self.path)
+
+    @staticmethod
+    def _wake(waiters: list[tuple[asyncio.AbstractEventLoop, asyncio.Future]]) -> None:
+        """Resolve the futures of waiting readers on their event loops."""
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_resolve, future)
+            except RuntimeError:
+                pass  # The reader's event loop is closed
+
+
+def _resolve(future: asyncio.Future) -> None:
+    """Wake a waiting reader (runs on the reader's event loop)."""
+    if not future.done():
+        future.set_result(None)
@@ -0,0 +1,206 @@
+from typing import Any, Callable, Dict, Hashable, Optional
+import threading
+
+
+class _Call:
+    """A computation in flight, shared by every caller with the same key."""
+
+    def __init__(self, shared: Any = None):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        # Value readers can join while the computation runs (see SingleFlight.share)
+        self.shared = shared
+
+    def wait(self, timeout: Optional[float] = None) -> Any:
+        """
+        Block until the computation finishes and return (or raise) its outcome.
+
+        Raises:
+            TimeoutError: If it does not finish within timeout seconds
+        """
+        if not self.done.wait(timeout):
+            raise TimeoutError
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SingleFlight:
+    """
+    Coalesce identical concurrent computations.
+
+    The first caller for a key (the leader) runs the computation; callers
+    arriving with the same key while it is in flight wait for it and get the
+    same result, or the same exception. Nothing is kept once the computation
+    finishes, so this is not a cache: keys must include whatever makes a
+    result stale (e.g. the catalog version).
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self._executions = 0
+        self._coalesced = 0
+        self._timeouts = 0
+
+    def begin(self, key: Hashable) -> tuple[_Call, bool]:
+        """
+        Join the computation in flight for a key, or start one.
+
+        A leader must call finish() with the same call when done. Callers
+        that are not the leader may wait() on the call.
+
+        Args:
+            key: Normalized parameters of the computation
+
+        Returns:
+            Tuple of (call, whether the caller is the leader)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                return call, False
+
+            call = _Call()
+            self._calls[key] = call
+            self._executions += 1
+            return call, True
+
+    def finish(self, key: Hashable, call: _Call, result: Any = None, error: Optional[BaseException] = None) -> None:
+        """
+        Publish the outcome of a computation and release its waiters.
+
+        Args:
+            key: Key passed to begin()
+            call: Call returned by begin()
+            result: Result of the computation
+            error: Exception raised by the computation, if any
+        """
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+
+        call.result = result
+        call.error = error
+        call.done.set()
+
+    def do(
+        self,
+        key: Hashable,
+        func: Callable,
+        *args,
+        timeout: Optional[float] = None,
+        **kwargs
+    ) -> tuple[Any, bool]:
+        """
+        Run a function once for all concurrent callers with the same key.
+
+        Callers that are not the leader block their thread while they wait,
+        so the wait is bounded: after timeout seconds they run the function
+        themselves.
+
+        Args:
+            key: Normalized parameters of the computation
+            func: Function to run
+            *args: Positional arguments for the function
+            timeout: Seconds to wait for a computation in flight (None = no limit)
+            **kwargs: Keyword arguments for the function
+
+        Returns:
+            Tuple of (result, whether it was shared from another caller)
+        """
+        call, leader = self.begin(key)
+        if not leader:
+            with self._lock:
+                self._coalesced += 1
+            try:
+                return call.wait(timeout), True
+            except TimeoutError:
+                with self._lock:
+                    self._timeouts += 1
+                return func(*args, **kwargs), False
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as error:
+            self.finish(key, call, error=error)
+            raise
+
+        self.finish(key, call, result)
+        return result, False
+
+    def share(self, key: Hashable, create: Callable[[], Any]) -> tuple[Any, bool]:
+        """
+        Join the shared value of an operation in flight for a key, or start one.
+
+        For operations whose progress, not only their outcome, can be shared
+        (e.g. a stream that requests read while it is produced). The value
+        must have an acquire() method that registers a new user, or returns
+        False once the value can no longer be joined. The leader must call
+        unshare() when that happens.
+
+        Args:
+            key: Normalized parameters of the operation
+            create: Builds the value of a new operation (called with the group locked)
+
+        Returns:
+            Tuple of (shared value, whether the caller is the leader)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None and call.shared is not None and call.shared.acquire():
+                self._coalesced += 1
+                return call.shared, False
+
+            shared = create()
+            self._calls[key] = _Call(shared)
+            self._executions += 1
+            return shared, True
+
+    def unshare(self, key: Hashable, shared: Any) -> None:
+        """
+        Stop offering a value started with share().
+
+        Args:
+            key: Key passed to share()
+            shared: Value returned by share()
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None and call.shared is shared:
+                del self._calls[key]
+                call.done.set()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the coalescing counters.
+
+        Returns:
+            Dictionary with computations run, requests that joined another
+            request's computation, joins that timed out (and ran their own)
+            and computations currently in flight
+        """
+        with self._lock:
+            return {
+                "executions": self._executions,
+                "coalesced": self._coalesced,
+                "timeouts": self._timeouts,
+                "in_flight": len(self._calls)
+            }
+
+
+# Shared groups for the heavy read paths
+export_flight = SingleFlight("exports")
+listing_flight = SingleFlight("product_listings")
+
+
+def get_single_flight_stats() -> Dict[str, Dict[str, int]]:
+    """
+    Get the coalescing counters of every group.
+
+    Returns:
+        Dictionary of group name -> counters
+    """
+    return {flight.name: flight.stats() for flight in (export_flight, listing_flight)}
@@ -210,6 +210,11 @@ const api = {
         }
     },
 
+    // Get import progress
+    async getImportProgress(logId) {
+        return await this.get(`/import-logs/${logId}/progress`);
+    },
+
     // Get import logs
     async getImportLogs(params = {}) {
         const queryString = new URLSearchParams({
@@ -460,7 +460,20 @@ async function importProducts() {
     showLoading();
     
     try {
-        const result = await api.importProducts(file);
+        let result = await api.importProducts(file);
+        
+        // Imports run in the background: poll progress until they finish
+        while (result.status === 'processing') {
+            await new Promise(resolve => setTimeout(resolve, 1000));
+            const progress = await api.getImportProgress(result.log_id);
+            result = {
+                ...progress,
+                total_rows: progress.rows_processed,
+                message: progress.status === 'failed'
+                    ? 'La importación falló'
+                    : `Importación completada: ${progress.successful_rows} exitosos, ${progress.failed_rows} fallidos`
+            };
+        }
         
         const resultDiv = document.getElementById('import-result');
         resultDiv.className = 'import-result ' + (result.failed_rows > 0 ? 'error' : 'success');
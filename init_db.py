@@ -5,14 +5,138 @@ This script creates all database tables and optionally adds sample data.
 """
 from app.database import Base, engine
 from app.models import User, Product, ImportLog
+from app.models.change_sequence import next_change_sequence
+from app.models.product_search import create_search_index
+from app.utils.hashing import product_content_hash
+from sqlalchemy import inspect, literal, text
 from sqlalchemy.orm import Session
+from datetime import datetime
 import sys
 
+BACKFILL_BATCH_SIZE = 1000
+
+
+def add_missing_columns(connection) -> list:
+    """
+    Add the model columns and indexes missing from existing tables.
+    
+    create_all() only creates missing tables, so databases created by an
+    earlier version lack the columns added since. Columns are added as
+    nullable or with their constant default (filled in for existing rows);
+    values that need computing are filled in by backfill_columns().
+    
+    Args:
+        connection: SQLAlchemy connection
+        
+    Returns:
+        List of "table.column" names that were added
+    """
+    inspector = inspect(connection)
+    dialect = connection.dialect
+    added = []
+    
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            
+            ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=dialect)}"
+            default = column.default.arg if column.default is not None and column.default.is_scalar else None
+            if default is not None:
+                rendered = literal(default, column.type).compile(dialect=dialect, compile_kwargs={"literal_binds": True})
+                ddl += f" DEFAULT {rendered}"
+                if not column.nullable:
+                    ddl += " NOT NULL"
+            
+            connection.execute(text(ddl))
+            added.append(f"{table.name}.{column.name}")
+        
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+    
+    return added
+
+
+def backfill_columns(connection) -> None:
+    """
+    Fill in the columns of rows written before they existed.
+    
+    - products.content_hash: used by upsert imports to skip unchanged rows.
+    - products.updated_at: set to created_at (or now).
+    - products.change_seq: 0, so the change feed delivers them first.
+    - import_logs.updated_at: set to started_at (stale import detection).
+    
+    Args:
+        connection: SQLAlchemy connection
+    """
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            text(
+                "SELECT id, nombre, descripcion, precio, stock, categoria FROM products "
+                "WHERE content_hash IS NULL AND id > :last_id ORDER BY id LIMIT :limit"
+            ),
+            {"last_id": last_id, "limit": BACKFILL_BATCH_SIZE}
+        ).all()
+        if not rows:
+            break
+        
+        connection.execute(
+            text("UPDATE products SET content_hash = :content_hash WHERE id = :id"),
+            [
+                {"id": row.id, "content_hash": product_content_hash(
+                    row.nombre, row.descripcion, row.precio, row.stock, row.categoria
+                )}
+                for row in rows
+            ]
+        )
+        last_id = rows[-1].id
+    
+    connection.execute(
+        text("UPDATE products SET updated_at = coalesce(created_at, :now) WHERE updated_at IS NULL"),
+        {"now": datetime.utcnow()}
+    )
+    connection.execute(text("UPDATE products SET change_seq = 0 WHERE change_seq IS NULL"))
+    connection.execute(text("UPDATE product_tombstones SET change_seq = 0 WHERE change_seq IS NULL"))
+    connection.execute(text("UPDATE import_logs SET updated_at = started_at WHERE updated_at IS NULL"))
+    connection.execute(text(
+        "INSERT INTO change_sequence (id, value) SELECT 1, 0 "
+        "WHERE NOT EXISTS (SELECT 1 FROM change_sequence WHERE id = 1)"
+    ))
+
+
+def migrate_db(bind=engine) -> list:
+    """
+    Bring a database created by any earlier version up to date.
+    
+    Safe to run on every deploy: each step only does what is missing.
+    
+    Args:
+        bind: Engine of the database to migrate
+        
+    Returns:
+        List of "table.column" names that were added
+    """
+    Base.metadata.create_all(bind=bind)
+    
+    with bind.begin() as connection:
+        added = add_missing_columns(connection)
+    
+    with bind.begin() as connection:
+        backfill_columns(connection)
+        # Databases created before product search existed get the index here
+        create_search_index(connection)
+    
+    return added
+
 
 def init_db():
     """Initialize database tables."""
     print("Creating database tables...")
-    Base.metadata.create_all(bind=engine)
+    added = migrate_db()
+    for column in added:
+        print(f"  + {column}")
     print("✓ Database tables created successfully!")
 
 
@@ -83,7 +207,13 @@ def create_sample_data():
             )
         ]
         
+        # Stamped like any other product write, for upserts and the change feed
+        change_seq = next_change_sequence(db)
         for product in sample_products:
+            product.content_hash = product_content_hash(
+                product.nombre, product.descripcion, product.precio, product.stock, product.categoria
+            )
+            product.change_seq = change_seq
             db.add(product)
         
         print("✓ Sample products created")
@@ -7,15 +7,17 @@ To run tests:
 """
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from app.main import app
+from app.config import settings
 from app.database import Base, get_db
+from app.services.product import ProductService
+from app.utils.catalog_version import get_catalog_version
+from app.utils.export_cache import clear_export_cache
 
-# Test database
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Test database, bound to a fresh file for each test by setup_database
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False)
 
 
 def override_get_db():
@@ -32,12 +34,31 @@ app.dependency_overrides[get_db] = override_get_db
 client = TestClient(app)
 
 
-@pytest.fixture(scope="module")
-def setup_database():
-    """Setup test database."""
+def reset_caches():
+    """Forget everything cached from another test's database."""
+    for cache in (
+        ProductService.PRODUCT_CACHE,
+        ProductService.LISTING_CACHE,
+        ProductService.COUNT_CACHE,
+        ProductService.CATEGORY_STATS
+    ):
+        cache.clear()
+    clear_export_cache()
+
+
+@pytest.fixture(autouse=True)
+def setup_database(tmp_path):
+    """Setup an empty test database and upload folder under tmp_path."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    TestingSessionLocal.configure(bind=engine)
     Base.metadata.create_all(bind=engine)
-    yield
-    Base.metadata.drop_all(bind=engine)
+    # Own patcher, so a test calling monkeypatch.undo() keeps the folder
+    with pytest.MonkeyPatch.context() as patcher:
+        patcher.setattr(settings, "UPLOAD_FOLDER", str(tmp_path / "uploads"))
+        reset_caches()
+        yield
+        reset_caches()
+    engine.dispose()
 
 
 @pytest.fixture
@@ -67,6 +88,24 @@ def auth_token(test_user):
     return response.json()["access_token"]
 
 
+@pytest.fixture
+def dry_run_products(auth_token):
+    """Create three products in the DryRun category."""
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    for nombre, descripcion, precio in (
+        ("Dry Producto Uno", None, 10.0),
+        ("Dry Producto Dos", "Desc", 20.0),
+        ("Dry Producto Tres", None, 5.0)
+    ):
+        response = client.post(
+            "/api/v1/products",
+            headers=headers,
+            json={"nombre": nombre, "descripcion": descripcion, "precio": precio, "stock": 1, "categoria": "DryRun"}
+        )
+        assert response.status_code == 201
+    return headers
+
+
 def test_root():
     """Test root endpoint."""
     response = client.get("/")
@@ -139,3 +178,1409 @@ def test_unauthorized_access():
     """Test unauthorized access."""
     response = client.get("/api/v1/products")
     assert response.status_code == 401
+
+
+def test_import_products_csv(auth_token):
+    """Test product import with valid and invalid rows."""
+    csv_content = (
+        "nombre,descripcion,precio,stock,categoria\n"
+        "Producto Uno,Desc,10.5,5,Importados\n"
+        "P,Desc,10.5,5,Importados\n"
+        "Producto Tres,,-1,1.5,Importados\n"
+    )
+    response = client.post(
+        "/api/v1/products/import?background=false",
+        headers={"Authorization": f"Bearer {auth_token}"},
+        files={"file": ("productos.csv", csv_content, "text/csv")}
+    )
+    assert response.status_code == 200
+    result = response.json()
+    assert result["total_rows"] == 3
+    assert result["successful_rows"] == 1
+    assert result["failed_rows"] == 2
+    assert result["errors"][0] == {
+        "row": 3,
+        "error": "Fila 3: nombre: String should have at least 3 characters"
+    }
+    assert result["errors"][1]["error"] == (
+        "Fila 4: precio: Input should be greater than 0; "
+        "stock: Input should be a valid integer, got a number with a fractional part"
+    )
+
+
+def test_import_errors_paginated_and_downloaded(auth_token):
+    """Test that row errors are stored per field, paginated and streamed as CSV."""
+    csv_content = "nombre,descripcion,precio,stock,categoria\n" + "".join(
+        f"Producto {i},,{-i},1.5,Errores\n" for i in range(1, 6)
+    )
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    response = client.post(
+        "/api/v1/products/import?background=false",
+        headers=headers,
+        files={"file": ("errores.csv", csv_content, "text/csv")}
+    )
+    log_id = response.json()["log_id"]
+    assert response.json()["failed_rows"] == 5
+
+    response = client.get(f"/api/v1/import-logs/{log_id}/errors?skip=2&limit=3", headers=headers)
+    assert response.status_code == 200
+    page = response.json()
+    assert page["total"] == 10
+    assert [item["row"] for item in page["items"]] == [3, 3, 4]
+    assert page["items"][1] == {
+        "row": 3,
+        "field": "stock",
+        "value": "1.5",
+        "message": "Input should be a valid integer, got a number with a fractional part"
+    }
+
+    response = client.get(f"/api/v1/products/import-logs/{log_id}/download-errors", headers=headers)
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert lines[0] == "Fila,Campo,Valor,Error"
+    assert lines[1] == "2,precio,-1,Input should be greater than 0"
+    assert len(lines) == 11
+
+
+def validate_row(row_data: dict, row_number: int) -> tuple[bool, str]:
+    """Validate one row with the ProductCreate schema (oracle of the column-wise validation)."""
+    import pandas as pd
+    from pydantic import ValidationError
+    from app.schemas.product import ProductCreate
+
+    for key, value in row_data.items():
+        if pd.isna(value):
+            row_data[key] = None if key == "descripcion" else ""
+
+    try:
+        ProductCreate(**row_data)
+    except ValidationError as e:
+        errors = [f"{error['loc'][0] if error['loc'] else 'unknown'}: {error['msg']}" for error in e.errors()]
+        return False, f"Fila {row_number}: {'; '.join(errors)}"
+
+    return True, ""
+
+
+def test_validate_dataframe_matches_schema():
+    """Test that column-wise validation matches the ProductCreate schema."""
+    import datetime
+    import pandas as pd
+    from app.services.validation import ImportValidationService
+
+    df = pd.DataFrame({
+        "nombre": ["Producto", "ab", None, 123],
+        "descripcion": [None, "x", "y", "z"],
+        "precio": ["12.5", "abc", "0", "3"],
+        "stock": ["4", "2.0", "-1", "1.5"],
+        "categoria": ["A", "", "B", "C"],
+    })
+
+    valid_df, errors = ImportValidationService.validate_dataframe(df)
+
+    expected = []
+    for idx, row in df.iterrows():
+        is_valid, message = validate_row(row.to_dict(), idx + 2)
+        if not is_valid:
+            expected.append({"row": idx + 2, "error": message})
+
+    assert errors == expected
+    assert list(valid_df.index) == [0]
+    assert valid_df.iloc[0]["stock"] == 4
+    assert valid_df.iloc[0]["precio"] == 12.5
+
+    # Dates and durations (date-formatted spreadsheet cells, Parquet timestamps) are not numbers
+    dates = pd.to_datetime(["2024-01-01", None, "2024-03-01"])
+    temporal_frames = [
+        pd.DataFrame({"precio": dates, "stock": dates}),
+        pd.DataFrame({"precio": pd.to_timedelta(["1D", "2h", None]), "stock": dates.tz_localize("UTC")}),
+        pd.DataFrame({
+            "precio": [datetime.datetime(2024, 1, 1), 5.0, datetime.date(2024, 1, 1)],
+            "stock": [datetime.timedelta(days=1), 3, datetime.time(8, 30)],
+        }),
+    ]
+    for temporal in temporal_frames:
+        temporal = temporal.assign(nombre="Producto", descripcion=None, categoria="A")
+        valid_df, errors = ImportValidationService.validate_dataframe(temporal)
+
+        expected = []
+        for idx, row in temporal.iterrows():
+            is_valid, message = validate_row(row.to_dict(), idx + 2)
+            if not is_valid:
+                expected.append({"row": idx + 2, "error": message})
+
+        assert errors == expected
+        assert len(valid_df) == len(temporal) - len(errors)
+
+
+def test_validate_dataframe_fuzz_matches_schema():
+    """Test column-wise validation against the row-by-row schema on random and edge-case cells."""
+    import datetime
+    import random
+    import pandas as pd
+    from app.schemas.product import ProductCreate
+    from app.services.validation import ImportValidationService
+
+    numbers = [
+        "1", " 7 ", "\t3\n", "+2", "-1", "-0", "00012", "1_000", "1__0", "_1", "1_", "1e3", "1.0", "1.5",
+        "1.", ".5", "1_0.5", "0x10", "1 000", "nan", "inf", "-inf", "Infinity", "", "  ", "abc", "0", "0.0",
+        "9223372036854775807", "1e400", 0, 1, -1, 3, 0.0, 2.5, -2.5, 1e20, 2.0 ** 63, 2.0 ** 63 - 1024,
+        float("inf"), float("-inf"), None, float("nan"), True, False,
+        datetime.datetime(2024, 1, 1), datetime.date(2024, 1, 1), datetime.timedelta(days=1), pd.NaT,
+    ]
+    texts = ["Producto", "ab", "abc", "", " ", "x" * 255, "x" * 256, None, float("nan"), 123, 1.5, True]
+    rng = random.Random(20240611)
+
+    def frames():
+        for _ in range(40):
+            size = rng.randint(1, 30)
+            yield pd.DataFrame({
+                "nombre": [rng.choice(texts) for _ in range(size)],
+                "descripcion": [rng.choice(texts) for _ in range(size)],
+                "precio": [rng.choice(numbers) for _ in range(size)],
+                "stock": [rng.choice(numbers) for _ in range(size)],
+                "categoria": [rng.choice(texts[:8]) for _ in range(size)],
+            })
+        # Typed columns, as read from clean CSV/Parquet files
+        yield pd.DataFrame({
+            "nombre": ["Producto"] * 6,
+            "descripcion": [None] * 6,
+            "precio": [1.5, 0.0, -1.0, float("inf"), float("nan"), 1e300],
+            "stock": [0.0, 1.5, 2.0 ** 63, -3.0, float("inf"), 7.0],
+            "categoria": ["A"] * 6,
+        })
+        yield pd.DataFrame({
+            "nombre": ["Producto"] * 3, "descripcion": ["d"] * 3, "precio": [1, 0, -5],
+            "stock": [True, False, True], "categoria": ["A"] * 3,
+        })
+
+    for df in frames():
+        valid_df, errors = ImportValidationService.validate_dataframe(df)
+
+        expected = []
+        stocks = {}
+        for idx, row in df.iterrows():
+            row_data = row.to_dict()
+            is_valid, message = validate_row(row_data, idx + 2)
+            if not is_valid:
+                expected.append({"row": idx + 2, "error": message})
+            else:
+                stocks[idx] = ProductCreate(**row_data).stock
+
+        assert errors == expected, df
+        assert valid_df["stock"].to_dict() == stocks
+
+    # The one intended difference: integers the stock column cannot store
+    huge = pd.DataFrame({
+        "nombre": ["Producto"], "descripcion": [None], "precio": ["1"],
+        "stock": ["99999999999999999999"], "categoria": ["A"],
+    })
+    assert validate_row(huge.iloc[0].to_dict(), 2) == (True, "")
+    _, errors = ImportValidationService.validate_dataframe(huge)
+    assert errors[0]["error"] == f"Fila 2: stock: {ImportValidationService.MSG_INT_TOO_LARGE}"
+
+
+def test_import_products_in_chunks(auth_token, monkeypatch):
+    """Test that chunked imports keep row numbers and counters across chunks."""
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "IMPORT_CHUNK_SIZE", 2)
+    rows = [f"Chunk Producto {i},Desc,{i + 1}.5,{i},Chunks" for i in range(4)]
+    rows.append("Chunk Producto 4,Desc,abc,1,Chunks")
+    csv_content = "nombre,descripcion,precio,stock,categoria\n" + "\n".join(rows) + "\n"
+
+    response = client.post(
+        "/api/v1/products/import?background=false",
+        headers={"Authorization": f"Bearer {auth_token}"},
+        files={"file": ("chunks.csv", csv_content, "text/csv")}
+    )
+    assert response.status_code == 200
+    result = response.json()
+    assert result["total_rows"] == 5
+    assert result["successful_rows"] == 4
+    assert result["failed_rows"] == 1
+    assert result["errors"][0]["row"] == 6
+
+
+def test_import_products_background(auth_token, monkeypatch):
+    """Test that background imports return right away and report progress."""
+    import asyncio
+    import time
+    from app.services.import_export import ImportExportService
+
+    # Saving and scanning the upload must not run on the event loop
+    blocking_calls = []
+
+    def off_event_loop(func):
+        def wrapper(*args, **kwargs):
+            try:
+                asyncio.get_running_loop()
+                blocking_calls.append((func.__name__, "event loop"))
+            except RuntimeError:
+                blocking_calls.append((func.__name__, "worker thread"))
+            return func(*args, **kwargs)
+        return staticmethod(wrapper)
+
+    monkeypatch.setattr(ImportExportService, "save_upload", off_event_loop(ImportExportService.save_upload))
+    monkeypatch.setattr(
+        ImportExportService, "estimate_row_count", off_event_loop(ImportExportService.estimate_row_count)
+    )
+
+    csv_content = (
+        "nombre,descripcion,precio,stock,categoria\n"
+        "Fondo Uno,Desc,1.5,1,Fondo\n"
+        "Fondo Dos,Desc,2.5,2,Fondo\n"
+    )
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    response = client.post(
+        "/api/v1/products/import",
+        headers=headers,
+        files={"file": ("fondo.csv", csv_content, "text/csv")}
+    )
+    assert response.status_code == 202
+    log_id = response.json()["log_id"]
+
+    for _ in range(50):
+        progress = client.get(f"/api/v1/import-logs/{log_id}/progress", headers=headers).json()
+        if progress["status"] != "processing":
+            break
+        time.sleep(0.1)
+
+    assert progress["status"] == "completed"
+    assert progress["expected_rows"] == 2
+    assert progress["rows_processed"] == 2
+    assert progress["successful_rows"] == 2
+    assert progress["percent"] == 100.0
+    assert blocking_calls == [("save_upload", "worker thread"), ("estimate_row_count", "worker thread")]
+
+
+def test_import_products_background_failure(auth_token):
+    """Test that a failed background import reports why it failed."""
+    import time
+
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    response = client.post(
+        "/api/v1/products/import",
+        headers=headers,
+        files={"file": ("sin_columnas.csv", "nombre,precio\nSolo,1.5\n", "text/csv")}
+    )
+    assert response.status_code == 202
+    log_id = response.json()["log_id"]
+
+    for _ in range(50):
+        progress = client.get(f"/api/v1/import-logs/{log_id}/progress", headers=headers).json()
+        if progress["status"] != "processing":
+            break
+        time.sleep(0.1)
+
+    assert progress["status"] == "failed"
+    assert "Columnas requeridas faltantes" in progress["error_message"]
+
+    logs = client.get("/api/v1/import-logs?limit=100", headers=headers).json()
+    item = next(log for log in logs["items"] if log["id"] == log_id)
+    assert item["error_message"] == progress["error_message"]
+    assert "errors" not in item
+
+
+def test_validate_chunks_parallel(monkeypatch):
+    """Test that parallel validation merges shards in file order."""
+    import pandas as pd
+    from app.config import settings
+    from app.services.import_export import ImportExportService
+    from app.utils.background import reset_process_pool
+
+    df = pd.DataFrame({
+        "nombre": [f"Producto {i}" if i % 3 else "P" for i in range(12)],
+        "descripcion": [None] * 12,
+        "precio": [float(i + 1) for i in range(12)],
+        "stock": list(range(12)),
+        "categoria": ["Paralelo"] * 12,
+    })
+    chunks = [df.iloc[start:start + 4] for start in range(0, 12, 4)]
+
+    monkeypatch.setattr(settings, "VALIDATION_WORKERS", 2)
+    monkeypatch.setattr(settings, "PARALLEL_VALIDATION_MIN_ROWS", 4)
+    try:
+        results = list(ImportExportService.validate_chunks(iter(chunks)))
+    finally:
+        reset_process_pool()
+
+    assert [rows for rows, _, _ in results] == [4, 4, 4]
+    valid_index = [idx for _, valid_df, _ in results for idx in valid_df.index]
+    error_rows = [error["row"] for _, _, errors in results for error in errors]
+    assert valid_index == [i for i in range(12) if i % 3]
+    assert error_rows == [i + 2 for i in range(12) if not i % 3]
+
+
+def test_import_products_upsert(auth_token):
+    """Test that upsert imports insert new, update changed and skip identical rows."""
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    header = "nombre,descripcion,precio,stock,categoria\n"
+
+    def upsert(csv_content):
+        response = client.post(
+            "/api/v1/products/import?background=false&mode=upsert",
+            headers=headers,
+            files={"file": ("delta.csv", header + csv_content, "text/csv")}
+        )
+        assert response.status_code == 200
+        return response.json()
+
+    first = upsert("Delta Uno,Desc,10.0,1,Delta\nDelta Dos,Desc,20.0,2,Delta\n")
+    assert (first["inserted_rows"], first["updated_rows"], first["unchanged_rows"]) == (2, 0, 0)
+
+    second = upsert(
+        "Delta Uno,Desc,10.0,1,Delta\n"
+        "Delta Dos,Desc,25.0,3,Delta\n"
+        "Delta Tres,,30.0,4,Delta\n"
+    )
+    assert (second["inserted_rows"], second["updated_rows"], second["unchanged_rows"]) == (1, 1, 1)
+
+    products = client.get(
+        "/api/v1/products?categoria=Delta",
+        headers=headers
+    ).json()
+    assert products["total"] == 3
+    updated = next(p for p in products["items"] if p["nombre"] == "Delta Dos")
+    assert updated["precio"] == 25.0
+    assert updated["stock"] == 3
+
+    # A repeated key is superseded by its last row; only changed columns are written
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("UPDATE products"):
+            statements.append(statement)
+
+    engine = TestingSessionLocal.kw["bind"]
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        third = upsert("Delta Uno,Desc,11.0,1,Delta\nDelta Uno,Desc,12.0,1,Delta\n")
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert (third["inserted_rows"], third["updated_rows"], third["unchanged_rows"]) == (0, 1, 0)
+    assert third["superseded_rows"] == 1
+    assert len(statements) == 1
+    assert "precio" in statements[0] and "descripcion" not in statements[0]
+
+
+def test_import_products_excel_sheet(auth_token):
+    """Test streaming Excel import with sheet selection and leading rows."""
+    import io
+    from openpyxl import Workbook
+
+    workbook = Workbook()
+    workbook.active.title = "Resumen"
+    worksheet = workbook.create_sheet("Productos")
+    worksheet.append(["Catálogo de productos"])
+    worksheet.append([])
+    worksheet.append(["nombre", "descripcion", "precio", "stock", "categoria"])
+    worksheet.append(["Excel Uno", "Desc", 10.5, 3, "Excel"])
+    worksheet.append([None, None, None, None, None])
+    worksheet.append(["Excel Dos", None, -2, 1, "Excel"])
+    output = io.BytesIO()
+    workbook.save(output)
+
+    response = client.post(
+        "/api/v1/products/import?background=false&sheet=Productos&skip_rows=2",
+        headers={"Authorization": f"Bearer {auth_token}"},
+        files={"file": (
+            "productos.xlsx",
+            output.getvalue(),
+            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        )}
+    )
+    assert response.status_code == 200
+    result = response.json()
+    assert result["total_rows"] == 2
+    assert result["successful_rows"] == 1
+    assert result["errors"][0]["error"] == "Fila 6: precio: Input should be greater than 0"
+
+
+def test_resume_failed_import(auth_token, monkeypatch):
+    """Test that a failed import resumes from its checkpoint without duplicates."""
+    from app.config import settings
+    from app.services.bulk_loader import BulkLoader
+
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    monkeypatch.setattr(settings, "IMPORT_CHUNK_SIZE", 2)
+    rows = [f"Resume Producto {i},Desc,{i + 1}.0,{i},Resume" for i in range(5)]
+    rows.append("R,Desc,1.0,1,Resume")
+    csv_content = "nombre,descripcion,precio,stock,categoria\n" + "\n".join(rows) + "\n"
+
+    original_load = BulkLoader.load
+    calls = {"count": 0}
+
+    def failing_load(db, rows):
+        calls["count"] += 1
+        if calls["count"] == 2:
+            raise RuntimeError("database is locked")
+        return original_load(db, rows)
+
+    monkeypatch.setattr(BulkLoader, "load", staticmethod(failing_load))
+    response = client.post(
+        "/api/v1/products/import?background=false",
+        headers=headers,
+        files={"file": ("resume.csv", csv_content, "text/csv")}
+    )
+    assert response.status_code == 500
+
+    logs = client.get("/api/v1/import-logs", headers=headers).json()["items"]
+    failed_log = next(log for log in logs if log["filename"] == "resume.csv")
+    assert failed_log["status"] == "failed"
+    assert failed_log["checkpoint_rows"] == 2
+
+    monkeypatch.setattr(BulkLoader, "load", staticmethod(original_load))
+    response = client.post(
+        f"/api/v1/import-logs/{failed_log['id']}/resume?background=false",
+        headers=headers
+    )
+    assert response.status_code == 200
+    result = response.json()
+    assert result["status"] == "completed"
+    assert result["total_rows"] == 6
+    assert result["successful_rows"] == 5
+    assert result["errors"][0]["row"] == 7
+
+    products = client.get("/api/v1/products?categoria=Resume", headers=headers).json()
+    assert products["total"] == 5
+
+    response = client.post(f"/api/v1/import-logs/{failed_log['id']}/resume", headers=headers)
+    assert response.status_code == 409
+
+
+def test_iter_file_chunks_resumes_csv_by_record(tmp_path):
+    """Test that CSV resume skips parsed records, not lines, with multi-line fields and blank lines."""
+    import pandas as pd
+    from app.services.import_export import ImportExportService
+
+    path = tmp_path / "multilinea.csv"
+    path.write_text(
+        "nombre,descripcion,precio,stock,categoria\n"
+        "Uno,\"Primera línea\nsegunda línea\",1.0,1,Multi\n"
+        "\n"
+        "Dos,\"Otra\n\ndescripción\",2.0,2,Multi\n"
+        "Tres,Simple,3.0,3,Multi\n"
+        "Cuatro,\"Fin\nde línea\",4.0,4,Multi\n",
+        encoding="utf-8"
+    )
+
+    full = pd.concat(ImportExportService.iter_file_chunks(str(path), "multilinea.csv", chunk_size=2))
+    assert list(full["nombre"]) == ["Uno", "Dos", "Tres", "Cuatro"]
+
+    for start_row in range(5):
+        resumed = list(ImportExportService.iter_file_chunks(
+            str(path), "multilinea.csv", chunk_size=2, start_row=start_row
+        ))
+        rows = pd.concat(resumed) if resumed else full.iloc[0:0]
+        assert list(rows.index) == list(full.index[start_row:])
+        assert list(rows["nombre"]) == list(full["nombre"][start_row:])
+        assert list(rows["descripcion"]) == list(full["descripcion"][start_row:])
+
+
+def test_import_dry_run_and_commit(auth_token):
+    """Test that a dry run only validates and its token imports the validated rows."""
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    csv_content = (
+        "nombre,descripcion,precio,stock,categoria\n"
+        "Dry Producto Uno,,10.0,1,DryRun\n"
+        "Dry Producto Dos,Desc,20.0,2,DryRun\n"
+        "D,Desc,1.0,1,DryRun\n"
+    )
+    response = client.post(
+        "/api/v1/products/import?background=false&dry_run=true",
+        headers=headers,
+        files={"file": ("dry_run.csv", csv_content, "text/csv")}
+    )
+    assert response.status_code == 200
+    result = response.json()
+    assert result["status"] == "validated"
+    assert result["successful_rows"] == 2
+    assert result["failed_rows"] == 1
+    assert result["commit_token"]
+    assert client.get("/api/v1/products?categoria=DryRun", headers=headers).json()["total"] == 0
+
+    token = result["commit_token"]
+    response = client.post(f"/api/v1/products/import/commit/{token}?background=false", headers=headers)
+    assert response.status_code == 200
+    result = response.json()
+    assert result["status"] == "completed"
+    assert result["inserted_rows"] == 2
+    assert result["errors"][0]["row"] == 4
+    assert client.get("/api/v1/products?categoria=DryRun", headers=headers).json()["total"] == 2
+
+    response = client.post(f"/api/v1/products/import/commit/{token}", headers=headers)
+    assert response.status_code == 404
+
+
+def test_export_csv_streams_with_cap(dry_run_products, monkeypatch):
+    """Test that the CSV export streams every product and honors MAX_EXPORT_RECORDS."""
+    from app.config import settings
+
+    headers = dry_run_products
+    total = client.get("/api/v1/products", headers=headers).json()["total"]
+    monkeypatch.setattr(settings, "EXPORT_BATCH_SIZE", 2)
+
+    response = client.get("/api/v1/products/export/csv", headers=headers)
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert lines[0] == "id,nombre,descripcion,precio,stock,categoria"
+    assert len(lines) == total + 1
+
+    monkeypatch.setattr(settings, "MAX_EXPORT_RECORDS", 3)
+    response = client.get("/api/v1/products/export/csv", headers=headers)
+    assert len(response.text.splitlines()) == 4
+
+
+def test_export_excel_splits_sheets(dry_run_products, monkeypatch):
+    """Test that the Excel export continues in a new sheet at the row limit."""
+    import io
+    from openpyxl import load_workbook
+    from app.services.import_export import ImportExportService
+
+    headers = dry_run_products
+    total = client.get("/api/v1/products", headers=headers).json()["total"]
+    monkeypatch.setattr(ImportExportService, "EXCEL_MAX_ROWS", 4)
+
+    response = client.get("/api/v1/products/export/excel", headers=headers)
+    assert response.status_code == 200
+    workbook = load_workbook(io.BytesIO(response.content), read_only=True)
+    sheets = [list(worksheet.values) for worksheet in workbook.worksheets]
+    assert len(sheets) == max(1, -(-total // 3))
+    assert workbook.sheetnames[:2] == ["Productos", "Productos 2"][:len(sheets)]
+    assert all(rows[0] == tuple(ImportExportService.EXPORT_COLUMNS) for rows in sheets)
+    assert all(len(rows) <= 4 for rows in sheets)
+    assert sum(len(rows) - 1 for rows in sheets) == total
+
+
+def test_export_filtered_columns(dry_run_products):
+    """Test that exports apply the listing filters and the column projection."""
+    headers = dry_run_products
+
+    response = client.get(
+        "/api/v1/products/export/csv?categoria=DryRun&precio_min=15&columns=nombre,precio",
+        headers=headers
+    )
+    assert response.status_code == 200
+    assert response.text.splitlines() == ["nombre,precio", "Dry Producto Dos,20.0"]
+
+    response = client.get("/api/v1/products/export/csv?columns=nombre,clave", headers=headers)
+    assert response.status_code == 400
+
+
+def test_import_and_export_parquet(auth_token, monkeypatch):
+    """Test that Parquet files go through the chunked import and export typed columns."""
+    import io
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    from app.config import settings
+
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    monkeypatch.setattr(settings, "IMPORT_CHUNK_SIZE", 2)
+    table = pa.table({
+        "nombre": ["Parquet Uno", "Parquet Dos", "P"],
+        "descripcion": [None, "Desc", "Desc"],
+        "precio": [10.5, 20.0, 1.0],
+        "stock": [1, 2, 3],
+        "categoria": ["Parquet", "Parquet", "Parquet"],
+    })
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, row_group_size=2)
+
+    response = client.post(
+        "/api/v1/products/import?background=false",
+        headers=headers,
+        files={"file": ("productos.parquet", buffer.getvalue(), "application/octet-stream")}
+    )
+    assert response.status_code == 200
+    result = response.json()
+    assert result["successful_rows"] == 2
+    assert result["errors"][0]["row"] == 4
+
+    response = client.get(
+        "/api/v1/products/export/parquet?categoria=Parquet&columns=nombre,precio,stock",
+        headers=headers
+    )
+    assert response.status_code == 200
+    exported = pq.read_table(io.BytesIO(response.content))
+    assert exported.schema.field("stock").type == pa.int64()
+    assert exported.to_pydict() == {
+        "nombre": ["Parquet Uno", "Parquet Dos"],
+        "precio": [10.5, 20.0],
+        "stock": [1, 2],
+    }
+
+
+def test_export_etag_and_cache(dry_run_products, monkeypatch):
+    """Test that exports send an ETag, answer 304 and are served from the cache."""
+    from app.services.import_export import ImportExportService
+
+    headers = dry_run_products
+    response = client.get("/api/v1/products/export/csv?categoria=DryRun", headers=headers)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    body = response.text
+
+    def no_database(*args, **kwargs):
+        raise AssertionError("the export should not be rebuilt")
+
+    monkeypatch.setattr(ImportExportService, "iter_export_batches", no_database)
+    response = client.get(
+        "/api/v1/products/export/csv?categoria=DryRun",
+        headers={**headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    response = client.get("/api/v1/products/export/csv?categoria=DryRun", headers=headers)
+    assert response.status_code == 200
+    assert response.text == body
+    monkeypatch.undo()
+
+    client.post(
+        "/api/v1/products",
+        headers=headers,
+        json={"nombre": "Dry Producto Cuatro", "precio": 5.0, "stock": 1, "categoria": "DryRun"}
+    )
+    response = client.get(
+        "/api/v1/products/export/csv?categoria=DryRun",
+        headers={**headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert "Dry Producto Cuatro" in response.text
+
+
+def test_export_waiters_do_not_starve_the_threadpool(auth_token, monkeypatch):
+    """Test that identical exports read the one streaming, once, without holding worker threads."""
+    import os
+    import threading
+    import time
+    import anyio
+    import httpx
+    from app.config import settings
+    from app.services.import_export import ImportExportService
+    from app.utils.export_cache import clear_export_cache
+    from app.utils.single_flight import export_flight
+
+    runs = []
+
+    def slow_export(bind, filters, columns):
+        runs.append(1)
+        yield b"id,nombre\n"
+        for i in range(10):
+            time.sleep(0.05)
+            yield f"{i},Lento {i}\n".encode()
+
+    monkeypatch.setattr(ImportExportService, "export_to_csv", staticmethod(slow_export))
+    # Without the cache, identical exports still run once: they read the one streaming
+    monkeypatch.setattr(settings, "EXPORT_CACHE_MAX_BYTES", 0)
+    clear_export_cache()
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    url = "/api/v1/products/export/csv?categoria=Concurrencia"
+    bodies = []
+
+    async def export(http):
+        response = await http.get(url, headers=headers)
+        assert response.status_code == 200
+        bodies.append(response.text)
+
+    async def main():
+        # Fewer threads than readers: readers parked in the pool would deadlock the export
+        anyio.to_thread.current_default_thread_limiter().total_tokens = 4
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            async with anyio.create_task_group() as tasks:
+                tasks.start_soon(export, http)
+                while export_flight.stats()["in_flight"] == 0:
+                    await anyio.sleep(0.01)
+                for _ in range(5):
+                    tasks.start_soon(export, http)
+
+    coalesced = export_flight.stats()["coalesced"]
+    # A deadlocked threadpool cannot be cancelled: run the app where it can be abandoned
+    runner = threading.Thread(target=anyio.run, args=(main,), daemon=True)
+    runner.start()
+    runner.join(10)
+
+    assert not runner.is_alive(), "identical exports deadlocked the threadpool"
+    assert len(bodies) == 6
+    assert len(set(bodies)) == 1
+    assert "9,Lento 9" in bodies[0]
+    assert len(runs) == 1
+    assert export_flight.stats()["coalesced"] - coalesced == 5
+    assert export_flight.stats()["in_flight"] == 0
+    assert os.listdir(os.path.join(settings.UPLOAD_FOLDER, "export_cache")) == []
+
+
+def test_catalog_version_follows_database_writes(auth_token):
+    """Test that the catalog version only changes with product writes, for every worker."""
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    response = client.get("/api/v1/products/export/csv", headers=headers)
+    etag = response.headers["etag"]
+
+    # Another worker (its own engine) computes the same ETag
+    other = create_engine(str(TestingSessionLocal.kw["bind"].url))
+    db = TestingSessionLocal(bind=other)
+    try:
+        assert get_catalog_version(db) == get_catalog_version(other)
+        version = get_catalog_version(db)
+    finally:
+        db.close()
+        other.dispose()
+
+    response = client.get("/api/v1/products/export/csv", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+
+    client.post(
+        "/api/v1/products",
+        headers=headers,
+        json={"nombre": "Producto Versionado", "precio": 1.0, "stock": 1, "categoria": "Version"}
+    )
+    db = TestingSessionLocal()
+    try:
+        assert get_catalog_version(db) != version
+    finally:
+        db.close()
+    response = client.get("/api/v1/products/export/csv", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+
+
+def test_export_cache_keeps_other_workers_files(tmp_path, monkeypatch):
+    """Test that the shared export cache folder only loses files of stopped processes."""
+    import os
+    import subprocess
+    import sys
+    from app.utils import export_cache
+
+    stopped = subprocess.Popen([sys.executable, "-c", "pass"])
+    stopped.wait()
+
+    folder = tmp_path / "export_cache"
+    folder.mkdir()
+    running = folder / f"clave_{os.getppid()}.csv"
+    running.write_bytes(b"id\n")
+    streaming = folder / f"export_{os.getppid()}_abc.csv"
+    streaming.write_bytes(b"id\n")
+    orphan = folder / f"clave_{stopped.pid}.csv"
+    orphan.write_bytes(b"id\n")
+    legacy = folder / "huerfano.csv"
+    legacy.write_bytes(b"id\n")
+
+    monkeypatch.setattr(settings, "UPLOAD_FOLDER", str(tmp_path))
+    monkeypatch.setattr(export_cache, "_initialized", False)
+    assert export_cache.get_cache_folder() == str(folder)
+
+    assert running.exists()
+    assert streaming.exists()
+    assert not orphan.exists()
+    assert not legacy.exists()
+
+
+def test_export_csv_compression(auth_token):
+    """Test negotiated and explicit compression of the CSV export."""
+    import gzip
+
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    url = "/api/v1/products/export/csv?categoria=DryRun"
+    plain = client.get(url, headers={**headers, "Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+
+    response = client.get(url, headers={**headers, "Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert response.headers["etag"] != plain.headers["etag"]
+    assert response.text == plain.text
+
+    response = client.get(f"{url}&compression=gzip", headers={**headers, "Accept-Encoding": "identity"})
+    assert response.headers["content-type"] == "application/gzip"
+    assert "productos_export.csv.gz" in response.headers["content-disposition"]
+    assert gzip.decompress(response.content).decode("utf-8") == plain.text
+
+    response = client.get(f"{url}&compression=brotli", headers=headers)
+    assert response.status_code == 400
+
+
+def test_export_job_with_range_download(dry_run_products):
+    """Test that export jobs run in the background and support Range downloads."""
+    import time
+
+    headers = dry_run_products
+    response = client.post("/api/v1/products/export/jobs?format=csv&categoria=DryRun", headers=headers)
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+
+    for _ in range(50):
+        job = client.get(f"/api/v1/products/export/jobs/{job_id}", headers=headers).json()
+        if job["status"] in ("completed", "failed"):
+            break
+        time.sleep(0.1)
+
+    assert job["status"] == "completed"
+    assert job["rows_written"] == job["expected_rows"] == 3
+    assert job["percent"] == 100.0
+    assert job["truncated"] is False
+
+    url = f"/api/v1/products/export/jobs/{job_id}/download"
+    full = client.get(url, headers=headers)
+    assert full.status_code == 200
+    assert full.text.startswith("id,nombre,descripcion,precio,stock,categoria\n")
+    assert int(full.headers["content-length"]) == job["file_size"]
+
+    partial = client.get(url, headers={**headers, "Range": "bytes=3-9"})
+    assert partial.status_code == 206
+    assert partial.headers["content-range"] == f"bytes 3-9/{job['file_size']}"
+    assert partial.content == full.content[3:10]
+
+    response = client.get(url, headers={**headers, "Range": f"bytes={job['file_size']}-"})
+    assert response.status_code == 416
+
+
+def test_export_job_reports_truncation(dry_run_products, monkeypatch):
+    """Test that export jobs capped at MAX_EXPORT_RECORDS say they are incomplete."""
+    import time
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "MAX_EXPORT_RECORDS", 2)
+    headers = dry_run_products
+    job_id = client.post("/api/v1/products/export/jobs?format=csv&categoria=DryRun", headers=headers).json()["id"]
+
+    for _ in range(50):
+        job = client.get(f"/api/v1/products/export/jobs/{job_id}", headers=headers).json()
+        if job["status"] in ("completed", "failed"):
+            break
+        time.sleep(0.1)
+
+    assert job["status"] == "completed"
+    assert job["truncated"] is True
+    assert job["rows_written"] == job["expected_rows"] == 2
+
+    response = client.get(f"/api/v1/products/export/jobs/{job_id}/download", headers=headers)
+    assert response.headers["x-export-truncated"] == "true"
+    assert len(response.text.splitlines()) == 3
+
+
+def test_export_jobs_interrupted_by_a_restart_are_failed(tmp_path):
+    """Test that startup fails the export jobs of stopped processes and deletes their files."""
+    import os
+    import subprocess
+    import sys
+    from app.models.export_job import ExportJob
+    from app.services.export_job import ExportJobService
+
+    stopped = subprocess.Popen([sys.executable, "-c", "pass"])
+    stopped.wait()
+
+    db = TestingSessionLocal()
+    try:
+        interrupted = ExportJob(format="csv", status="processing", worker_pid=stopped.pid)
+        queued = ExportJob(format="csv", status="queued", worker_pid=os.getpid())
+        running = ExportJob(format="csv", status="processing", worker_pid=os.getppid())
+        db.add_all([interrupted, queued, running])
+        db.commit()
+
+        partial = ExportJobService.job_path(interrupted)
+        os.makedirs(os.path.dirname(partial), exist_ok=True)
+        with open(partial, "w") as output:
+            output.write("id,nombre\n")
+
+        assert ExportJobService.recover_stale_jobs(db) == 2
+        db.expire_all()
+        assert (interrupted.status, queued.status, running.status) == ("failed", "failed", "processing")
+        assert interrupted.error and not os.path.exists(partial)
+    finally:
+        db.close()
+
+
+def test_export_jobs_run_apart_from_imports(dry_run_products):
+    """Test that export jobs run in their own pool and not in the import workers."""
+    import threading
+    import time
+    from app.services.export_job import ExportJobService
+
+    headers = dry_run_products
+    threads = []
+    original = ExportJobService.run_export_job
+
+    def recording(*args):
+        threads.append(threading.current_thread().name)
+        original(*args)
+
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(ExportJobService, "run_export_job", staticmethod(recording))
+        job_id = client.post("/api/v1/products/export/jobs?format=csv&categoria=DryRun", headers=headers).json()["id"]
+        for _ in range(50):
+            if client.get(f"/api/v1/products/export/jobs/{job_id}", headers=headers).json()["status"] == "completed":
+                break
+            time.sleep(0.1)
+
+    assert threads and threads[0].startswith("export-job")
+
+
+def test_stream_products_ndjson(dry_run_products):
+    """Test that the NDJSON stream returns every filtered product, one per line."""
+    import json
+
+    headers = dry_run_products
+    response = client.get("/api/v1/products/stream?categoria=DryRun", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    items = [json.loads(line) for line in response.text.splitlines()]
+    listing = client.get("/api/v1/products?categoria=DryRun", headers=headers).json()
+    assert len(items) == listing["total"] == 3
+    assert [item["id"] for item in items] == sorted(item["id"] for item in listing["items"])
+    assert set(items[0]) == set(listing["items"][0])
+
+    response = client.get("/api/v1/products/stream?categoria=DryRun&q=uno", headers=headers)
+    searched = client.get("/api/v1/products?categoria=DryRun&q=uno", headers=headers).json()
+    assert [json.loads(line)["id"] for line in response.text.splitlines()] == [item["id"] for item in searched["items"]]
+    assert searched["total"] == 1
+
+    assert client.get("/api/v1/products/stream?q=%20-", headers=headers).status_code == 400
+
+
+def test_product_change_feed(auth_token):
+    """Test that the change feed pages through upserts and deletes by cursor."""
+    import json
+    from datetime import datetime, timedelta
+
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    since = (datetime.utcnow() - timedelta(seconds=1)).isoformat()
+
+    created = [
+        client.post("/api/v1/products", json={
+            "nombre": f"Sync Producto {i}", "precio": 10.0, "stock": 1, "categoria": "Sync"
+        }, headers=headers).json()
+        for i in range(3)
+    ]
+    client.put(f"/api/v1/products/{created[0]['id']}", json={"stock": 7}, headers=headers)
+    client.delete(f"/api/v1/products/{created[1]['id']}", headers=headers)
+
+    changes = []
+    cursor = None
+    while True:
+        params = {"limit": 2, "cursor": cursor} if cursor else {"limit": 2, "since": since}
+        page = client.get("/api/v1/products/changes", params=params, headers=headers).json()
+        changes.extend(page["items"])
+        cursor = page["next_cursor"]
+        if not page["has_more"]:
+            break
+
+    ops = {(change["op"], change["id"]) for change in changes}
+    assert ops == {
+        ("upsert", created[0]["id"]), ("upsert", created[2]["id"]), ("delete", created[1]["id"])
+    }
+    updated = next(change for change in changes if change["id"] == created[0]["id"])
+    assert updated["stock"] == 7
+
+    # The last cursor only returns later changes
+    page = client.get("/api/v1/products/changes", params={"cursor": cursor}, headers=headers).json()
+    assert page["items"] == []
+
+    response = client.get("/api/v1/products/export/changes", params={"since": since}, headers=headers)
+    assert response.status_code == 200
+    exported = [json.loads(line) for line in response.text.splitlines()]
+    assert {(change["op"], change["id"]) for change in exported} == ops
+    assert response.headers["x-next-cursor"]
+
+    invalid = client.get("/api/v1/products/changes", params={"cursor": "no-valido"}, headers=headers)
+    assert invalid.status_code == 400
+
+
+def test_change_feed_follows_commit_order(auth_token):
+    """Test that rows written before a read but committed after it are not skipped."""
+    from app.services.bulk_loader import BulkLoader
+
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    cursor = client.get("/api/v1/products/changes", headers=headers).json()["next_cursor"]
+    while True:
+        page = client.get("/api/v1/products/changes", params={"cursor": cursor}, headers=headers).json()
+        cursor = page["next_cursor"]
+        if not page["has_more"]:
+            break
+
+    # A long import chunk: rows are written now and committed after a reader moved on
+    db = TestingSessionLocal()
+    try:
+        BulkLoader.insert_many(db, [
+            {"nombre": "Lento Producto", "descripcion": None, "precio": 1.0, "stock": 1, "categoria": "Lento"}
+        ])
+
+        page = client.get("/api/v1/products/changes", params={"cursor": cursor}, headers=headers).json()
+        assert page["items"] == []
+        cursor = page["next_cursor"]
+
+        db.commit()
+    finally:
+        db.close()
+
+    page = client.get("/api/v1/products/changes", params={"cursor": cursor}, headers=headers).json()
+    assert [(change["op"], change["nombre"]) for change in page["items"]] == [("upsert", "Lento Producto")]
+
+
+def test_single_flight_coalesces_concurrent_calls(auth_token):
+    """Test that identical concurrent calls share one computation and are counted."""
+    import threading
+    import time
+    from app.schemas.product import ProductResponse
+    from app.utils.single_flight import SingleFlight
+
+    flight = SingleFlight("test")
+    runs = []
+
+    def compute():
+        runs.append(1)
+        # Hold the computation until the other callers have joined it
+        deadline = time.monotonic() + 5
+        while flight.stats()["coalesced"] < 4 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return {"rows": 42}
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(flight.do(("csv", "Sync"), compute)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(runs) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert all(result is results[0][0] for result, _ in results)
+    assert flight.stats() == {"executions": 1, "coalesced": 4, "timeouts": 0, "in_flight": 0}
+
+    # A caller does not wait longer than its timeout for a stalled computation
+    release = threading.Event()
+    stalled = threading.Thread(target=flight.do, args=(("csv", "Lento"), release.wait))
+    stalled.start()
+    while flight.stats()["in_flight"] == 0:
+        time.sleep(0.01)
+    assert flight.do(("csv", "Lento"), lambda: "propio", timeout=0.05) == ("propio", False)
+    release.set()
+    stalled.join()
+    assert flight.stats()["timeouts"] == 1
+
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    client.post(
+        "/api/v1/products",
+        headers=headers,
+        json={"nombre": "Producto Compartido", "precio": 1.0, "stock": 1, "categoria": "Flight"}
+    )
+    # Listings are shared as plain models, usable after the loading session is closed
+    db = TestingSessionLocal()
+    products, _ = ProductService.get_products(db, categoria="Flight")
+    db.close()
+    assert [product.nombre for product in products] == ["Producto Compartido"]
+    assert all(isinstance(product, ProductResponse) for product in products)
+
+    client.get("/api/v1/products", headers=headers)
+    response = client.get("/api/v1/metrics/single-flight", headers=headers)
+    assert response.status_code == 200
+    assert set(response.json()) == {"exports", "product_listings"}
+    assert response.json()["product_listings"]["executions"] >= 1
+
+
+def test_get_products_cursor_pagination(auth_token):
+    """Test that cursor pages follow (sort_by, id) with filters and no gaps or repeats."""
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    prices = [30.0, 10.0, 20.0, 10.0, 50.0, 20.0, 40.0]
+    for i, precio in enumerate(prices):
+        client.post("/api/v1/products", json={
+            "nombre": f"Cursor Producto {i}", "precio": precio, "stock": i, "categoria": "Cursor"
+        }, headers=headers)
+
+    params = {"categoria": "Cursor", "precio_min": 15, "sort_by": "precio", "sort_order": "desc", "limit": 2}
+    pages = []
+    cursors = []
+    cursor = None
+    while True:
+        page = client.get(
+            "/api/v1/products", params={**params, "cursor": cursor} if cursor else params, headers=headers
+        ).json()
+        assert page["total"] == 5
+        pages.append(page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+        cursors.append(cursor)
+
+    items = [item for page in pages for item in page]
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert [item["precio"] for item in items] == [50.0, 40.0, 30.0, 20.0, 20.0]
+    assert items[3]["id"] > items[4]["id"]  # Ties ordered by id, descending
+
+    # The cursor must match the requested order
+    mismatch = client.get(
+        "/api/v1/products", params={**params, "sort_order": "asc", "cursor": cursors[0]}, headers=headers
+    )
+    assert mismatch.status_code == 400
+    assert client.get("/api/v1/products", params={"sort_by": "descripcion"}, headers=headers).status_code == 400
+
+
+def test_get_products_total_modes(auth_token):
+    """Test exact (cached), estimated and omitted listing totals."""
+    from app.services.product import ProductService
+
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    for i, precio in enumerate([10.0, 20.0, 30.0, 40.0, 50.0]):
+        client.post("/api/v1/products", json={
+            "nombre": f"Conteo Producto {i}", "precio": precio, "stock": 5, "categoria": "Conteo"
+        }, headers=headers)
+
+    params = {"categoria": "Conteo", "limit": 2}
+    hits = ProductService.COUNT_CACHE.stats()["hits"]
+    first = client.get("/api/v1/products", params=params, headers=headers).json()
+    second = client.get("/api/v1/products", params={**params, "skip": 2}, headers=headers).json()
+    assert first["total"] == second["total"] == 5
+    assert first["total_estimated"] is False
+    assert ProductService.COUNT_CACHE.stats()["hits"] == hits + 1
+
+    estimate = client.get("/api/v1/products", params={**params, "include_total": "estimate"}, headers=headers).json()
+    assert estimate["total"] == 5
+    assert estimate["total_estimated"] is True
+
+    # Half of the 10..50 price range
+    banded = client.get(
+        "/api/v1/products", params={**params, "include_total": "estimate", "precio_min": 30}, headers=headers
+    ).json()
+    assert banded["total"] in (2, 3)
+
+    omitted = client.get("/api/v1/products", params={**params, "include_total": "false"}, headers=headers).json()
+    assert omitted["total"] is None
+    assert len(omitted["items"]) == 2
+
+    # A write invalidates cached totals
+    client.post("/api/v1/products", json={
+        "nombre": "Conteo Producto 5", "precio": 60.0, "stock": 5, "categoria": "Conteo"
+    }, headers=headers)
+    assert client.get("/api/v1/products", params=params, headers=headers).json()["total"] == 6
+
+    invalid = client.get("/api/v1/products", params={"include_total": "maybe"}, headers=headers)
+    assert invalid.status_code == 400
+
+    caches = client.get("/api/v1/metrics/caches", headers=headers).json()
+    assert "product_counts" in caches
+
+
+def test_get_products_full_text_search(auth_token):
+    """Test that q searches nombre and descripcion, ranked, and follows updates and deletes."""
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    created = {}
+    for nombre, descripcion in [
+        ("Buscador Portátil Gamer", "Portátil con pantalla de 17 pulgadas"),
+        ("Buscador Funda", "Funda acolchada para portátil"),
+        ("Buscador Cable", "Cable HDMI de 2 metros"),
+    ]:
+        created[nombre] = client.post("/api/v1/products", json={
+            "nombre": nombre, "descripcion": descripcion, "precio": 10.0, "stock": 1, "categoria": "Buscador"
+        }, headers=headers).json()["id"]
+
+    # Accents are ignored, words match as prefixes, and the best match comes first
+    page = client.get("/api/v1/products", params={"q": "portatil"}, headers=headers).json()
+    assert page["total"] == 2
+    assert [item["id"] for item in page["items"]] == [
+        created["Buscador Portátil Gamer"], created["Buscador Funda"]
+    ]
+
+    first = client.get("/api/v1/products", params={"q": "buscador", "limit": 2}, headers=headers).json()
+    second = client.get(
+        "/api/v1/products", params={"q": "buscador", "limit": 2, "cursor": first["next_cursor"]}, headers=headers
+    ).json()
+    assert len({item["id"] for item in first["items"] + second["items"]}) == 3
+
+    # The index follows updates and deletes
+    client.put(f"/api/v1/products/{created['Buscador Cable']}", json={"descripcion": "Cable USB-C"}, headers=headers)
+    assert client.get("/api/v1/products", params={"q": "usb"}, headers=headers).json()["total"] == 1
+    assert client.get("/api/v1/products", params={"q": "hdmi"}, headers=headers).json()["total"] == 0
+    client.delete(f"/api/v1/products/{created['Buscador Funda']}", headers=headers)
+    assert client.get("/api/v1/products", params={"q": "acolchada"}, headers=headers).json()["total"] == 0
+
+    assert client.get("/api/v1/products", params={"q": "!!!"}, headers=headers).status_code == 400
+    assert client.get("/api/v1/products", params={"sort_by": "relevance"}, headers=headers).status_code == 400
+
+
+def test_migrate_db_upgrades_a_baseline_database(tmp_path):
+    """Test that init_db's migration adds and backfills the columns of a database from the first release."""
+    from sqlalchemy import text
+    from init_db import migrate_db
+    from app.models.product import Product
+    from app.models.import_log import ImportLog
+    from app.models.change_sequence import current_change_sequence
+    from app.utils.hashing import product_content_hash
+
+    legacy = create_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+    with legacy.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE products (id INTEGER PRIMARY KEY, nombre VARCHAR(255) NOT NULL, descripcion TEXT, "
+            "precio FLOAT NOT NULL, stock INTEGER NOT NULL, categoria VARCHAR(100) NOT NULL, "
+            "created_at DATETIME DEFAULT CURRENT_TIMESTAMP, updated_at DATETIME)"
+        ))
+        connection.execute(text(
+            "CREATE TABLE import_logs (id INTEGER PRIMARY KEY, filename VARCHAR(255) NOT NULL, total_rows INTEGER, "
+            "successful_rows INTEGER, failed_rows INTEGER, errors TEXT, status VARCHAR(50) NOT NULL, "
+            "started_at DATETIME DEFAULT CURRENT_TIMESTAMP, completed_at DATETIME)"
+        ))
+        connection.execute(text(
+            "INSERT INTO products (nombre, descripcion, precio, stock, categoria) VALUES ('Antiguo', NULL, 2.5, 3, 'Legado')"
+        ))
+        connection.execute(text("INSERT INTO import_logs (filename, status) VALUES ('viejo.csv', 'completed')"))
+
+    added = migrate_db(legacy)
+    assert {"products.content_hash", "products.change_seq", "import_logs.error_message", "import_logs.mode"} <= set(added)
+    assert migrate_db(legacy) == []
+
+    db = TestingSessionLocal(bind=legacy)
+    try:
+        product = db.query(Product).one()
+        assert product.content_hash == product_content_hash("Antiguo", None, 2.5, 3, "Legado")
+        assert product.updated_at is not None
+        assert product.change_seq == 0
+        import_log = db.query(ImportLog).one()
+        assert import_log.mode == "insert"
+        assert import_log.updated_at is not None
+        assert current_change_sequence(db) == 0
+        hits = db.execute(text("SELECT count(*) FROM products_fts WHERE products_fts MATCH 'antiguo'")).scalar()
+        assert hits == 1
+    finally:
+        db.close()
+        legacy.dispose()
+
+
+def test_sample_data_is_stamped_like_other_writes(tmp_path, monkeypatch):
+    """Test that init_db's sample products get a content hash and a change sequence value."""
+    import init_db
+    from app.models.product import Product
+    from app.utils.hashing import product_content_hash
+
+    monkeypatch.setattr(init_db, "engine", TestingSessionLocal.kw["bind"])
+    init_db.create_sample_data()
+
+    db = TestingSessionLocal()
+    try:
+        products = db.query(Product).all()
+        assert products
+        for product in products:
+            assert product.change_seq > 0
+            assert product.content_hash == product_content_hash(
+                product.nombre, product.descripcion, product.precio, product.stock, product.categoria
+            )
+    finally:
+        db.close()
+
+
+def test_bulk_load_indexes_search_once_per_call(auth_token):
+    """Test that bulk inserts bypass the per-row FTS trigger and still index every row."""
+    from sqlalchemy import text
+    from app.services.bulk_loader import BulkLoader
+
+    db = TestingSessionLocal()
+    try:
+        BulkLoader.insert_many(db, [
+            {"nombre": f"Masivo Indexado {i}", "descripcion": "Carga masiva", "precio": 1.0, "stock": i,
+             "categoria": "Masivo"}
+            for i in range(5)
+        ])
+        assert db.execute(text("SELECT paused FROM products_fts_control")).scalar() == 0
+        db.commit()
+        db.execute(text("INSERT INTO products_fts(products_fts) VALUES ('integrity-check')"))
+    finally:
+        db.close()
+
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    page = client.get("/api/v1/products", params={"q": "masivo indexado"}, headers=headers).json()
+    assert page["total"] == 5
+
+
+def test_create_search_index_upgrades_without_rebuild(tmp_path):
+    """Test that an existing FTS index gets the pausable trigger and is not rebuilt."""
+    from sqlalchemy import text
+    from app.models.product_search import create_search_index
+
+    legacy = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    Base.metadata.create_all(bind=legacy)
+    with legacy.begin() as connection:
+        connection.execute(text("DROP TRIGGER products_fts_insert"))
+        connection.execute(text("DROP TABLE products_fts_control"))
+        connection.execute(text(
+            "CREATE TRIGGER products_fts_insert AFTER INSERT ON products BEGIN "
+            "INSERT INTO products_fts(rowid, nombre, descripcion) VALUES (new.id, new.nombre, new.descripcion); END"
+        ))
+        # Written behind the index's back: only a rebuild would index it
+        connection.execute(text("DROP TRIGGER products_fts_insert"))
+        connection.execute(text(
+            "INSERT INTO products (nombre, precio, stock, categoria) VALUES ('Oculto', 1, 1, 'Legado')"
+        ))
+        connection.execute(text(
+            "CREATE TRIGGER products_fts_insert AFTER INSERT ON products BEGIN "
+            "INSERT INTO products_fts(rowid, nombre, descripcion) VALUES (new.id, new.nombre, new.descripcion); END"
+        ))
+
+    with legacy.begin() as connection:
+        create_search_index(connection)
+        trigger = connection.execute(
+            text("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'products_fts_insert'")
+        ).scalar()
+        assert "products_fts_control" in trigger
+        assert connection.execute(text("SELECT paused FROM products_fts_control")).scalar() == 0
+        hits = "SELECT count(*) FROM products_fts WHERE products_fts MATCH 'oculto'"
+        assert connection.execute(text(hits)).scalar() == 0
+
+        connection.execute(text("DROP TABLE products_fts"))
+        create_search_index(connection)
+        assert connection.execute(text(hits)).scalar() == 1
+
+    legacy.dispose()
+
+
+def test_get_product_read_through_cache(auth_token):
+    """Test that product lookups are cached and invalidated by updates and deletes."""
+    from app.services.product import ProductService
+
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    product_id = client.post("/api/v1/products", json={
+        "nombre": "Cache Producto", "precio": 15.0, "stock": 3, "categoria": "Cache"
+    }, headers=headers).json()["id"]
+
+    stats = ProductService.PRODUCT_CACHE.stats()
+    first = client.get(f"/api/v1/products/{product_id}", headers=headers)
+    second = client.get(f"/api/v1/products/{product_id}", headers=headers)
+    assert first.status_code == 200
+    assert first.json() == second.json()
+    assert first.json()["nombre"] == "Cache Producto"
+    assert ProductService.PRODUCT_CACHE.stats()["misses"] == stats["misses"] + 1
+    assert ProductService.PRODUCT_CACHE.stats()["hits"] == stats["hits"] + 1
+
+    client.put(f"/api/v1/products/{product_id}", json={"stock": 9}, headers=headers)
+    assert client.get(f"/api/v1/products/{product_id}", headers=headers).json()["stock"] == 9
+
+    client.delete(f"/api/v1/products/{product_id}", headers=headers)
+    assert client.get(f"/api/v1/products/{product_id}", headers=headers).status_code == 404
+
+    caches = client.get("/api/v1/metrics/caches", headers=headers).json()
+    assert caches["products"]["hits"] >= 1
+
+
+def test_get_products_listing_cache(auth_token):
+    """Test that repeated listings are served from the cache until the catalog changes."""
+    from app.services.product import ProductService
+
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    client.post("/api/v1/products", json={
+        "nombre": "Listado Producto 1", "precio": 5.0, "stock": 1, "categoria": "Listado"
+    }, headers=headers)
+
+    params = {"categoria": "Listado", "skip": 0, "limit": 50}
+    stats = ProductService.LISTING_CACHE.stats()
+    first = client.get("/api/v1/products", params=params, headers=headers)
+    second = client.get("/api/v1/products", params=params, headers=headers)
+    assert first.content == second.content
+    assert first.json()["total"] == 1
+    assert ProductService.LISTING_CACHE.stats()["hits"] == stats["hits"] + 1
+
+    # Any product write invalidates every cached listing
+    client.post("/api/v1/products", json={
+        "nombre": "Listado Producto 2", "precio": 6.0, "stock": 1, "categoria": "Listado"
+    }, headers=headers)
+    third = client.get("/api/v1/products", params=params, headers=headers).json()
+    assert third["total"] == 2
+    assert [item["nombre"] for item in third["items"]] == ["Listado Producto 1", "Listado Producto 2"]